@@ -6,6 +6,8 @@ from .utils import load_master_password, set_master_password, hash_password, ver
 from logger import log_event, log_error
 import os
 from constants import MASTER_PASSWORD_FILE
+from data.rekey import VaultRekeyer, is_pending_new_password
+from utils.metrics import timed
 
 def get_new_master_password(root):
     """Get and confirm new master password."""
@@ -39,6 +41,7 @@ def get_new_master_password(root):
         log_error(f"Failed to get new master password: {str(e)}")
         return None
 
+@timed("auth.authenticate")
 def authenticate(root):
     """Main authentication function."""
     try:
@@ -94,3 +97,40 @@ def authenticate(root):
         log_error(f"Authentication process failed: {str(e)}")
         messagebox.showerror("Error", "Authentication failed due to an unexpected error.", parent=root)
         return None
+
+def resume_password_change(root, master_password, kdf=None):
+    """Finish a master password change that was interrupted.
+
+    Asks for whichever of the two passwords was not just entered. Returns
+    the password that unlocks the vault afterwards, or None.
+    """
+    try:
+        log_event("Interrupted master password change found")
+        if is_pending_new_password(master_password):
+            new_password = master_password
+            old_password = simpledialog.askstring(
+                "Finish Password Change",
+                "A master password change was interrupted.\nEnter your previous master password to finish it:",
+                parent=root,
+                show='*'
+            )
+        else:
+            old_password = master_password
+            new_password = simpledialog.askstring(
+                "Finish Password Change",
+                "A master password change was interrupted.\nEnter the new master password to finish it:",
+                parent=root,
+                show='*'
+            )
+        if not old_password or not new_password:
+            log_event("Password change resume cancelled")
+            return None
+
+        VaultRekeyer(old_password, new_password, kdf=kdf).run()
+        log_event("Interrupted master password change finished")
+        return new_password
+
+    except Exception as e:
+        log_error(f"Failed to finish master password change: {str(e)}")
+        messagebox.showerror("Error", f"Failed to finish the password change: {e}", parent=root)
+        return None
@@ -5,6 +5,8 @@ from tkinter import simpledialog, messagebox
 from logger import log_error, log_event
 from cryptography.fernet import Fernet
 from utils.password_utils import encrypt_data, decrypt_data
+from utils.durable_io import atomic_write, recover_file
+from utils.metrics import timed
 
 MASTER_PASSWORD_FILE = "master.hash"
 TWO_FA_FILE = "2fa.key"
@@ -12,6 +14,7 @@ TWO_FA_FILE = "2fa.key"
 def load_master_password():
     """Load and verify the master password hash."""
     try:
+        recover_file(MASTER_PASSWORD_FILE)
         if not os.path.exists(MASTER_PASSWORD_FILE):
             log_event("No master password file found")
             return None
@@ -25,14 +28,14 @@ def load_master_password():
 def set_master_password(password_hash: bytes) -> bool:
     """Save the master password hash."""
     try:
-        with open(MASTER_PASSWORD_FILE, "wb") as f:
-            f.write(password_hash)
+        atomic_write(MASTER_PASSWORD_FILE, password_hash)
         log_event("Master password hash saved successfully")
         return True
     except Exception as e:
         log_error(f"Failed to save master password: {str(e)}")
         return False
 
+@timed("auth.hash_password")
 def hash_password(password: str) -> bytes:
     """Hash a password using bcrypt."""
     try:
@@ -44,6 +47,7 @@ def hash_password(password: str) -> bytes:
         log_error(f"Failed to hash password: {str(e)}")
         return None
 
+@timed("auth.verify_password")
 def verify_password(password: str, stored_hash: bytes) -> bool:
     """Verify a password against its hash."""
     try:
@@ -112,8 +116,7 @@ def get_master_password_input(root):
 def save_2fa_secret(encrypted_secret, master_password):
     """Save the encrypted 2FA secret."""
     try:
-        with open(TWO_FA_FILE, "wb") as f:
-            f.write(encrypted_secret)
+        atomic_write(TWO_FA_FILE, encrypted_secret)
         log_event("2FA secret saved successfully")
         return True
     except Exception as e:
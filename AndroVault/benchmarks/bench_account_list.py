@@ -0,0 +1,46 @@
+# benchmarks/bench_account_list.py
+"""Account list refresh cost after one edit: full rebuild vs. change set.
+
+Needs a display (Tk). Run from the AndroVault directory:
+    python -m benchmarks.bench_account_list
+"""
+import tkinter as tk
+from benchmarks.common import quiet, measure, report, make_accounts
+from manager.change_set import ChangeSet
+from ui.account_list import AccountList
+
+def main(sizes=(1000, 10000, 50000)):
+    root = tk.Tk()
+    root.withdraw()
+    try:
+        for virtual in (False, True):
+            mode = "virtual" if virtual else "treeview"
+            for size in sizes:
+                with quiet():
+                    account_list = AccountList(root, lambda account_id: None, virtual=virtual)
+                    account_list.pack()
+                    accounts = make_accounts(size)
+                    by_id = {acc['id']: acc for acc in accounts}
+                    account_list.update_accounts(accounts)
+                    root.update()
+                    target = accounts[size // 2]
+
+                    def full_refresh():
+                        account_list.update_accounts(accounts)
+                        root.update_idletasks()
+
+                    def delta_refresh():
+                        target['notes'] = target['notes'] + "!"
+                        account_list.apply_changes(ChangeSet(updated=[target['id']]), by_id.get)
+                        root.update_idletasks()
+
+                    full = measure(full_refresh, repeat=3)
+                    delta = measure(delta_refresh, repeat=20)
+                    account_list.destroy()
+                report(f"{mode} {size}: full rebuild", full)
+                report(f"{mode} {size}: change set", delta)
+    finally:
+        root.destroy()
+
+if __name__ == "__main__":
+    main()
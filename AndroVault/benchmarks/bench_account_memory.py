@@ -0,0 +1,42 @@
+# benchmarks/bench_account_memory.py
+"""Memory and (de)serialization cost of dict records vs. slotted Accounts.
+
+Run from the AndroVault directory:
+    python -m benchmarks.bench_account_memory
+"""
+import json
+import tracemalloc
+from benchmarks.common import measure, report, make_accounts
+from manager.account import Account, account_to_json
+
+def allocated_mb(build):
+    """Megabytes still allocated by the object build() returns."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return result, (after - before) / (1024 * 1024)
+
+def main(size=100000):
+    # Round-trip through JSON so both sets own their strings, as after a load
+    raw = json.dumps(make_accounts(size))
+
+    dicts, dict_mb = allocated_mb(lambda: json.loads(raw))
+    records, record_mb = allocated_mb(
+        lambda: [Account.from_dict(a) for a in json.loads(raw)]
+    )
+    print(f"{size} accounts: dicts {dict_mb:.1f} MB, Account records {record_mb:.1f} MB "
+          f"({100 * (1 - record_mb / dict_mb):.0f}% less)")
+
+    report("  dicts   json.dumps", measure(lambda: json.dumps(dicts), repeat=3))
+    report("  Account json.dumps", measure(
+        lambda: json.dumps(records, default=account_to_json), repeat=3))
+    report("  dicts   json.loads", measure(lambda: json.loads(raw), repeat=3))
+    report("  Account json.loads + from_dict", measure(
+        lambda: [Account.from_dict(a) for a in json.loads(raw)], repeat=3))
+
+if __name__ == "__main__":
+    main()
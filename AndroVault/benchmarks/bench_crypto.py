@@ -0,0 +1,72 @@
+# benchmarks/bench_crypto.py
+"""Encrypt/decrypt throughput of the CryptoService paths, small and large
+payloads, against deriving a Fernet key on every call.
+
+Run from the AndroVault directory:
+    python -m benchmarks.bench_crypto
+"""
+import io
+import os
+import statistics
+from cryptography.fernet import Fernet
+from benchmarks.common import quiet, measure
+from utils import kdf
+from utils.crypto import CryptoService, encrypt_data, decrypt_data
+
+PASSWORD = "correct horse battery staple"
+SMALL = (64, 4 * 1024)
+LARGE = (1024 * 1024, 16 * 1024 * 1024)
+
+def per_call_encrypt(payload, password=PASSWORD):
+    """What every encrypt_data call cost before keys were cached."""
+    salt = os.urandom(16)
+    return salt + Fernet(kdf.fernet_key(password, salt)).encrypt(payload)
+
+def per_call_decrypt(blob, password=PASSWORD):
+    return Fernet(kdf.fernet_key(password, blob[:16])).decrypt(blob[16:])
+
+def row(label, size, func, calls):
+    """Print median time per call and throughput for func run calls times."""
+    timings = measure(lambda: [func() for _ in range(calls)], repeat=5)
+    per_call = statistics.median(timings) / calls
+    throughput = size / (1024 * 1024) / (per_call / 1000)
+    print(f"{label:<34} {_size(size):>8}  {per_call:10.4f} ms/op  {throughput:9.1f} MB/s")
+
+def _size(size):
+    return f"{size // (1024 * 1024)} MiB" if size >= 1024 * 1024 else f"{size} B"
+
+def main():
+    with quiet():
+        service = CryptoService(PASSWORD)
+        service.cipher()
+        aead = service.aead()
+    for size in SMALL + LARGE:
+        payload = os.urandom(size)
+        calls = 200 if size in SMALL else 2
+        with quiet():
+            fernet_blob = encrypt_data(payload, service)
+            nonce = os.urandom(12)
+            aead_blob = aead.encrypt(nonce, payload, None)
+            stream = io.BytesIO()
+            with service.stream_writer(stream) as writer:
+                writer.write(payload)
+            stream_blob = stream.getvalue()
+
+        if size in SMALL:
+            row("fernet, key derived per call", size, lambda: per_call_encrypt(payload), 5)
+            row("  decrypt", size, lambda: per_call_decrypt(fernet_blob), 5)
+        row("fernet, CryptoService", size, lambda: encrypt_data(payload, service), calls)
+        row("  decrypt", size, lambda: decrypt_data(fernet_blob, service), calls)
+        row("fernet, password (cached service)", size, lambda: encrypt_data(payload, PASSWORD), calls)
+        row("aes-gcm, CryptoService.aead", size, lambda: aead.encrypt(os.urandom(12), payload, None), calls)
+        row("  decrypt", size, lambda: aead.decrypt(nonce, aead_blob, None), calls)
+        if size in LARGE:
+            def write_stream():
+                with service.stream_writer(io.BytesIO()) as writer:
+                    writer.write(payload)
+            row("stream, CryptoService", size, write_stream, calls)
+            row("  decrypt", size, lambda: service.stream_reader(io.BytesIO(stream_blob)).read(), calls)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+# benchmarks/bench_durable_writes.py
+"""Vault writes per second under each fsync policy.
+
+Run from the AndroVault directory:
+    python -m benchmarks.bench_durable_writes
+"""
+import os
+import time
+from benchmarks.common import quiet, scratch_dir
+from utils.durable_io import DurableWriter, FSYNC_POLICIES
+
+def writes_per_second(writer, path, payload, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        writer.write_file(path, payload)
+    writer.flush()
+    return count / (time.perf_counter() - start)
+
+def main(payload_size=256 * 1024, count=200):
+    payload = os.urandom(payload_size)
+    with scratch_dir(), quiet():
+        # Baseline: the old in-place write with no fsync at all
+        start = time.perf_counter()
+        for _ in range(count):
+            with open("unsafe.enc", 'wb') as f:
+                f.write(payload)
+        baseline = count / (time.perf_counter() - start)
+
+        results = []
+        for policy in FSYNC_POLICIES:
+            writer = DurableWriter(policy, batch_size=10, idle_delay=0.5)
+            rate = writes_per_second(writer, f"{policy}.enc", payload, count)
+            results.append((policy, rate))
+
+    print(f"{'in-place, no fsync (old)':<32} {baseline:10.1f} writes/s")
+    for policy, rate in results:
+        print(f"{policy:<32} {rate:10.1f} writes/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+# benchmarks/bench_kdf.py
+"""Unlock cost of each key derivation function at its default parameters.
+
+Run from the AndroVault directory:
+    python -m benchmarks.bench_kdf
+"""
+import os
+from benchmarks.common import measure, report
+from utils import kdf
+
+PASSWORD = "correct horse battery staple"
+
+def main(repeat=3):
+    salt = os.urandom(16)
+    for params in (kdf.KDFParams.pbkdf2(), kdf.KDFParams.scrypt(), kdf.KDFParams.argon2id()):
+        try:
+            timings = measure(lambda: kdf.derive(PASSWORD, salt, params), repeat)
+        except RuntimeError as e:
+            print(f"{params.describe():<40} skipped: {e}")
+            continue
+        report(params.describe(), timings)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_log_query.py
+"""Reading large logs: the last entries by readlines() against reading
+back from the end, and errors in the last hour by scanning every file
+against utils/log_query.py with its sidecar index.
+
+Run from the AndroVault directory:
+    python -m benchmarks.bench_log_query
+"""
+import json
+import os
+import time
+from benchmarks.common import measure, report, scratch_dir
+from utils import log_query
+
+def write_logs(files=5, records_per_file=100000, span_hours=24 * 7):
+    """JSON-lines files named as size rotation names them, spread evenly
+    over span_hours up to now; one record in 1000 is an error."""
+    os.makedirs("logs")
+    total = files * records_per_file
+    start = time.time() - span_hours * 3600
+    step = span_hours * 3600 / total
+    n = 0
+    for number in range(files - 1, -1, -1):
+        name = "app.log" + (f".{number}" if number else "")
+        with open(os.path.join("logs", name), 'w') as f:
+            for _ in range(records_per_file):
+                level = "ERROR" if n % 1000 == 0 else "INFO"
+                f.write(json.dumps({
+                    "ts": start + n * step, "time": "", "level": level, "file": "manager/account_manager.py",
+                    "line": 120, "func": "get_accounts", "message": f"Account list updated with {n} items",
+                }) + "\n")
+                n += 1
+        os.utime(os.path.join("logs", name), (start + n * step,) * 2)
+
+def readlines_tail(n):
+    with open(os.path.join("logs", "app.log"), 'r') as f:
+        return f.readlines()[-n:]
+
+def scan_errors(since):
+    matches = []
+    for path in log_query.log_files("logs"):
+        with open(path, 'r') as f:
+            for line in f:
+                record = json.loads(line)
+                if record["level"] == "ERROR" and record["ts"] >= since:
+                    matches.append(line)
+    return matches
+
+def main():
+    with scratch_dir():
+        write_logs()
+        size = sum(os.path.getsize(path) for path in log_query.log_files("logs"))
+        print(f"{size / 1e6:.1f} MB of logs in {len(log_query.log_files('logs'))} files")
+
+        report("last 50 entries, readlines", measure(lambda: readlines_tail(50)))
+        report("last 50 entries, from the end", measure(lambda: log_query.tail(50, log_dir="logs")))
+
+        since = time.time() - 3600
+        log_filter = log_query.Filter(level="ERROR", since=since)
+        report("errors in the last hour, full scan", measure(lambda: scan_errors(since), repeat=3))
+        report("building the index", measure(lambda: list(log_query.query(log_filter, "logs")), repeat=1))
+        report("errors in the last hour, indexed", measure(lambda: list(log_query.query(log_filter, "logs"))))
+        report("last 5 errors, indexed tail",
+               measure(lambda: log_query.tail(5, log_query.Filter(level="ERROR"), "logs")))
+        print(f"index: {os.path.getsize(os.path.join('logs', log_query.INDEX_FILE)) / 1e3:.1f} kB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/bench_logging.py
+"""Per-call cost of log_event/log_debug/log_error on the calling thread,
+queued (logger.py) against the old synchronous file-and-print pipeline.
+
+"On the caller" is measured with the listener paused, which is what the
+Tk thread pays for a burst of records while the listener waits for its
+turn; "end to end" adds the listener's formatting and writing.
+
+Run from the AndroVault directory:
+    python -m benchmarks.bench_logging
+"""
+import contextlib
+import io
+import logging
+import statistics
+import sys
+import time
+import traceback
+from benchmarks.common import scratch_dir
+
+CALLS = 2000
+
+def sync_logger(path):
+    """Logger wired like logger.py before the queue: a file handler
+    formatting and writing on the calling thread."""
+    logger = logging.getLogger('bench.sync')
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter(
+        '%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s', '%Y-%m-%d %H:%M:%S'
+    ))
+    logger.addHandler(handler)
+    return logger, handler
+
+def sync_log_event(logger, message):
+    frame = sys._getframe(1)
+    caller = f"{frame.f_code.co_filename}:{frame.f_lineno}"
+    logger.info(f"[{caller}] {message}")
+    print(f"Event: {message}")
+
+def sync_log_debug(logger, message):
+    frame = sys._getframe(1)
+    caller = f"{frame.f_code.co_filename}:{frame.f_lineno}"
+    logger.debug(f"[{caller}] DEBUG: {message}")
+    print(f"Debug: {message}")
+
+def sync_log_error(logger, message):
+    frame = sys._getframe(1)
+    caller = f"{frame.f_code.co_filename}:{frame.f_lineno}"
+    logger.error(f"[{caller}] ERROR: {message}")
+    stack = ''.join(traceback.format_stack()[:-1])
+    logger.error(f"Stack trace:\n{stack}")
+    print(f"Error: {message}")
+
+def per_call_us(func):
+    """Median over 5 runs of CALLS calls, in microseconds per call."""
+    timings = []
+    for _ in range(5):
+        start = time.perf_counter()
+        for i in range(CALLS):
+            func(i)
+        timings.append((time.perf_counter() - start) / CALLS * 1e6)
+    return statistics.median(timings)
+
+def main():
+    with scratch_dir(), contextlib.redirect_stdout(io.StringIO()):
+        import logger as queued
+        # Same sinks and level as the old pipeline
+        queued.configure_logging(level="DEBUG", console=True)
+        sync, handler = sync_logger("sync.log")
+        rows = [
+            ("log_event", lambda i: sync_log_event(sync, f"Account list updated with {i} items"),
+             lambda i: queued.log_event("Account list updated with %d items", i)),
+            ("log_debug", lambda i: sync_log_debug(sync, f"Selected account: {i}"),
+             lambda i: queued.log_debug("Selected account: %s", i)),
+            ("log_error", lambda i: sync_log_error(sync, f"Failed to load account: {i}"),
+             lambda i: queued.log_error("Failed to load account: %s", i)),
+        ]
+        results = []
+        for label, old, new in rows:
+            old_us = per_call_us(old)
+            queued.flush()
+            queued._listener.stop()
+            new_us = per_call_us(new)
+            start = time.perf_counter()
+            queued._listener.start()
+            queued.flush()
+            drain_us = new_us + (time.perf_counter() - start) / (5 * CALLS) * 1e6
+            results.append((label, old_us, new_us, drain_us))
+        handler.close()
+        queued.configure_logging(level="INFO")
+        dropped_us = per_call_us(lambda i: queued.log_debug("Selected account: %s", i))
+
+    print(f"{'':<10} {'synchronous':>14} {'on the caller':>14} {'end to end':>14}")
+    for label, old_us, new_us, drain_us in results:
+        print(f"{label:<10} {old_us:11.1f} us {new_us:11.1f} us {drain_us:11.1f} us"
+              f"   ({old_us / new_us:.1f}x less on the caller)")
+    print(f"log_debug below the level (INFO): {dropped_us:.2f} us")
+
+if __name__ == "__main__":
+    main()
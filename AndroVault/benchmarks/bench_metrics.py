@@ -0,0 +1,58 @@
+# benchmarks/bench_metrics.py
+"""Cost of utils/metrics.py timers per call, disabled and enabled, then
+the report for a short session of saves, searches and a backup.
+
+Run from the AndroVault directory:
+    python -m benchmarks.bench_metrics
+"""
+import timeit
+from benchmarks.common import quiet, scratch_dir, make_accounts
+
+CALLS = 1000000
+
+def per_call_ns(func):
+    return min(timeit.repeat(func, number=CALLS, repeat=3)) / CALLS * 1e9
+
+def main():
+    with scratch_dir():
+        with quiet():
+            from utils import metrics
+            from utils.metrics import timed
+
+        def bare():
+            pass
+
+        @timed("bench.decorated")
+        def decorated():
+            pass
+
+        def block():
+            with timed("bench.block"):
+                pass
+
+        rows = []
+        for enabled in (False, True):
+            with quiet():
+                metrics.configure_metrics(enabled=enabled, dump_on_exit=False)
+            base = per_call_ns(bare)
+            rows.append((enabled, per_call_ns(decorated) - base, per_call_ns(block) - base))
+        print(f"{'':<10} {'decorator':>12} {'with block':>12}   (added per call)")
+        for enabled, decorated_ns, block_ns in rows:
+            print(f"{'enabled' if enabled else 'disabled':<10} {decorated_ns:9.0f} ns {block_ns:9.0f} ns")
+
+        with quiet():
+            from manager.account_manager import AccountManager
+            from data.backup_manager import BackupManager
+            metrics.reset()
+            manager = AccountManager("correct horse battery staple")
+            for account in make_accounts(200):
+                manager.save_account(account)
+            for term in ("mail", "bank", "shop1"):
+                manager.get_accounts(term)
+            BackupManager(session_key=manager.session_key).create_backup()
+            manager.close()
+        print()
+        print(metrics.report())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# benchmarks/bench_rekey.py
+"""Master password change on a large binary vault, serial vs. worker pool.
+
+Run from the AndroVault directory:
+    python -m benchmarks.bench_rekey
+"""
+import os
+from benchmarks.common import quiet, scratch_dir, make_accounts
+
+def main(count=200000):
+    with scratch_dir():
+        with quiet():
+            from data.rekey import VaultRekeyer
+            from data.vault_storage import BinaryVaultStorage
+            from utils.session_key import SessionKey
+
+            os.makedirs("data")
+            key = SessionKey("password 0")
+            storage = BinaryVaultStorage(os.path.join("data", "accounts.vault"), key)
+            storage.commit(make_accounts(count))
+
+        passwords = ["password 0"]
+        for workers in (1, max(2, os.cpu_count() or 1)):
+            passwords.append(f"password {len(passwords)}")
+            with quiet():
+                rekeyer = VaultRekeyer(passwords[-2], passwords[-1], workers=workers)
+                rekeyer.run()
+            print(f"workers={workers:<3} {rekeyer.stats.describe()}")
+
+if __name__ == "__main__":
+    main()
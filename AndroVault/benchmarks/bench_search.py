@@ -0,0 +1,36 @@
+# benchmarks/bench_search.py
+"""Account search latency: linear scan vs. the trigram index.
+
+Run from the AndroVault directory:
+    python -m benchmarks.bench_search
+"""
+import time
+from benchmarks.common import quiet, measure, report, make_accounts
+from manager.search_index import TrigramIndex
+
+QUERIES = ("bank", "ma", "user4242", "forum99", "zzz-no-match")
+
+def linear_search(accounts, term):
+    """The scan AccountManager.get_accounts used before the index."""
+    term = term.lower()
+    return [acc for acc in accounts
+            if term in acc.get('website', '').lower() or
+               term in acc.get('username', '').lower() or
+               term in acc.get('notes', '').lower()]
+
+def main(sizes=(10000, 100000)):
+    for size in sizes:
+        accounts = make_accounts(size)
+        with quiet():
+            start = time.perf_counter()
+            index = TrigramIndex(accounts)
+            build_ms = (time.perf_counter() - start) * 1000
+        print(f"{size} accounts: index built in {build_ms:.1f} ms")
+        for query in QUERIES:
+            report(f"  linear  '{query}'", measure(lambda: linear_search(accounts, query)))
+            report(f"  trigram '{query}'", measure(lambda: index.search(query)))
+        account = dict(accounts[size // 2], website="renamed.example.com")
+        report("  incremental update", measure(lambda: index.add(account), repeat=50))
+
+if __name__ == "__main__":
+    main()
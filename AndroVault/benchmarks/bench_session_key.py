@@ -0,0 +1,41 @@
+# benchmarks/bench_session_key.py
+"""Per-save latency of AccountManager with and without the session key cache.
+
+Run from the AndroVault directory:
+    python -m benchmarks.bench_session_key
+"""
+import json
+from benchmarks.common import quiet, scratch_dir, measure, report, make_accounts
+from benchmarks.bench_crypto import per_call_encrypt, per_call_decrypt
+from utils.password_utils import encrypt_data, decrypt_data
+from utils.session_key import SessionKey
+
+PASSWORD = "correct horse battery staple"
+
+def main(sizes=(10, 1000)):
+    with quiet():
+        key = SessionKey(PASSWORD)
+        key.encrypt(b"warm-up")  # One-time derivation done at unlock
+    for size in sizes:
+        payload = json.dumps(make_accounts(size)).encode()
+        with quiet():
+            before = measure(lambda: per_call_encrypt(payload, PASSWORD))
+            after = measure(lambda: encrypt_data(payload, key))
+            blob = encrypt_data(payload, key)
+            load_before = measure(lambda: per_call_decrypt(blob, PASSWORD))
+            load_after = measure(lambda: decrypt_data(blob, key))
+        report(f"save {size} accounts, PBKDF2 per call", before)
+        report(f"save {size} accounts, session key", after)
+        report(f"load {size} accounts, PBKDF2 per call", load_before)
+        report(f"load {size} accounts, session key", load_after)
+
+    # End-to-end through AccountManager
+    from manager.account_manager import AccountManager
+    with scratch_dir(), quiet():
+        manager = AccountManager(PASSWORD)
+        accounts = make_accounts(200)
+        timings = measure(lambda: manager.save_account(dict(accounts.pop())), repeat=20)
+    report("AccountManager.save_account", timings)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# benchmarks/bench_storage.py
+"""Cost of a single account edit under each vault storage format.
+
+Run from the AndroVault directory:
+    python -m benchmarks.bench_storage
+"""
+from benchmarks.common import quiet, scratch_dir, measure, report, make_accounts
+from manager.account_manager import AccountManager
+
+PASSWORD = "correct horse battery staple"
+
+def main(sizes=(1000, 10000)):
+    for storage_format in ("file", "journal"):
+        for size in sizes:
+            with scratch_dir(), quiet():
+                manager = AccountManager(PASSWORD, storage_format=storage_format)
+                manager.accounts = make_accounts(size)
+                manager._save_accounts()
+                edits = iter(manager.accounts * 2)
+
+                def edit():
+                    account = next(edits).copy()
+                    account.notes = "edited"
+                    manager.save_account(account)
+
+                timings = measure(edit, repeat=20)
+                manager.close()
+            report(f"{storage_format}: edit in {size}-account vault", timings)
+
+if __name__ == "__main__":
+    main()
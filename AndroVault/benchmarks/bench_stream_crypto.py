@@ -0,0 +1,62 @@
+# benchmarks/bench_stream_crypto.py
+"""Throughput and peak Python memory of whole-buffer vs. streaming encryption.
+
+Run from the AndroVault directory:
+    python -m benchmarks.bench_stream_crypto
+"""
+import os
+import time
+import tracemalloc
+from benchmarks.common import quiet, scratch_dir
+from utils.password_utils import encrypt_data
+from utils.session_key import SessionKey
+from utils.stream_crypto import encrypt_stream, decrypt_stream
+
+PASSWORD = "correct horse battery staple"
+
+def traced(func):
+    """Run func; return (seconds, peak traced MB)."""
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024)
+
+def whole_buffer(key):
+    with open("plain", 'rb') as f:
+        data = encrypt_data(f.read(), key)
+    with open("whole.enc", 'wb') as f:
+        f.write(data)
+
+def streamed(key):
+    with open("plain", 'rb') as source, open("stream.enc", 'wb') as target:
+        encrypt_stream(source, target, key)
+
+def stream_back(key):
+    with open("stream.enc", 'rb') as source, open("plain.out", 'wb') as target:
+        decrypt_stream(source, target, key)
+
+def main(sizes_mb=(16, 64, 256)):
+    for size_mb in sizes_mb:
+        with scratch_dir(), quiet():
+            with open("plain", 'wb') as f:
+                for _ in range(size_mb):
+                    f.write(os.urandom(1024 * 1024))
+            key = SessionKey(PASSWORD)
+            key.cipher()
+            key.aead()
+            results = [
+                ("whole-buffer Fernet encrypt", traced(lambda: whole_buffer(key))),
+                ("streaming encrypt", traced(lambda: streamed(key))),
+                ("streaming decrypt", traced(lambda: stream_back(key))),
+            ]
+        print(f"{size_mb} MB file:")
+        for label, (seconds, peak_mb) in results:
+            print(f"  {label:<30} {size_mb / seconds:8.1f} MB/s  peak {peak_mb:8.2f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# benchmarks/bench_vault_format.py
+"""File size, save and load time of the whole-file vs. binary vault formats.
+
+Binary vaults keep passwords sealed after load, so the cost of reading
+every password afterwards is reported separately.
+
+Run from the AndroVault directory:
+    python -m benchmarks.bench_vault_format
+"""
+import os
+from benchmarks.common import quiet, scratch_dir, measure, report, make_accounts
+from data.vault_storage import WholeFileStorage, BinaryVaultStorage
+from manager.account import Account
+from utils.session_key import SessionKey
+
+PASSWORD = "correct horse battery staple"
+
+def main(sizes=(1000, 10000, 100000)):
+    for size in sizes:
+        accounts = [Account.from_dict(a) for a in make_accounts(size)]
+        for name, backend in (("file", WholeFileStorage), ("binary", BinaryVaultStorage)):
+            with scratch_dir(), quiet():
+                key = SessionKey(PASSWORD)
+                storage = backend("vault", key)
+                # Derive keys outside the timed runs and save what a
+                # session would hold after unlock
+                storage.commit(accounts)
+                loaded = storage.load()
+                save = measure(lambda: storage.commit(loaded), repeat=3)
+                load = measure(storage.load, repeat=3)
+                reveal = measure(lambda: [a['password'] for a in loaded], repeat=3)
+                file_size = os.path.getsize("vault")
+            print(f"{name:>6}: {size} accounts, {file_size / 1024:.0f} KiB")
+            report("  save", save)
+            report("  load", load)
+            report("  read every password after load", reveal)
+
+if __name__ == "__main__":
+    main()
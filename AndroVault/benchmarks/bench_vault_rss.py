@@ -0,0 +1,93 @@
+# benchmarks/bench_vault_rss.py
+"""Peak resident memory while unlocking a large (50 MB+) vault.
+
+Each load runs in a fresh child process so the peaks do not mix. Linux
+only (resets and reads the VmHWM high-water mark in /proc/self).
+
+Run from the AndroVault directory:
+    python -m benchmarks.bench_vault_rss
+"""
+import os
+import subprocess
+import sys
+import time
+from benchmarks.common import quiet, scratch_dir, make_accounts
+
+PASSWORD = "correct horse battery staple"
+MODES = ("file", "binary-read", "binary-mmap")
+
+def _status_mb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError(f"{field} not found in /proc/self/status")
+
+def current_rss_mb():
+    return _status_mb("VmRSS")
+
+def peak_rss_mb():
+    return _status_mb("VmHWM")
+
+def reset_peak_rss():
+    with open("/proc/self/clear_refs", 'w') as f:
+        f.write("5")
+
+def child(mode, data_dir):
+    """Load one vault and print peak/retained memory above the baseline."""
+    with quiet():
+        from data.vault_storage import WholeFileStorage, BinaryVaultStorage
+        from data.vault_format import decode_vault
+        from utils.session_key import SessionKey
+
+        key = SessionKey(PASSWORD, salt=open(os.path.join(data_dir, "salt"), 'rb').read())
+        # Derive keys before the baseline
+        key.cipher()
+        key.aead(key.salt)
+
+        baseline = current_rss_mb()
+        reset_peak_rss()
+        start = time.perf_counter()
+        if mode == "file":
+            accounts = WholeFileStorage(os.path.join(data_dir, "accounts.enc"), key).load()
+        elif mode == "binary-read":
+            with open(os.path.join(data_dir, "accounts.vault"), 'rb') as f:
+                _, accounts = decode_vault(f.read(), key)
+        else:
+            accounts = BinaryVaultStorage(os.path.join(data_dir, "accounts.vault"), key).load()
+        elapsed = time.perf_counter() - start
+
+    print(f"{mode:<12} {len(accounts)} accounts in {elapsed * 1000:7.0f} ms  "
+          f"peak +{peak_rss_mb() - baseline:6.1f} MB  retained +{current_rss_mb() - baseline:6.1f} MB")
+
+def main(count=140000):
+    with scratch_dir() as path:
+        with quiet():
+            from data.vault_storage import WholeFileStorage, BinaryVaultStorage
+            from utils.session_key import SessionKey
+
+            accounts = make_accounts(count)
+            for account in accounts:
+                # Incompressible notes so the vault stays large
+                account['notes'] = os.urandom(256).hex()
+            key = SessionKey(PASSWORD)
+            WholeFileStorage("accounts.enc", key).commit(accounts)
+            BinaryVaultStorage("accounts.vault", key).commit(accounts)
+            with open("salt", 'wb') as f:
+                f.write(key.salt)
+            del accounts
+
+        for name in ("accounts.enc", "accounts.vault"):
+            print(f"{name}: {os.path.getsize(name) / (1024 * 1024):.1f} MB")
+        for mode in MODES:
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_vault_rss", "--child", mode, path],
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                check=True
+            )
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3])
+    else:
+        main()
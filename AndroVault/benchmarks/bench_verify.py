@@ -0,0 +1,54 @@
+# benchmarks/bench_verify.py
+"""Backup verification on a large vault: every chunk read serially and
+with a worker pool, re-verification from the cache, and a verified
+restore.
+
+Run from the AndroVault directory:
+    python -m benchmarks.bench_verify
+"""
+import os
+import time
+from benchmarks.common import quiet, scratch_dir, make_accounts
+
+PASSWORD = "correct horse battery staple"
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+def main(count=100000, backups=10, edits=50):
+    with scratch_dir():
+        with quiet():
+            from data.backup_manager import BackupManager
+            from data.vault_storage import BinaryVaultStorage
+            from utils.crypto import CryptoService
+
+            os.makedirs("data")
+            key = CryptoService(PASSWORD)
+            storage = BinaryVaultStorage(os.path.join("data", "accounts.vault"), key)
+            storage.commit(make_accounts(count))
+            accounts = storage.load()
+            manager = BackupManager(session_key=key)
+            for i in range(backups):
+                for j in range(edits):
+                    accounts[(i * edits + j) * 997 % count].notes = f"Edited before backup {i}"
+                storage.commit(accounts)
+                manager.create_backup()
+
+        print(f"{count} accounts, {backups} backups")
+        for workers in (1, max(2, os.cpu_count() or 1)):
+            with quiet():
+                results, elapsed = _timed(lambda: manager.verify_backups(workers=workers, force=True))
+            intact = sum(not errors for errors in results.values())
+            print(f"verify, workers={workers:<3} {elapsed:9.1f} ms  ({intact}/{len(results)} intact)")
+        with quiet():
+            _, elapsed = _timed(manager.verify_backups)
+        print(f"verify again (cached)    {elapsed:9.1f} ms")
+        with quiet():
+            name = manager.list_backups()[-1]["name"]
+            restored, elapsed = _timed(lambda: manager.restore_backup(name))
+        print(f"verified restore         {elapsed:9.1f} ms  ({'ok' if restored else 'failed'})")
+
+if __name__ == "__main__":
+    main()
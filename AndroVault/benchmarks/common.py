@@ -0,0 +1,65 @@
+# benchmarks/common.py
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the console echo done by logger.py while benchmarking."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            yield
+        finally:
+            # Records are echoed by the logger's listener thread; let it
+            # catch up before stdout is restored
+            if 'logger' in sys.modules:
+                sys.modules['logger'].flush()
+
+@contextlib.contextmanager
+def scratch_dir():
+    """Run inside a temporary working directory."""
+    old_cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as path:
+        os.chdir(path)
+        try:
+            yield path
+        finally:
+            os.chdir(old_cwd)
+
+def measure(func, repeat=5):
+    """Run func repeat times and return timings in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def report(label, timings):
+    """Print median/min/max of a list of millisecond timings."""
+    print(f"{label:<40} median {statistics.median(timings):9.3f} ms"
+          f"  min {min(timings):9.3f} ms  max {max(timings):9.3f} ms")
+
+def make_accounts(count, seed_words=("mail", "bank", "shop", "forum", "cloud", "news")):
+    """Build synthetic account dicts shaped like the ones the UI saves."""
+    now = datetime.now().timestamp()
+    accounts = []
+    for i in range(count):
+        word = seed_words[i % len(seed_words)]
+        accounts.append({
+            'id': str(uuid.uuid4()),
+            'website': f"{word}{i}.example.com",
+            'username': f"user{i}@{word}.example.com",
+            'password': f"P@ss-{i:08d}-{word}",
+            'notes': f"Synthetic {word} account number {i}",
+            'created_at': now,
+            'modified_at': now,
+            'password_history': []
+        })
+    return accounts
@@ -0,0 +1,43 @@
+# conftest.py
+"""pytest setup: run the tests from the AndroVault directory with
+
+    python -m pytest -q
+
+Modules write to paths relative to the working directory (data/, backups/,
+logs/, master.hash), so the session starts in a scratch directory before
+any of them is imported, and every test runs in its own tmp_path.
+"""
+import os
+import tempfile
+import pytest
+
+_old_cwd = os.getcwd()
+_scratch = tempfile.TemporaryDirectory(prefix="androvault-tests-", ignore_cleanup_errors=True)
+os.chdir(_scratch.name)
+
+from utils.kdf import KDFParams
+
+# Cheap key derivation; the KDF itself is not what these tests exercise
+TEST_KDF = KDFParams.pbkdf2(1000)
+PASSWORD = "correct horse battery staple"
+
+def pytest_unconfigure(config):
+    os.chdir(_old_cwd)
+    _scratch.cleanup()
+
+@pytest.fixture(autouse=True)
+def _in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+@pytest.fixture
+def kdf():
+    return TEST_KDF
+
+@pytest.fixture
+def password():
+    return PASSWORD
+
+@pytest.fixture
+def session_key():
+    from utils.crypto import CryptoService
+    return CryptoService(PASSWORD, kdf=TEST_KDF)
@@ -89,6 +89,20 @@ TWO_FA_FILE = "2fa.key"
 MASTER_PASSWORD_FILE = "master.hash"
 ACCOUNTS_FILE = "accounts.json"
 
+# Delay after the last keystroke before a search runs
+SEARCH_DEBOUNCE_MS = 200
+
+# Account list: virtual mode only creates Treeview rows for the viewport
+# plus this many extra rows below it
+VIRTUAL_ACCOUNT_LIST = True
+VIRTUAL_LIST_OVERSCAN = 5
+
+# Vault storage backend: "file" rewrites one encrypted blob per save,
+# "journal" appends per-account records, "binary" rewrites a compressed
+# binary container (see data/vault_storage.py)
+VAULT_STORAGE_FORMATS = ("file", "journal", "binary")
+VAULT_STORAGE_FORMAT = "binary"
+
 COMPONENT_STYLES = {
     'treeview': {
         'rowheight': 30,
@@ -1,52 +1,43 @@
 import json
 import os
 from datetime import datetime
-from cryptography.fernet import Fernet
 from logger import log_event, log_error
+from utils.crypto import CryptoService
+from utils.durable_io import atomic_write, recover_file
+from manager.search_index import TrigramIndex
 
 class AccountStore:
     def __init__(self, master_password):
         """Initialize account storage with encryption."""
-        self.cipher = Fernet(self._derive_key(master_password))
+        self.crypto = CryptoService(master_password, salt=self._load_salt())
+        self.cipher = self.crypto.cipher()
         self.data_file = "accounts.dat"
         self.accounts = self._load_accounts()
+        self._by_id = {account['id']: account for account in self.accounts}
+        self.search_index = TrigramIndex(self.accounts)
 
-    def _derive_key(self, master_password):
-        """Derive encryption key from master password."""
-        import base64
-        from cryptography.hazmat.primitives import hashes
-        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-        
-        # Use stored salt or generate new one
+    def _load_salt(self):
+        """Stored salt, or a new one on first use."""
         salt_file = "salt.key"
         if os.path.exists(salt_file):
             with open(salt_file, 'rb') as f:
-                salt = f.read()
-        else:
-            salt = os.urandom(16)
-            with open(salt_file, 'wb') as f:
-                f.write(salt)
-
-        # Derive key using PBKDF2
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(master_password.encode()))
-        return key
+                return f.read()
+        salt = os.urandom(16)
+        with open(salt_file, 'wb') as f:
+            f.write(salt)
+        return salt
 
     def _load_accounts(self):
         """Load and decrypt accounts from file."""
         try:
+            recover_file(self.data_file)
             if os.path.exists(self.data_file):
                 with open(self.data_file, 'rb') as f:
-                    encrypted_data = f.read()
-                    decrypted_data = self.cipher.decrypt(encrypted_data)
-                    accounts = json.loads(decrypted_data.decode())
-                    log_event("Accounts loaded successfully")
-                    return accounts
+                    decrypted_data = self.cipher.decrypt(f.read())
+                # Parse the bytes directly; no extra decoded str copy
+                accounts = json.loads(decrypted_data)
+                log_event("Accounts loaded successfully")
+                return accounts
             return []
         except Exception as e:
             log_error(f"Failed to load accounts: {str(e)}")
@@ -58,8 +49,7 @@ class AccountStore:
             encrypted_data = self.cipher.encrypt(
                 json.dumps(self.accounts).encode()
             )
-            with open(self.data_file, 'wb') as f:
-                f.write(encrypted_data)
+            atomic_write(self.data_file, encrypted_data)
             log_event("Accounts saved successfully")
             return True
         except Exception as e:
@@ -78,25 +68,28 @@ class AccountStore:
             'password_history': []
         }
         self.accounts.append(account)
+        self._by_id[account['id']] = account
+        self.search_index.add(account)
         return self.save_accounts()
 
     def update_account(self, account_id, website, username, password):
         """Update an existing account."""
-        for account in self.accounts:
-            if account['id'] == account_id:
-                # Store old password in history
-                if account['password'] != password:
-                    account['password_history'].append({
-                        'password': account['password'],
-                        'timestamp': datetime.now().timestamp()
-                    })
-                # Update account
-                account['website'] = website
-                account['username'] = username
-                account['password'] = password
-                account['modified_at'] = datetime.now().timestamp()
-                return self.save_accounts()
-        return False
+        account = self._by_id.get(account_id)
+        if account is None:
+            return False
+        # Store old password in history
+        if account['password'] != password:
+            account['password_history'].append({
+                'password': account['password'],
+                'timestamp': datetime.now().timestamp()
+            })
+        # Update account
+        account['website'] = website
+        account['username'] = username
+        account['password'] = password
+        account['modified_at'] = datetime.now().timestamp()
+        self.search_index.add(account)
+        return self.save_accounts()
 
     def _generate_id(self):
         """Generate a unique account ID."""
@@ -108,16 +101,8 @@ class AccountStore:
         if not search_term:
             return self.accounts
             
-        search_term = search_term.lower()
-        return [
-            acc for acc in self.accounts
-            if search_term in acc['website'].lower() or 
-               search_term in acc['username'].lower()
-        ]
+        return self.search_index.search(search_term)
 
     def get_account(self, account_id):
         """Get a specific account by ID."""
-        for account in self.accounts:
-            if account['id'] == account_id:
-                return account
-        return None 
\ No newline at end of file
+        return self._by_id.get(account_id) 
\ No newline at end of file
@@ -0,0 +1,100 @@
+# data/backup_archive.py
+"""Single-file backup archives and the backup catalog.
+
+An archive is ``ARCHIVE_HEADER | zlib(manifest JSON) | SHA-256`` where the
+digest covers everything before it. The manifest lists the chunks of
+every file in the backup (see data/chunk_store.py); it holds no secrets.
+
+The catalog (``catalog.json``) keeps a summary of every archive so that
+listing backups is one read. It is rewritten atomically whenever a
+backup is created or deleted, and rebuilt from the archives when it is
+missing or unreadable.
+"""
+import hashlib
+import json
+import struct
+import zlib
+from utils.durable_io import atomic_write
+
+ARCHIVE_MAGIC = b"AVBK"
+ARCHIVE_VERSION = 1
+ARCHIVE_SUFFIX = ".avbk"
+CATALOG_FILE = "catalog.json"
+CATALOG_FORMAT = 1
+
+COMPRESSION_ZLIB = 1
+ZLIB_LEVEL = 9
+
+# magic, version, compression, compressed manifest length
+ARCHIVE_HEADER = struct.Struct(">4sBBI")
+CHECKSUM_SIZE = hashlib.sha256().digest_size
+
+def pack_archive(manifest):
+    """Serialize a manifest dict into archive bytes."""
+    payload = zlib.compress(json.dumps(manifest, separators=(',', ':')).encode('utf-8'), ZLIB_LEVEL)
+    data = ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, COMPRESSION_ZLIB, len(payload)) + payload
+    return data + hashlib.sha256(data).digest()
+
+def unpack_archive(data):
+    """Check and parse archive bytes into the manifest dict.
+
+    Raises ValueError for anything that is not an intact archive.
+    """
+    if len(data) < ARCHIVE_HEADER.size + CHECKSUM_SIZE:
+        raise ValueError("Backup archive is truncated")
+    magic, version, compression, length = ARCHIVE_HEADER.unpack_from(data)
+    if magic != ARCHIVE_MAGIC:
+        raise ValueError("Not a backup archive")
+    if version != ARCHIVE_VERSION or compression != COMPRESSION_ZLIB:
+        raise ValueError(f"Unsupported backup archive version {version}")
+    end = ARCHIVE_HEADER.size + length
+    if end + CHECKSUM_SIZE != len(data):
+        raise ValueError("Backup archive is truncated")
+    if hashlib.sha256(data[:end]).digest() != data[end:]:
+        raise ValueError("Backup archive checksum mismatch")
+    try:
+        return json.loads(zlib.decompress(data[ARCHIVE_HEADER.size:end]).decode('utf-8'))
+    except (zlib.error, UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"Backup archive manifest is corrupted: {str(e)}")
+
+def write_archive(path, manifest):
+    """Atomically write manifest as an archive; returns its checksum (hex)."""
+    data = pack_archive(manifest)
+    atomic_write(path, data)
+    return data[-CHECKSUM_SIZE:].hex()
+
+def read_archive(path):
+    """Read and check one archive; returns ``(manifest, checksum hex)``."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return unpack_archive(data), data[-CHECKSUM_SIZE:].hex()
+
+def summarize(name, manifest, checksum):
+    """Catalog entry of one backup."""
+    return {
+        "name": name,
+        "created_at": manifest["created_at"],
+        "files": manifest["files"],
+        "size": manifest.get("size"),
+        "stored": manifest.get("stored"),
+        "encrypted": manifest.get("encrypted", False),
+        "content_hash": manifest.get("content_hash"),
+        "checksum": checksum
+    }
+
+def load_catalog(path):
+    """Catalog entries by backup name, or None when there is no usable
+    catalog."""
+    try:
+        with open(path, 'r') as f:
+            catalog = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(catalog, dict) or catalog.get("format") != CATALOG_FORMAT:
+        return None
+    return {entry["name"]: entry for entry in catalog["backups"]}
+
+def save_catalog(path, entries):
+    """Atomically write catalog entries (a dict by name), oldest first."""
+    backups = sorted(entries.values(), key=lambda entry: entry["created_at"])
+    atomic_write(path, json.dumps({"format": CATALOG_FORMAT, "backups": backups}, indent=1))
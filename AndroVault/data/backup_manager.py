@@ -1,16 +1,90 @@
+import contextlib
+import hashlib
+import mmap
 import os
 import shutil
-from datetime import datetime
+import tempfile
+import threading
+import zlib
+from datetime import datetime, timedelta
 import json
+from constants import MASTER_PASSWORD_FILE, TWO_FA_FILE
+from data.backup_archive import (
+    ARCHIVE_SUFFIX, CATALOG_FILE, read_archive, write_archive, summarize, load_catalog, save_catalog
+)
+from data.backup_verify import BackupVerifier
+from data.chunk_store import ChunkStore, CHUNKS_DIR, STORE_KEY_FILE, load_secret, wrap_secret
+from data.vault_format import (
+    VaultHeader, MAX_HEADER_SIZE, CHUNK_SIZE, iter_vault_records, split_records, write_vault_batches
+)
+from data.vault_storage import STORAGE_BACKENDS
 from logger import log_event, log_error
+from utils.durable_io import atomic_stream
+from utils.kdf import KDFParams
+from utils.metrics import timed, increment
+from utils.stream_crypto import DEFAULT_CHUNK_SIZE
+
+ENCRYPTED_SUFFIX = ".enc"
+# Temporary files of rekey()
+REKEY_SUFFIX = ".rekey"
+MANIFEST_FILE = "backup_info.json"
+# 1: a directory of file copies (optionally stream-encrypted)
+# 2: a manifest of chunks in the shared ChunkStore, in a directory
+# 3: the same manifest in a single archive file (data/backup_archive.py)
+MANIFEST_FORMAT = 3
+
+VAULT_FILE = STORAGE_BACKENDS['binary'][1]
+# Other files are cut into fixed-size chunks
+FILE_CHUNK_SIZE = 1024 * 1024
+# Vault records are grouped into chunks that end after a record whose ID
+# hashes to zero under this mask (about 256 records, ~50 KB), so editing
+# one account changes one chunk and inserting or deleting accounts does
+# not shift the others
+RECORD_BOUNDARY_MASK = 0xFF
+MAX_RECORD_CHUNK = 256 * 1024
 
 class BackupManager:
-    def __init__(self, data_dir="data", backup_dir="backups"):
-        """Initialize backup manager."""
+    def __init__(self, data_dir="data", backup_dir="backups", session_key=None,
+                 keep_backups=None, max_age_days=None):
+        """
+        Initialize backup manager.
+
+        Args:
+            data_dir: Directory holding the vault files
+            backup_dir: Directory backups are created in
+            session_key: CryptoService; when given, backup chunks are
+                encrypted and the binary vault is stored by record so
+                unchanged accounts are kept once across backups
+            keep_backups: Keep at most this many backups (None: all)
+            max_age_days: Delete backups older than this (None or 0: never);
+                the newest backup is always kept
+        """
         self.data_dir = data_dir
         self.backup_dir = backup_dir
+        self.session_key = session_key
+        self.keep_backups = keep_backups
+        self.max_age_days = max_age_days
+        self._lock = threading.RLock()
+        self._store = None
         self.ensure_directories()
 
+    def files_to_backup(self):
+        """Vault files of every storage format plus the auth files."""
+        files = [os.path.join(self.data_dir, name) for _, name in STORAGE_BACKENDS.values()]
+        return files + [MASTER_PASSWORD_FILE, TWO_FA_FILE]
+
+    def set_session_key(self, session_key):
+        """Switch to another key, e.g. after a master password change."""
+        with self._lock:
+            self.session_key = session_key
+            self._store = None
+
+    def store(self):
+        """The shared chunk store, opened on first use."""
+        if self._store is None:
+            self._store = ChunkStore.open(self.backup_dir, self.session_key)
+        return self._store
+
     def ensure_directories(self):
         """Create necessary directories if they don't exist."""
         try:
@@ -19,86 +93,469 @@ class BackupManager:
         except Exception as e:
             log_error(f"Failed to create backup directory: {str(e)}")
 
-    def create_backup(self):
-        """Create a backup of all data files."""
+    def _new_backup_name(self):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        name = f"backup_{timestamp}"
+        suffix = 1
+        while (os.path.exists(os.path.join(self.backup_dir, name))
+               or os.path.exists(self._archive_path(name))):
+            suffix += 1
+            name = f"backup_{timestamp}_{suffix}"
+        return timestamp, name
+
+    def _archive_path(self, name):
+        return os.path.join(self.backup_dir, name + ARCHIVE_SUFFIX)
+
+    @timed("backup.content_hash")
+    def content_hash(self):
+        """SHA-256 (hex) over the names and contents of the files to back up.
+
+        Saves only rewrite the vault when accounts change, so an equal hash
+        means a new backup would restore exactly what the last one does.
+        """
+        digest = hashlib.sha256()
+        for file in self.files_to_backup():
+            digest.update(file.encode('utf-8') + b'\0')
+            if not os.path.exists(file):
+                digest.update(b'-')
+                continue
+            digest.update(str(os.path.getsize(file)).encode() + b'\0')
+            with open(file, 'rb') as f:
+                for block in iter(lambda: f.read(FILE_CHUNK_SIZE), b''):
+                    digest.update(block)
+        return digest.hexdigest()
+
+    @timed("backup.create")
+    def create_backup(self, content_hash=None):
+        """Create a backup of all data files.
+
+        Args:
+            content_hash: content_hash() if the caller already computed it
+        """
         try:
-            # Create timestamp for backup name
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = os.path.join(self.backup_dir, f"backup_{timestamp}")
-            os.makedirs(backup_path)
-
-            # Copy data files
-            files_to_backup = [
-                "accounts.dat",
-                "salt.key",
-                "master.hash",
-                "2fa.key"
-            ]
-
-            for file in files_to_backup:
-                if os.path.exists(file):
-                    shutil.copy2(file, backup_path)
-
-            # Create backup info
-            backup_info = {
-                "timestamp": timestamp,
-                "files": files_to_backup,
-                "created_at": datetime.now().isoformat()
-            }
-
-            # Save backup info
-            with open(os.path.join(backup_path, "backup_info.json"), 'w') as f:
-                json.dump(backup_info, f, indent=4)
-
-            log_event(f"Backup created successfully: backup_{timestamp}")
+            with self._lock:
+                if content_hash is None:
+                    content_hash = self.content_hash()
+                store = self.store()
+                written = store.bytes_written
+                timestamp, name = self._new_backup_name()
+
+                files_to_backup = self.files_to_backup()
+                entries = {}
+                for file in files_to_backup:
+                    if os.path.exists(file):
+                        entries[os.path.basename(file)] = self._store_file(file, store, self.session_key)
+
+                backup_info = {
+                    "format": MANIFEST_FORMAT,
+                    "timestamp": timestamp,
+                    "files": files_to_backup,
+                    "encrypted": store.encrypted,
+                    "key_salt": self.session_key.salt.hex() if self.session_key else None,
+                    "created_at": datetime.now().isoformat(),
+                    "size": sum(entry["size"] for entry in entries.values()),
+                    "stored": store.bytes_written - written,
+                    "content_hash": content_hash,
+                    "entries": entries
+                }
+                # The archive goes after its chunks: a crash before it
+                # leaves only unreferenced chunks, which the next prune
+                # removes
+                checksum = write_archive(self._archive_path(name), backup_info)
+                catalog = self._catalog()
+                catalog[name] = summarize(name, backup_info, checksum)
+                save_catalog(self._catalog_path(), catalog)
+
+                log_event(f"Backup created successfully: {name} "
+                          f"({backup_info['stored']} of {backup_info['size']} bytes new)")
+                self.prune_backups()
             return True
 
         except Exception as e:
             log_error(f"Failed to create backup: {str(e)}")
+            increment("backup.create_failed")
             return False
 
+    def _store_file(self, path, store, session_key):
+        """Chunk one file into the store; returns its manifest entry."""
+        if store.encrypted and os.path.basename(path) == VAULT_FILE:
+            try:
+                return self._store_vault(path, store, session_key)
+            except ValueError as e:
+                # Version 1 vaults have no stable records; copy them whole
+                log_event(f"Backing up {path} as a plain file: {str(e)}")
+        chunks = []
+        with open(path, 'rb') as f:
+            while True:
+                data = f.read(FILE_CHUNK_SIZE)
+                if not data:
+                    break
+                chunks.append(store.put(data))
+        return {"kind": "file", "size": os.path.getsize(path), "chunks": chunks}
+
+    def _store_vault(self, path, store, session_key):
+        """Store a binary vault by record; see RECORD_BOUNDARY_MASK."""
+        size = os.path.getsize(path)
+        if not size:
+            raise ValueError("empty vault")
+        chunks = []
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                header, records = iter_vault_records(mapped, session_key)
+                group = []
+                group_size = 0
+                for account_id, record in records:
+                    group.append(record)
+                    group_size += len(record)
+                    if (zlib.crc32(account_id) & RECORD_BOUNDARY_MASK == 0
+                            or group_size >= MAX_RECORD_CHUNK):
+                        chunks.append([store.put(b''.join(group)), len(group)])
+                        group = []
+                        group_size = 0
+                if group:
+                    chunks.append([store.put(b''.join(group)), len(group)])
+        return {
+            "kind": "vault",
+            "size": size,
+            "salt": header.salt.hex(),
+            "kdf": header.kdf.to_dict(),
+            "compression": header.compression,
+            "count": header.count,
+            "chunks": chunks
+        }
+
+    def _restore_entry(self, entry, target_path, store, session_key):
+        """Write a manifest entry back to target_path atomically."""
+        with atomic_stream(target_path) as target:
+            self._write_entry(entry, target, store, session_key)
+
+    def _write_entry(self, entry, target, store, session_key):
+        """Write the file a manifest entry describes into target."""
+        if entry["kind"] == "vault":
+            write_vault_batches(
+                target,
+                self._vault_batches(entry, store),
+                entry["count"],
+                session_key,
+                bytes.fromhex(entry["salt"]),
+                KDFParams.from_dict(entry["kdf"]),
+                entry["compression"]
+            )
+        else:
+            for chunk_id in entry["chunks"]:
+                target.write(store.get(chunk_id))
+
+    def _vault_batches(self, entry, store):
+        """Regroup stored record chunks into vault-sized batches."""
+        parts = []
+        count = 0
+        size = 0
+        for chunk_id, records in entry["chunks"]:
+            data = store.get(chunk_id)
+            # Walk the records so a chunk with the wrong count fails here
+            # rather than producing an unreadable vault
+            for _ in split_records(data, records):
+                pass
+            parts.append(data)
+            count += records
+            size += len(data)
+            if size >= CHUNK_SIZE:
+                yield count, b''.join(parts)
+                parts = []
+                count = 0
+                size = 0
+        if parts:
+            yield count, b''.join(parts)
+
+    @timed("backup.restore")
     def restore_backup(self, backup_name):
-        """Restore from a specific backup."""
+        """Restore from a specific backup.
+
+        The backup is verified first (see verify_backups), then every file
+        is written next to its target and only once all of them are
+        complete are they renamed over the current files, so a bad backup
+        leaves the vault untouched.
+        """
         try:
-            backup_path = os.path.join(self.backup_dir, backup_name)
-            
-            # Verify backup exists
-            if not os.path.exists(backup_path):
-                raise FileNotFoundError("Backup not found")
-
-            # Read backup info
-            with open(os.path.join(backup_path, "backup_info.json"), 'r') as f:
-                backup_info = json.load(f)
-
-            # Restore files
-            for file in backup_info["files"]:
-                backup_file = os.path.join(backup_path, file)
-                if os.path.exists(backup_file):
-                    shutil.copy2(backup_file, file)
+            errors = self.verify_backups([backup_name])[backup_name]
+            if errors:
+                raise ValueError(f"Backup failed verification: {'; '.join(errors[:3])}")
+            backup_info = self.read_manifest(backup_name)
+            encrypted = backup_info.get("encrypted", False)
+
+            with self._lock, contextlib.ExitStack() as swap:
+                if backup_info.get("format", 1) == 1:
+                    self._restore_copies(os.path.join(self.backup_dir, backup_name), backup_info, swap)
+                else:
+                    store = self.store() if encrypted else ChunkStore(self.backup_dir)
+                    for file in backup_info["files"]:
+                        entry = backup_info["entries"].get(os.path.basename(file))
+                        if entry is not None:
+                            target = swap.enter_context(atomic_stream(file))
+                            self._write_entry(entry, target, store, self.session_key)
 
             log_event(f"Backup restored successfully: {backup_name}")
             return True
 
         except Exception as e:
             log_error(f"Failed to restore backup: {str(e)}")
+            increment("backup.restore_failed")
             return False
 
+    @timed("backup.verify")
+    def verify_backups(self, names=None, workers=None, force=False):
+        """
+        Check that backups are intact and decrypt (see data/backup_verify.py).
+
+        Args:
+            names: Backups to check (default: all)
+            workers: Worker processes (default: one per CPU)
+            force: Re-read chunks that already passed
+        Returns:
+            {backup name: list of problems}; an empty list means intact
+        """
+        names = names if names is not None else [b["name"] for b in self.list_backups()]
+        results = {}
+        manifests = {}
+        for name in names:
+            try:
+                manifest = self.read_manifest(name)
+            except (OSError, ValueError) as e:
+                results[name] = [str(e)]
+                continue
+            if manifest.get("format", 1) == 1:
+                results[name] = self._verify_copies(os.path.join(self.backup_dir, name), manifest)
+            else:
+                manifests[name] = manifest
+        if manifests:
+            verifier = BackupVerifier(self.backup_dir, self.session_key, workers, force)
+            results.update(verifier.verify(manifests))
+        bad = sorted(name for name, errors in results.items() if errors)
+        if bad:
+            log_error(f"Backup verification failed for {len(bad)} of {len(results)} backups: {', '.join(bad)}")
+        else:
+            log_event(f"Backup verification passed for {len(results)} backups")
+        return results
+
+    def _verify_copies(self, backup_path, backup_info):
+        """Check a format 1 backup: encrypted copies must decrypt fully."""
+        if not backup_info.get("encrypted", False):
+            return []
+        if self.session_key is None:
+            return ["Backup is encrypted but no session key was given"]
+        errors = []
+        for file in backup_info["files"]:
+            backup_file = os.path.join(backup_path, os.path.basename(file)) + ENCRYPTED_SUFFIX
+            if not os.path.exists(backup_file):
+                continue
+            try:
+                with open(backup_file, 'rb') as source, self.session_key.stream_reader(source) as reader:
+                    while reader.read(DEFAULT_CHUNK_SIZE):
+                        pass
+            except (OSError, ValueError) as e:
+                errors.append(f"{os.path.basename(backup_file)}: {str(e)}")
+        return errors
+
+    def read_manifest(self, backup_name):
+        """Manifest of a backup, from its archive or (older backups) its
+        directory. Raises ValueError for a damaged archive."""
+        archive_path = self._archive_path(backup_name)
+        if os.path.exists(archive_path):
+            return read_archive(archive_path)[0]
+        info_file = os.path.join(self.backup_dir, backup_name, MANIFEST_FILE)
+        if not os.path.exists(info_file):
+            raise FileNotFoundError("Backup not found")
+        with open(info_file, 'r') as f:
+            return json.load(f)
+
+    def _restore_copies(self, backup_path, backup_info, swap):
+        """Stage a format 1 backup (a directory of file copies) into swap."""
+        encrypted = backup_info.get("encrypted", False)
+        for file in backup_info["files"]:
+            backup_file = os.path.join(backup_path, os.path.basename(file))
+            if encrypted:
+                backup_file += ENCRYPTED_SUFFIX
+            if not os.path.exists(backup_file):
+                continue
+            target = swap.enter_context(atomic_stream(file))
+            with open(backup_file, 'rb') as source:
+                if encrypted:
+                    with self.session_key.stream_reader(source) as reader:
+                        shutil.copyfileobj(reader, target, DEFAULT_CHUNK_SIZE)
+                else:
+                    shutil.copyfileobj(source, target, DEFAULT_CHUNK_SIZE)
+
     def list_backups(self):
-        """List all available backups."""
+        """List all available backups, oldest first, from the catalog."""
         try:
-            backups = []
-            for backup in os.listdir(self.backup_dir):
-                info_file = os.path.join(self.backup_dir, backup, "backup_info.json")
-                if os.path.exists(info_file):
-                    with open(info_file, 'r') as f:
-                        info = json.load(f)
-                        backups.append({
-                            "name": backup,
-                            "created_at": info["created_at"],
-                            "files": info["files"]
-                        })
-            return backups
+            catalog = load_catalog(self._catalog_path())
+            if catalog is None:
+                catalog = self.rebuild_catalog()
+            return sorted(catalog.values(), key=lambda b: b["created_at"])
         except Exception as e:
             log_error(f"Failed to list backups: {str(e)}")
             return []
-``` 
\ No newline at end of file
+
+    def _catalog_path(self):
+        return os.path.join(self.backup_dir, CATALOG_FILE)
+
+    def _catalog(self):
+        catalog = load_catalog(self._catalog_path())
+        return catalog if catalog is not None else self.rebuild_catalog()
+
+    def rebuild_catalog(self):
+        """Rewrite the catalog from the archives and backup directories."""
+        with self._lock:
+            catalog = {name: summarize(name, manifest, checksum)
+                       for name, manifest, checksum in self._scan()}
+            save_catalog(self._catalog_path(), catalog)
+            log_event(f"Backup catalog rebuilt: {len(catalog)} backups")
+            return catalog
+
+    def _scan(self):
+        """(name, manifest, checksum) of every backup on disk.
+
+        Reads every archive, so it is the source of truth the catalog is
+        built from; damaged archives are logged and skipped.
+        """
+        for name in os.listdir(self.backup_dir):
+            path = os.path.join(self.backup_dir, name)
+            if name.endswith(ARCHIVE_SUFFIX):
+                name = name[:-len(ARCHIVE_SUFFIX)]
+                try:
+                    yield (name,) + read_archive(path)
+                except ValueError as e:
+                    log_error(f"Skipping damaged backup {name}: {str(e)}")
+            elif os.path.exists(os.path.join(path, MANIFEST_FILE)):
+                with open(os.path.join(path, MANIFEST_FILE), 'r') as f:
+                    yield name, json.load(f), None
+
+    def delete_backup(self, backup_name):
+        """Delete one backup (its chunks go at the next garbage collection)."""
+        with self._lock:
+            archive_path = self._archive_path(backup_name)
+            if os.path.exists(archive_path):
+                os.remove(archive_path)
+            elif os.path.isdir(os.path.join(self.backup_dir, backup_name)):
+                shutil.rmtree(os.path.join(self.backup_dir, backup_name))
+            catalog = self._catalog()
+            catalog.pop(backup_name, None)
+            save_catalog(self._catalog_path(), catalog)
+            log_event(f"Backup deleted: {backup_name}")
+
+    @timed("backup.prune")
+    def prune_backups(self, keep_backups=None, max_age_days=None):
+        """
+        Delete backups beyond the retention limits, oldest first, then the
+        chunks no remaining backup uses.
+
+        Args:
+            keep_backups: Count limit (default: the manager's)
+            max_age_days: Age limit in days (default: the manager's)
+        Returns:
+            Number of backups deleted
+        """
+        keep_backups = keep_backups if keep_backups is not None else self.keep_backups
+        max_age_days = max_age_days if max_age_days is not None else self.max_age_days
+        try:
+            with self._lock:
+                backups = self.list_backups()
+                # The newest backup survives any limit
+                candidates = backups[:-1]
+                doomed = set()
+                if keep_backups:
+                    doomed.update(b["name"] for b in backups[:max(0, len(backups) - keep_backups)])
+                if max_age_days:
+                    cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+                    doomed.update(b["name"] for b in candidates if b["created_at"] < cutoff)
+
+                for name in sorted(doomed):
+                    self.delete_backup(name)
+                if doomed or keep_backups or max_age_days:
+                    self.collect_garbage()
+            return len(doomed)
+        except Exception as e:
+            log_error(f"Failed to prune backups: {str(e)}")
+            return 0
+
+    @timed("backup.collect_garbage")
+    def collect_garbage(self):
+        """Delete chunks no backup manifest refers to; returns bytes freed."""
+        with self._lock:
+            referenced = set()
+            catalog = {}
+            for name, info, checksum in self._scan():
+                catalog[name] = summarize(name, info, checksum)
+                for entry in info.get("entries", {}).values():
+                    for chunk in entry["chunks"]:
+                        referenced.add(chunk[0] if entry["kind"] == "vault" else chunk)
+            # The scan read every backup anyway; repair a catalog a crash
+            # left behind
+            if catalog != load_catalog(self._catalog_path()):
+                save_catalog(self._catalog_path(), catalog)
+            store = ChunkStore(self.backup_dir)
+            freed = 0
+            for chunk_id in list(store.ids()):
+                if chunk_id not in referenced:
+                    path = os.path.join(self.backup_dir, CHUNKS_DIR, chunk_id[:2], chunk_id)
+                    freed += os.path.getsize(path)
+                    store.delete(chunk_id)
+            if freed:
+                log_event(f"Backup store: freed {freed} bytes of unused chunks")
+            return freed
+
+    @timed("backup.rekey")
+    def rekey(self, new_key, rekey_file):
+        """
+        Move every chunked backup to new_key (used by data/rekey.py).
+
+        Each entry is restored to a temporary file, re-keyed there by
+        rekey_file(path, name) and stored again; identical entries across
+        backups are re-keyed once. Manifests already carrying the new salt
+        are skipped, so an interrupted run can be repeated.
+        """
+        with self._lock:
+            for name in os.listdir(self.backup_dir):
+                if name.endswith(REKEY_SUFFIX):
+                    # Left behind by an interrupted change
+                    os.remove(os.path.join(self.backup_dir, name))
+            secret = None
+            if os.path.exists(os.path.join(self.backup_dir, STORE_KEY_FILE)):
+                secret = load_secret(self.backup_dir, self.session_key, new_key)
+            # Backups made without a session key have plain chunks, though
+            # the files inside are still password-encrypted
+            stores = {True: ChunkStore(self.backup_dir, secret), False: ChunkStore(self.backup_dir)}
+            done = {}
+            for name, info, _ in sorted(self._scan(), key=lambda backup: backup[0]):
+                if info.get("format", 1) < 2 or info.get("key_salt") == new_key.salt.hex():
+                    continue
+                store = stores[info.get("encrypted", False)]
+                entries = {}
+                for filename, entry in info["entries"].items():
+                    key = json.dumps([store.encrypted, entry["chunks"]])
+                    if key not in done:
+                        done[key] = self._rekey_entry(entry, filename, store, new_key, rekey_file)
+                    entries[filename] = done[key]
+                info["entries"] = entries
+                info["key_salt"] = new_key.salt.hex()
+                info["format"] = MANIFEST_FORMAT
+                write_archive(self._archive_path(name), info)
+                # Format 2 directories become archives on the way
+                if os.path.isdir(os.path.join(self.backup_dir, name)):
+                    shutil.rmtree(os.path.join(self.backup_dir, name))
+            if secret is not None:
+                wrap_secret(self.backup_dir, secret, new_key)
+            self.set_session_key(new_key)
+            self.rebuild_catalog()
+            self.collect_garbage()
+
+    def _rekey_entry(self, entry, filename, store, new_key, rekey_file):
+        fd, temp_path = tempfile.mkstemp(dir=self.backup_dir, prefix=filename + ".", suffix=REKEY_SUFFIX)
+        os.close(fd)
+        try:
+            self._restore_entry(entry, temp_path, store, self.session_key)
+            rekey_file(temp_path, filename)
+            return self._store_file(temp_path, store, new_key)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
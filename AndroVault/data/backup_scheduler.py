@@ -0,0 +1,211 @@
+# data/backup_scheduler.py
+import contextlib
+import os
+import threading
+import time
+from datetime import datetime
+from logger import log_event, log_error, log_debug
+
+# Niceness of the backup thread; on Linux the default I/O scheduler class
+# derives the thread's disk priority from it
+BACKUP_NICENESS = 19
+
+class BackupTimings:
+    """Counts and durations of scheduled backup runs."""
+
+    def __init__(self):
+        self.runs = 0
+        self.skipped = 0
+        self.failed = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = None
+        self.hash_ms = 0.0
+
+    def record(self, elapsed_ms, hash_ms):
+        self.runs += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.last_ms = elapsed_ms
+        self.hash_ms += hash_ms
+
+    def as_dict(self):
+        return {
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "last_ms": self.last_ms,
+            "mean_ms": self.total_ms / self.runs if self.runs else None,
+            "max_ms": self.max_ms,
+            "hash_ms": self.hash_ms
+        }
+
+    def describe(self):
+        mean = self.total_ms / self.runs if self.runs else 0.0
+        return (f"{self.runs} backups ({self.skipped} skipped unchanged, {self.failed} failed), "
+                f"mean {mean:.0f} ms, max {self.max_ms:.0f} ms, "
+                f"{self.hash_ms:.0f} ms hashing")
+
+class BackupScheduler:
+    """Background auto-backup worker.
+
+    A backup is due once ``interval_hours`` have passed since the last one
+    or ``change_threshold`` account changes were recorded, whichever comes
+    first. Backups run on a low-priority daemon thread, never on the Tk
+    event loop, and are skipped when the files hash the same as at the
+    last backup. Nothing runs while the session key is locked.
+    """
+
+    def __init__(self, backup_manager, interval_hours=24, change_threshold=0,
+                 before_backup=None, poll_interval=60.0):
+        """
+        Initialize backup scheduler.
+
+        Args:
+            backup_manager: BackupManager the backups are made with
+            interval_hours: Hours between backups (0: only on changes)
+            change_threshold: Back up after this many changed accounts
+                (0: only on the interval)
+            before_backup: Called on the worker before each backup, e.g. to
+                flush queued saves
+            poll_interval: Longest sleep in seconds between due checks
+        """
+        self.backup_manager = backup_manager
+        self.interval = interval_hours * 3600
+        self.change_threshold = change_threshold
+        self.before_backup = before_backup
+        self.poll_interval = poll_interval
+        self.timings = BackupTimings()
+        self._condition = threading.Condition()
+        self._changes = 0
+        self._forced = False
+        self._paused = 0
+        self._running = False
+        self._closed = False
+        self._retry_at = None
+        self._last_backup = self._newest_backup_time()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+        log_event("Backup scheduler started")
+
+    def _newest_backup_time(self):
+        """Wall-clock time of the newest backup, so restarts keep the interval."""
+        backups = self.backup_manager.list_backups()
+        if not backups:
+            return None
+        return datetime.fromisoformat(backups[-1]["created_at"]).timestamp()
+
+    def record_changes(self, count=1):
+        """Count changed accounts; cheap enough for the Tk thread."""
+        with self._condition:
+            self._changes += count
+            if self.change_threshold and self._changes >= self.change_threshold:
+                self._condition.notify_all()
+
+    def backup_now(self):
+        """Run a backup on the worker as soon as possible."""
+        with self._condition:
+            self._forced = True
+            self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def paused(self):
+        """Hold off backups (waiting out a running one) inside the block."""
+        with self._condition:
+            self._paused += 1
+            while self._running:
+                self._condition.wait()
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._paused -= 1
+                self._condition.notify_all()
+
+    def _due_in(self):
+        """Seconds until the next backup is due (0: now)."""
+        if self._forced:
+            return 0
+        if self._retry_at is not None:
+            return max(0, self._retry_at - time.time())
+        if self.change_threshold and self._changes >= self.change_threshold:
+            return 0
+        if not self.interval:
+            return None
+        if self._last_backup is None:
+            return 0
+        return max(0, self._last_backup + self.interval - time.time())
+
+    def _run(self):
+        _lower_priority()
+        while True:
+            with self._condition:
+                while not self._closed:
+                    due_in = None if self._paused else self._due_in()
+                    if due_in == 0 and not self._locked():
+                        break
+                    self._condition.wait(timeout=min(due_in or self.poll_interval, self.poll_interval))
+                if self._closed:
+                    return
+                self._running = True
+                self._forced = False
+                changes, self._changes = self._changes, 0
+
+            try:
+                self._backup(changes)
+            finally:
+                with self._condition:
+                    self._running = False
+                    self._condition.notify_all()
+
+    def _locked(self):
+        session_key = self.backup_manager.session_key
+        return session_key is not None and session_key.is_locked
+
+    def _backup(self, changes):
+        start = time.perf_counter()
+        try:
+            if self.before_backup:
+                self.before_backup()
+            content_hash = self.backup_manager.content_hash()
+            hash_ms = (time.perf_counter() - start) * 1000
+            backups = self.backup_manager.list_backups()
+            if backups and backups[-1].get("content_hash") == content_hash:
+                self.timings.skipped += 1
+                self._retry_at = None
+                self._last_backup = time.time()
+                log_debug(f"Auto-backup skipped: nothing changed ({hash_ms:.0f} ms to check)")
+                return
+            if not self.backup_manager.create_backup(content_hash):
+                raise RuntimeError("create_backup failed")
+            self._retry_at = None
+            elapsed = (time.perf_counter() - start) * 1000
+            self.timings.record(elapsed, hash_ms)
+            self._last_backup = time.time()
+            log_event(f"Auto-backup after {changes} changes took {elapsed:.0f} ms "
+                      f"({hash_ms:.0f} ms hashing); {self.timings.describe()}")
+        except Exception as e:
+            self.timings.failed += 1
+            # Retry after a poll interval rather than a full backup interval
+            with self._condition:
+                self._changes += changes
+                self._retry_at = time.time() + self.poll_interval
+            log_error(f"Auto-backup failed: {str(e)}")
+
+    def close(self, timeout=None):
+        """Stop the worker, letting a running backup finish."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._worker.join(timeout)
+        log_event(f"Backup scheduler closed: {self.timings.describe()}")
+
+def _lower_priority():
+    """Drop the calling thread to the lowest CPU and I/O priority the OS
+    offers; a no-op where per-thread priorities are not available."""
+    if not hasattr(os, 'setpriority'):
+        return
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), BACKUP_NICENESS)
+    except OSError as e:
+        log_debug(f"Could not lower backup thread priority: {str(e)}")
@@ -0,0 +1,220 @@
+# data/backup_verify.py
+"""Integrity checks for chunked backups.
+
+Every chunk a backup refers to is read back, authenticated and hashed
+against its ID (ChunkStore.get). Vault chunks are also trial-decrypted:
+every sealed password and history field must open under the master
+password key. Token files (accounts.enc, 2fa.key) are reassembled and
+decrypted whole. Chunks are checked in a pool of worker processes.
+
+Chunks are content-addressed and written once, so a chunk that passed
+stays good until its file changes. Passes are cached in ``verified.json``
+by chunk ID with the file's size and mtime. Re-verifying costs a stat per
+chunk, and for new backups only the chunks they added are read.
+"""
+import hashlib
+import json
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from constants import TWO_FA_FILE
+from data.chunk_store import ChunkStore, CHUNKS_DIR, STORE_KEY_FILE, load_secret
+from data.vault_format import check_sealed_records
+from data.vault_storage import STORAGE_BACKENDS
+from logger import log_event, log_error
+from utils.durable_io import atomic_write
+from utils.kdf import KDFParams
+
+VERIFY_CACHE_FILE = "verified.json"
+# Salt | Fernet token files that can be trial-decrypted whole
+TOKEN_FILES = (STORAGE_BACKENDS['file'][1], os.path.basename(TWO_FA_FILE))
+# Below this many chunks starting the pool costs more than it saves
+PARALLEL_MIN_CHUNKS = 64
+# Tasks handed to a worker at a time
+TASKS_PER_BATCH = 16
+
+# {encrypted: ChunkStore} of a worker process, set by _init_worker
+_worker_stores = None
+_worker_ciphers = {}
+
+def _init_worker(root, secret):
+    global _worker_stores
+    _worker_stores = {True: ChunkStore(root, secret) if secret else None, False: ChunkStore(root)}
+    _worker_ciphers.clear()
+
+def _verify_chunk(task):
+    """Check one chunk; returns ``(chunk_id, error or None)``."""
+    chunk_id, encrypted, count, aead_key = task
+    try:
+        store = _worker_stores[encrypted]
+        if store is None:
+            raise ValueError("Backup store key is missing")
+        data = store.get(chunk_id)
+        if count is not None:
+            aead = _worker_ciphers.get(aead_key)
+            if aead is None:
+                aead = _worker_ciphers[aead_key] = AESGCM(aead_key)
+            check_sealed_records(data, count, aead)
+        return chunk_id, None
+    except (OSError, ValueError, zlib.error) as e:
+        return chunk_id, str(e)
+
+def _entry_key(entry):
+    return "entry:" + hashlib.sha256(json.dumps(entry["chunks"]).encode()).hexdigest()
+
+class BackupVerifier:
+    """Checks chunked backups (see module docstring)."""
+
+    def __init__(self, root, session_key=None, workers=None, force=False):
+        """
+        Initialize verifier.
+
+        Args:
+            root: Backup directory
+            session_key: CryptoService for encrypted backups
+            workers: Worker processes (default: one per CPU)
+            force: Ignore cached passes and read every chunk
+        """
+        self.root = root
+        self.session_key = session_key
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.force = force
+        self._chunks_dir = os.path.join(root, CHUNKS_DIR)
+        self._aead_keys = {}
+        # Distinct chunks read and skipped as already verified
+        self.checked = 0
+        self.cached = 0
+
+    def verify(self, manifests):
+        """
+        Check backups.
+
+        Args:
+            manifests: {backup name: manifest} of format 2+ backups
+        Returns:
+            {backup name: list of error strings (empty when intact)}
+        """
+        secret = None
+        key_error = "Backup is encrypted but there is no session key or store key"
+        if (self.session_key is not None and os.path.exists(os.path.join(self.root, STORE_KEY_FILE))
+                and any(m.get("encrypted") for m in manifests.values())):
+            try:
+                secret = load_secret(self.root, self.session_key)
+            except ValueError as e:
+                key_error = str(e)
+        fingerprint = ChunkStore(self.root, secret).chunk_id(b"verified")
+        cache = {} if self.force else self._load_cache(fingerprint)
+
+        errors = {name: [] for name in manifests}
+        tasks = {}
+        cached = set()
+        users = {}
+        for name, manifest in manifests.items():
+            encrypted = manifest.get("encrypted", False)
+            if encrypted and secret is None:
+                errors[name].append(key_error)
+                continue
+            for filename, entry in manifest["entries"].items():
+                aead_key = self._aead_key(entry) if entry["kind"] == "vault" else None
+                for chunk in entry["chunks"]:
+                    chunk_id, count = chunk if entry["kind"] == "vault" else (chunk, None)
+                    users.setdefault(chunk_id, set()).add(name)
+                    signature = self._signature(chunk_id)
+                    if signature is None:
+                        errors[name].append(f"{filename}: chunk {chunk_id} is missing")
+                    elif cache.get(chunk_id) == signature:
+                        cached.add(chunk_id)
+                    else:
+                        tasks[chunk_id] = (chunk_id, encrypted, count, aead_key)
+
+        self.cached = len(cached)
+        failed = {}
+        for chunk_id, error in self._run(tasks.values(), secret):
+            self.checked += 1
+            if error:
+                failed[chunk_id] = error
+                cache.pop(chunk_id, None)
+            else:
+                cache[chunk_id] = self._signature(chunk_id)
+        for chunk_id, error in failed.items():
+            for name in users[chunk_id]:
+                errors[name].append(error)
+
+        store = ChunkStore(self.root, secret)
+        for name, manifest in manifests.items():
+            if errors[name] or not manifest.get("encrypted"):
+                continue
+            for filename, entry in manifest["entries"].items():
+                if filename in TOKEN_FILES and not cache.get(_entry_key(entry)):
+                    error = self._check_token_file(entry, store)
+                    if error:
+                        errors[name].append(f"{filename}: {error}")
+                    else:
+                        cache[_entry_key(entry)] = True
+
+        # Forget chunks garbage collection has deleted since
+        for key in list(cache):
+            if not key.startswith("entry:") and key not in users and self._signature(key) is None:
+                del cache[key]
+        self._save_cache(fingerprint, cache)
+        return errors
+
+    def _aead_key(self, entry):
+        if self.session_key is None:
+            return None
+        key = (entry["salt"], json.dumps(entry["kdf"], sort_keys=True))
+        if key not in self._aead_keys:
+            self._aead_keys[key] = self.session_key.aead_key(
+                bytes.fromhex(entry["salt"]), KDFParams.from_dict(entry["kdf"])
+            )
+        return self._aead_keys[key]
+
+    def _signature(self, chunk_id):
+        try:
+            stat = os.stat(os.path.join(self._chunks_dir, chunk_id[:2], chunk_id))
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _run(self, tasks, secret):
+        tasks = list(tasks)
+        if self.workers > 1 and len(tasks) >= PARALLEL_MIN_CHUNKS:
+            with ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                     initargs=(self.root, secret)) as executor:
+                yield from executor.map(_verify_chunk, tasks, chunksize=TASKS_PER_BATCH)
+            return
+        _init_worker(self.root, secret)
+        try:
+            for task in tasks:
+                yield _verify_chunk(task)
+        finally:
+            _init_worker(self.root, None)
+
+    def _check_token_file(self, entry, store):
+        try:
+            data = b''.join(store.get(chunk_id) for chunk_id in entry["chunks"])
+            if data:
+                self.session_key.decrypt_secret(data)
+            return None
+        except (OSError, ValueError, zlib.error) as e:
+            return str(e)
+
+    def _load_cache(self, fingerprint):
+        """Cached passes, or none when they were made with another store key."""
+        try:
+            with open(os.path.join(self.root, VERIFY_CACHE_FILE), 'r') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if cache.get("store") != fingerprint:
+            return {}
+        return cache.get("verified", {})
+
+    def _save_cache(self, fingerprint, cache):
+        try:
+            atomic_write(os.path.join(self.root, VERIFY_CACHE_FILE),
+                         json.dumps({"store": fingerprint, "verified": cache}))
+        except OSError as e:
+            log_error(f"Failed to save backup verification cache: {str(e)}")
+        log_event(f"Backup chunks verified: {self.checked} read, {self.cached} cached")
@@ -0,0 +1,146 @@
+# data/chunk_store.py
+"""Content-addressed chunk storage for backups.
+
+Chunks live in ``<root>/chunks/<id[:2]>/<id>`` and are written once, so
+storing data that is already there costs a stat. With a store secret
+(encrypted backups) a chunk ID is HMAC-SHA256 of the content, so IDs say
+nothing about the data, and a chunk is ``nonce | AES-GCM(zlib(data))``
+with the ID as associated data. Without one, IDs are plain SHA-256 and
+chunks are only compressed.
+
+The secret is random and kept in ``<root>/store.key`` wrapped by the
+master password key (``salt | Fernet token``, like 2fa.key), so changing
+the password only rewraps it.
+"""
+import hashlib
+import hmac
+import os
+import zlib
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from logger import log_event
+from utils.durable_io import atomic_write
+
+CHUNKS_DIR = "chunks"
+STORE_KEY_FILE = "store.key"
+# AES-GCM key followed by the chunk ID (HMAC) key
+SECRET_SIZE = 64
+NONCE_SIZE = 12
+# Backups are not on the save path; trade some speed for size
+ZLIB_LEVEL = 6
+
+class ChunkStore:
+    """Write-once chunks addressed by content (see module docstring)."""
+
+    def __init__(self, root, secret=None):
+        """
+        Initialize chunk store.
+
+        Args:
+            root: Backup directory the chunks directory lives in
+            secret: SECRET_SIZE random bytes for encrypted chunks, or None
+        """
+        self.root = root
+        self.secret = secret
+        self._aead = AESGCM(secret[:32]) if secret else None
+        self._chunks_dir = os.path.join(root, CHUNKS_DIR)
+        # Bytes actually written by put(), for backup size reports
+        self.bytes_written = 0
+
+    @classmethod
+    def open(cls, root, session_key=None):
+        """Open the store under root, creating its secret on first use.
+
+        Without a session key the store holds unencrypted chunks.
+        """
+        if session_key is None:
+            return cls(root)
+        return cls(root, load_secret(root, session_key))
+
+    @property
+    def encrypted(self):
+        return self.secret is not None
+
+    def chunk_id(self, data):
+        """Content address of data."""
+        if self.secret:
+            return hmac.new(self.secret[32:], data, hashlib.sha256).hexdigest()
+        return hashlib.sha256(data).hexdigest()
+
+    def _path(self, chunk_id):
+        return os.path.join(self._chunks_dir, chunk_id[:2], chunk_id)
+
+    def has(self, chunk_id):
+        return os.path.exists(self._path(chunk_id))
+
+    def put(self, data):
+        """Store data unless already present; returns its chunk ID."""
+        chunk_id = self.chunk_id(data)
+        path = self._path(chunk_id)
+        if os.path.exists(path):
+            return chunk_id
+        blob = zlib.compress(data, ZLIB_LEVEL)
+        if self._aead:
+            nonce = os.urandom(NONCE_SIZE)
+            blob = nonce + self._aead.encrypt(nonce, blob, chunk_id.encode())
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        atomic_write(path, blob)
+        self.bytes_written += len(blob)
+        return chunk_id
+
+    def get(self, chunk_id):
+        """Read and check one chunk."""
+        with open(self._path(chunk_id), 'rb') as f:
+            blob = f.read()
+        if self._aead:
+            try:
+                blob = self._aead.decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], chunk_id.encode())
+            except InvalidTag:
+                raise ValueError(f"Backup chunk {chunk_id} failed authentication")
+        data = zlib.decompress(blob)
+        if not hmac.compare_digest(self.chunk_id(data), chunk_id):
+            raise ValueError(f"Backup chunk {chunk_id} is corrupted")
+        return data
+
+    def delete(self, chunk_id):
+        os.remove(self._path(chunk_id))
+
+    def ids(self):
+        """Every stored chunk ID."""
+        if not os.path.isdir(self._chunks_dir):
+            return
+        for prefix in os.listdir(self._chunks_dir):
+            directory = os.path.join(self._chunks_dir, prefix)
+            for name in os.listdir(directory):
+                if not name.endswith(".tmp"):
+                    yield name
+
+    def disk_usage(self):
+        """Bytes used by the stored chunks."""
+        return sum(os.path.getsize(self._path(chunk_id)) for chunk_id in self.ids())
+
+def load_secret(root, session_key, *fallback_keys):
+    """Unwrap the store secret under root, creating it if there is none.
+
+    ``fallback_keys`` are tried when session_key cannot unwrap it (a
+    password change that stopped after rewrapping the secret).
+    """
+    path = os.path.join(root, STORE_KEY_FILE)
+    if not os.path.exists(path):
+        secret = os.urandom(SECRET_SIZE)
+        os.makedirs(root, exist_ok=True)
+        atomic_write(path, session_key.encrypt_secret(secret))
+        log_event("Backup store key created")
+        return secret
+    with open(path, 'rb') as f:
+        wrapped = f.read()
+    for key in (session_key,) + fallback_keys:
+        try:
+            return key.decrypt_secret(wrapped)
+        except ValueError:
+            continue
+    raise ValueError("Backup store key failed authentication (wrong password?)")
+
+def wrap_secret(root, secret, session_key):
+    """Store the secret under root wrapped by session_key."""
+    atomic_write(os.path.join(root, STORE_KEY_FILE), session_key.encrypt_secret(secret))
@@ -0,0 +1,437 @@
+# data/rekey.py
+"""Master password change: re-encrypt everything keyed by the password.
+
+In order:
+
+* the vault of every storage format in the data directory
+* the 2FA secret (2fa.key)
+* every backup, including its copies of the files above
+* master.hash, last, so the old password keeps unlocking until the rest
+  is done
+
+Binary vaults are streamed chunk by chunk. The sealed password fields of
+each chunk are moved to the new key by a pool of worker processes, so a
+large vault is spread over every core without ever being held whole.
+
+A change can be interrupted at any point and finished by running it again
+with the same two passwords. rekey.json records the new salt, KDF and a
+bcrypt hash of the new password; every file is replaced atomically, and
+files already carrying the new salt are skipped. Run it from the
+AndroVault directory while the application is closed:
+
+    python -m data.rekey
+"""
+import argparse
+import collections
+import getpass
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from auth.utils import hash_password, verify_password
+from constants import MASTER_PASSWORD_FILE, TWO_FA_FILE
+from data.backup_manager import BackupManager, ENCRYPTED_SUFFIX, MANIFEST_FILE, REKEY_SUFFIX
+from data.vault_format import RecordSealer, iter_vault, write_vault, reseal_field
+from data.vault_storage import STORAGE_BACKENDS, JournalStorage, JOURNAL_MAGIC
+from logger import log_event, log_error
+from manager.account import Account
+from utils.durable_io import atomic_write, atomic_stream
+from utils.kdf import DEFAULT_KDF, KDFParams
+from utils.crypto import CryptoService
+from utils.session_key import SALT_SIZE
+from utils.stream_crypto import read_stream_header, DEFAULT_CHUNK_SIZE
+
+REKEY_STATE_FILE = "rekey.json"
+
+# Below this many records starting the pool costs more than it saves
+PARALLEL_MIN_RECORDS = 5000
+# Chunks in flight per worker; bounds memory while keeping workers busy
+CHUNKS_PER_WORKER = 2
+
+# (old, new) AESGCM pair of a worker process, set by _init_worker
+_worker_ciphers = None
+
+def _init_worker(old_key, new_key):
+    global _worker_ciphers
+    _worker_ciphers = (AESGCM(old_key), AESGCM(new_key))
+
+def _clear_worker():
+    global _worker_ciphers
+    _worker_ciphers = None
+
+def _reseal_batch(batch):
+    """Move the sealed secrets of one chunk's records to the new key."""
+    old, new = _worker_ciphers
+    return [
+        (reseal_field(old, new, account_id, 'password', password),
+         reseal_field(old, new, account_id, 'password_history', history))
+        for account_id, password, history in batch
+    ]
+
+def rekey_pending():
+    """True when a master password change was interrupted."""
+    return os.path.exists(REKEY_STATE_FILE)
+
+def is_pending_new_password(password):
+    """Whether password is the new one of the interrupted change."""
+    with open(REKEY_STATE_FILE, 'r') as f:
+        state = json.load(f)
+    return verify_password(password, state['password_hash'].encode())
+
+class RekeyStats:
+    """Work done by a re-key, for the throughput report."""
+
+    def __init__(self):
+        """Initialize counters and start the clock."""
+        self.files = 0
+        self.skipped = 0
+        self.records = 0
+        self.bytes = 0
+        self.workers = 1
+        self._start = time.perf_counter()
+        self.elapsed = 0.0
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self._start
+
+    def describe(self):
+        """One-line summary with records/s and MB/s."""
+        seconds = max(self.elapsed, 1e-9)
+        megabytes = self.bytes / (1024 * 1024)
+        return (f"{self.files} files re-keyed ({self.skipped} already done), "
+                f"{self.records} records, {megabytes:.1f} MB in {self.elapsed:.2f} s "
+                f"with {self.workers} workers: {self.records / seconds:.0f} records/s, "
+                f"{megabytes / seconds:.1f} MB/s")
+
+class VaultRekeyer:
+    """Re-encrypts the vault, 2FA secret, backups and master.hash."""
+
+    def __init__(self, old_password, new_password, data_dir="data", backup_dir="backups",
+                 kdf=None, workers=None):
+        """
+        Initialize re-key.
+
+        Args:
+            old_password: Current master password
+            new_password: Master password to switch to
+            data_dir: Directory holding the vault files
+            backup_dir: Directory holding the backups
+            kdf: KDFParams for the new key (default: DEFAULT_KDF); ignored
+                when resuming, which keeps the interrupted change's
+            workers: Worker processes for binary vaults (default: one per
+                CPU)
+        """
+        self.old_key = CryptoService(old_password)
+        self._old_password = old_password
+        self.new_password = new_password
+        self.data_dir = data_dir
+        self.backup_dir = backup_dir
+        self.kdf = kdf or DEFAULT_KDF
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.new_key = None
+        self.stats = None
+        self._new_hash = None
+        self._handlers = {
+            STORAGE_BACKENDS['binary'][1]: self._rekey_binary_vault,
+            STORAGE_BACKENDS['file'][1]: self._rekey_token_file,
+            STORAGE_BACKENDS['journal'][1]: self._rekey_journal,
+            TWO_FA_FILE: self._rekey_token_file,
+            MASTER_PASSWORD_FILE: self._rekey_master_hash,
+        }
+
+    def run(self):
+        """Re-key everything; returns the CryptoService for the new password.
+
+        Raises ValueError for a wrong password; anything already re-keyed
+        stays so and is skipped when the change is run again.
+        """
+        self.stats = RekeyStats()
+        try:
+            self._check_old_password()
+            self._load_state()
+            for _, filename in STORAGE_BACKENDS.values():
+                self._rekey_file(os.path.join(self.data_dir, filename), filename)
+            self._rekey_file(TWO_FA_FILE, TWO_FA_FILE)
+            self._rekey_backups()
+            self._rekey_file(MASTER_PASSWORD_FILE, MASTER_PASSWORD_FILE)
+            os.remove(REKEY_STATE_FILE)
+        finally:
+            self.old_key.wipe()
+            self._old_password = None
+            self.stats.finish()
+        log_event(f"Master password changed: {self.stats.describe()}")
+        return self.new_key
+
+    def _check_old_password(self):
+        if not os.path.exists(MASTER_PASSWORD_FILE):
+            return
+        with open(MASTER_PASSWORD_FILE, 'rb') as f:
+            stored_hash = f.read()
+        # After a crash past the final step master.hash already holds the
+        # new password
+        if not (verify_password(self._old_password, stored_hash)
+                or verify_password(self.new_password, stored_hash)):
+            raise ValueError("Current master password is incorrect")
+
+    def _load_state(self):
+        """Start a new change or pick up the interrupted one."""
+        if rekey_pending():
+            with open(REKEY_STATE_FILE, 'r') as f:
+                state = json.load(f)
+            if not verify_password(self.new_password, state['password_hash'].encode()):
+                raise ValueError("An interrupted password change used a different new password")
+            log_event("Resuming interrupted master password change")
+        else:
+            password_hash = hash_password(self.new_password)
+            if not password_hash:
+                raise ValueError("Failed to hash the new master password")
+            state = {
+                "salt": os.urandom(SALT_SIZE).hex(),
+                "kdf": self.kdf.to_dict(),
+                "password_hash": password_hash.decode(),
+                "started_at": datetime.now().isoformat()
+            }
+            atomic_write(REKEY_STATE_FILE, json.dumps(state, indent=4))
+        self._new_hash = state['password_hash'].encode()
+        self.new_key = CryptoService(
+            self.new_password,
+            salt=bytes.fromhex(state['salt']),
+            kdf=KDFParams.from_dict(state['kdf'])
+        )
+
+    def _rekey_file(self, path, name):
+        """Re-key one file in place with the handler for its name."""
+        if not os.path.exists(path) or not os.path.getsize(path):
+            return
+        start = time.perf_counter()
+        records = self.stats.records
+        size = os.path.getsize(path)
+        if not self._handlers[name](path):
+            self.stats.skipped += 1
+            return
+        self.stats.files += 1
+        self.stats.bytes += size
+        elapsed = time.perf_counter() - start
+        log_event(f"Re-keyed {path}: {self.stats.records - records} records, "
+                  f"{size / (1024 * 1024):.1f} MB in {elapsed * 1000:.0f} ms")
+
+    def _rekey_binary_vault(self, path):
+        """Re-key the binary vault through a temporary file.
+
+        The vault is read through a memory map, and Windows cannot replace
+        a file that is mapped or open. The new vault is written next to it
+        first, then copied over it once the map and file are closed.
+        """
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)),
+            prefix=os.path.basename(path) + ".",
+            suffix=REKEY_SUFFIX
+        )
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                with open(path, 'rb') as f:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                        header, chunks = iter_vault(mapped, self.old_key)
+                        if header.salt == self.new_key.salt:
+                            return False
+                        sealer = RecordSealer(self.new_key, self.new_key.salt, self.new_key.kdf)
+                        accounts = self._resealed(chunks, header, sealer)
+                        write_vault(temp, accounts, self.new_key, header.compression, sealer,
+                                    count=header.count)
+            with open(temp_path, 'rb') as source, atomic_stream(path) as target:
+                shutil.copyfileobj(source, target, DEFAULT_CHUNK_SIZE)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.stats.records += header.count
+        return True
+
+    def _resealed(self, chunks, header, sealer):
+        """Yield the vault's accounts sealed under sealer, in order.
+
+        Chunks are handed to the worker pool as they are decrypted, with at
+        most CHUNKS_PER_WORKER per worker in flight.
+        """
+        old_sealer = RecordSealer(self.old_key, header.salt, header.kdf)
+        keys = (self.old_key.aead_key(header.salt, header.kdf),
+                self.new_key.aead_key(sealer.salt, sealer.kdf))
+        executor = None
+        if self.workers > 1 and header.count >= PARALLEL_MIN_RECORDS:
+            executor = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=keys)
+            self.stats.workers = self.workers
+        else:
+            _init_worker(*keys)
+
+        def rebuilt(accounts, resealed):
+            for account, (password, history) in zip(accounts, resealed):
+                yield Account.sealed(
+                    account.id, account.website, account.username, account.notes,
+                    account.created_at, account.modified_at, password, history, sealer
+                )
+
+        pending = collections.deque()
+        try:
+            for accounts in chunks:
+                if accounts and not accounts[0].is_sealed:
+                    # Version 1 vault: records were never sealed
+                    for account in accounts:
+                        account.seal(sealer)
+                    yield from accounts
+                    continue
+                batch = [(a.id,) + a.sealed_secrets(old_sealer) for a in accounts]
+                if executor is None:
+                    yield from rebuilt(accounts, _reseal_batch(batch))
+                    continue
+                pending.append((accounts, executor.submit(_reseal_batch, batch)))
+                if len(pending) >= self.workers * CHUNKS_PER_WORKER:
+                    accounts, future = pending.popleft()
+                    yield from rebuilt(accounts, future.result())
+            while pending:
+                accounts, future = pending.popleft()
+                yield from rebuilt(accounts, future.result())
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            else:
+                _clear_worker()
+
+    def _rekey_token_file(self, path):
+        """``salt | Fernet token`` files: the file vault and 2fa.key."""
+        with open(path, 'rb') as f:
+            data = f.read()
+        salt = data[:SALT_SIZE]
+        if salt == self.new_key.salt:
+            return False
+        try:
+            plaintext = self.old_key.decrypt_secret(data)
+        except ValueError:
+            raise ValueError(f"{path} failed authentication (wrong password or corrupted file)")
+        atomic_write(path, self.new_key.encrypt_secret(plaintext))
+        return True
+
+    def _rekey_journal(self, path):
+        with open(path, 'rb') as f:
+            head = f.read(len(JOURNAL_MAGIC) + SALT_SIZE)
+        if head[len(JOURNAL_MAGIC):] == self.new_key.salt:
+            return False
+        accounts = JournalStorage(path, self.old_key).load()
+        # A commit without changes writes a fresh snapshot under the new salt
+        JournalStorage(path, self.new_key).commit(accounts)
+        self.stats.records += len(accounts)
+        return True
+
+    def _rekey_master_hash(self, path):
+        with open(path, 'rb') as f:
+            if f.read() == self._new_hash:
+                return False
+        atomic_write(path, self._new_hash)
+        return True
+
+    def _rekey_backups(self):
+        if not os.path.isdir(self.backup_dir):
+            return
+        for backup in sorted(os.listdir(self.backup_dir)):
+            backup_path = os.path.join(self.backup_dir, backup)
+            info_file = os.path.join(backup_path, MANIFEST_FILE)
+            if not os.path.isfile(info_file):
+                continue
+            with open(info_file, 'r') as f:
+                info = json.load(f)
+            if info.get("format", 1) >= 2:
+                continue
+            encrypted = info.get("encrypted", False)
+            for name in sorted(os.listdir(backup_path)):
+                path = os.path.join(backup_path, name)
+                if name.endswith(REKEY_SUFFIX):
+                    # Left behind by an interrupted change
+                    os.remove(path)
+                elif not encrypted:
+                    if name in self._handlers:
+                        self._rekey_file(path, name)
+                elif name.endswith(ENCRYPTED_SUFFIX) and name[:-len(ENCRYPTED_SUFFIX)] in self._handlers:
+                    self._rekey_encrypted_backup(path, name[:-len(ENCRYPTED_SUFFIX)])
+        # Chunked backups: the store key is rewrapped and every entry is
+        # re-keyed through the same per-file handlers
+        manager = BackupManager(self.data_dir, self.backup_dir, self.old_key)
+        manager.rekey(self.new_key, self._rekey_file)
+
+    def _rekey_encrypted_backup(self, path, name):
+        """Re-key a stream-encrypted backup file and the file inside it.
+
+        The inner file is decrypted to a temporary file next to the backup
+        (it is still encrypted itself, except master.hash, which only
+        holds a hash), re-keyed there, and streamed back under the new key.
+        """
+        with open(path, 'rb') as f:
+            done = read_stream_header(f).salt == self.new_key.salt
+        if done:
+            self.stats.skipped += 1
+            return
+        start = time.perf_counter()
+        records = self.stats.records
+        size = os.path.getsize(path)
+        fd, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path),
+            prefix=name + ".",
+            suffix=REKEY_SUFFIX
+        )
+        try:
+            with open(path, 'rb') as source, os.fdopen(fd, 'wb') as inner:
+                with self.old_key.stream_reader(source) as reader:
+                    shutil.copyfileobj(reader, inner, DEFAULT_CHUNK_SIZE)
+            if os.path.getsize(temp_path):
+                self._handlers[name](temp_path)
+            with open(temp_path, 'rb') as inner, atomic_stream(path) as target:
+                with self.new_key.stream_writer(target) as writer:
+                    shutil.copyfileobj(inner, writer, DEFAULT_CHUNK_SIZE)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.stats.files += 1
+        self.stats.bytes += size
+        elapsed = time.perf_counter() - start
+        log_event(f"Re-keyed {path}: {self.stats.records - records} records, "
+                  f"{size / (1024 * 1024):.1f} MB in {elapsed * 1000:.0f} ms")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Change the master password, re-encrypting the vault, 2FA secret and backups"
+    )
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for binary vaults (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    from data.settings_manager import SettingsManager
+    settings = SettingsManager()
+    old_password = getpass.getpass("Current master password: ")
+    new_password = getpass.getpass("New master password: ")
+    if new_password != getpass.getpass("Confirm new master password: "):
+        print("Passwords do not match")
+        return 1
+    min_length = settings.get_setting('security', 'min_password_length')
+    if len(new_password) < min_length:
+        print(f"The new master password must have at least {min_length} characters")
+        return 1
+
+    rekeyer = VaultRekeyer(
+        old_password,
+        new_password,
+        kdf=KDFParams.from_dict(settings.get_setting('security', 'kdf')),
+        workers=args.workers
+    )
+    try:
+        rekeyer.run()
+    except ValueError as e:
+        log_error(f"Master password change failed: {str(e)}")
+        print(f"Password change failed: {e}")
+        return 1
+    print(rekeyer.stats.describe())
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,6 +1,7 @@
 import json
 import os
 from logger import log_event, log_error
+from utils.durable_io import atomic_write, recover_file
 
 class SettingsManager:
     def __init__(self):
@@ -14,12 +15,37 @@ class SettingsManager:
             "security": {
                 "lock_timeout": 300,
                 "min_password_length": 12,
-                "require_special_chars": True
+                "require_special_chars": True,
+                # Vault key derivation; calibrate with `python -m utils.kdf`
+                "kdf": {"algorithm": "pbkdf2-sha256", "costs": [100000]},
+                "kdf_target_ms": 500
             },
             "backup": {
                 "auto_backup": True,
                 "backup_interval": 24,  # hours
-                "keep_backups": 10
+                "backup_after_changes": 50,  # changed accounts; 0: interval only
+                "keep_backups": 10,
+                "max_age_days": 0  # 0: keep regardless of age
+            },
+            "storage": {
+                "format": "binary",  # "binary", "journal" or "file"
+                "fsync_policy": "always",  # "always", "batched" or "idle"
+                "fsync_batch_size": 10,
+                "fsync_idle_delay": 2.0,  # seconds
+                "write_behind": True  # Save on a background thread
+            },
+            "logging": {
+                "level": "INFO",  # DEBUG, INFO, WARNING, ERROR or CRITICAL
+                "console": False,  # Echo log records to stdout
+                "rotation": "size",  # "size", "time" or "none"
+                "max_bytes": 5 * 1024 * 1024,
+                "backup_count": 5,  # Rotated log files kept
+                "when": "midnight",  # Interval of time rotation
+                "format": "text"  # "text", or "json" for one JSON object per line
+            },
+            "metrics": {
+                "enabled": False,  # Time hot paths (see utils/metrics.py)
+                "dump_on_exit": True  # Log p50/p95/p99 per operation at exit
             },
             "ui": {
                 "theme": "system",
@@ -32,6 +58,7 @@ class SettingsManager:
     def _load_settings(self):
         """Load settings from file or create default."""
         try:
+            recover_file(self.settings_file)
             if os.path.exists(self.settings_file):
                 with open(self.settings_file, 'r') as f:
                     stored_settings = json.load(f)
@@ -48,8 +75,7 @@ class SettingsManager:
     def save_settings(self):
         """Save current settings to file."""
         try:
-            with open(self.settings_file, 'w') as f:
-                json.dump(self.settings, f, indent=4)
+            atomic_write(self.settings_file, json.dumps(self.settings, indent=4))
             log_event("Settings saved successfully")
             return True
         except Exception as e:
@@ -0,0 +1,110 @@
+# data/tests/test_backup_manager.py
+import os
+from benchmarks.common import make_accounts
+from data.backup_archive import ARCHIVE_SUFFIX
+from data.backup_manager import BackupManager
+from data.chunk_store import CHUNKS_DIR
+from data.vault_storage import BinaryVaultStorage
+from manager.account_manager import AccountManager
+from utils.crypto import CryptoService
+
+def new_account(i):
+    return {'website': f"site{i}.example.com", 'username': "someone", 'password': f"secret-{i}"}
+
+def open_vault(password, kdf, count=0):
+    """AccountManager over a new binary vault of count accounts."""
+    storage = BinaryVaultStorage(os.path.join("data", "accounts.vault"), CryptoService(password, kdf=kdf))
+    os.makedirs("data")
+    storage.load()
+    storage.commit(make_accounts(count))
+    return AccountManager(password, kdf=kdf)
+
+def snapshot(manager):
+    return [a.to_dict() for a in manager.accounts]
+
+def test_restore_brings_back_the_backed_up_accounts(password, kdf):
+    manager = open_vault(password, kdf, count=50)
+    backed_up = snapshot(manager)
+    backups = BackupManager(session_key=manager.session_key)
+    assert backups.create_backup()
+
+    manager.delete_account(backed_up[0]['id'])
+    manager.save_account(new_account(99))
+    manager.close()
+
+    assert backups.restore_backup(backups.list_backups()[0]["name"])
+    assert snapshot(AccountManager(password, kdf=kdf)) == backed_up
+
+def test_unchanged_accounts_are_stored_once(password, kdf):
+    manager = open_vault(password, kdf, count=2000)
+    backups = BackupManager(session_key=manager.session_key)
+    assert backups.create_backup()
+    manager.save_account(new_account(5000))
+    assert backups.create_backup()
+    manager.close()
+
+    # Only the chunk holding the new account is stored again
+    first, second = backups.list_backups()
+    assert second["stored"] < first["stored"] / 2
+
+def test_old_backups_are_pruned(password, kdf):
+    manager = open_vault(password, kdf, count=3)
+    backups = BackupManager(session_key=manager.session_key, keep_backups=2)
+    for i in range(3):
+        manager.save_account(new_account(10 + i))
+        assert backups.create_backup()
+    manager.close()
+    assert len(backups.list_backups()) == 2
+
+def chunk_files(backup_dir="backups"):
+    root = os.path.join(backup_dir, CHUNKS_DIR)
+    return sorted(os.path.join(d, f) for d, _, files in os.walk(root) for f in files)
+
+def test_intact_backups_pass_verification(password, kdf):
+    manager = open_vault(password, kdf, count=100)
+    backups = BackupManager(session_key=manager.session_key)
+    for i in range(2):
+        manager.save_account(new_account(i))
+        assert backups.create_backup()
+    manager.close()
+
+    results = backups.verify_backups(workers=2)
+    assert len(results) == 2
+    assert all(errors == [] for errors in results.values())
+
+def test_damaged_backup_is_reported_and_not_restored(password, kdf):
+    manager = open_vault(password, kdf, count=100)
+    backups = BackupManager(session_key=manager.session_key)
+    assert backups.create_backup()
+    name = backups.list_backups()[0]["name"]
+    # Verified once, so the damage below must be noticed despite the cache
+    assert backups.verify_backups(workers=1) == {name: []}
+    for path in chunk_files():
+        with open(path, 'r+b') as f:
+            f.seek(os.path.getsize(path) // 2)
+            byte = f.read(1)
+            f.seek(-1, os.SEEK_CUR)
+            f.write(bytes([byte[0] ^ 0xFF]))
+
+    manager.save_account(new_account(500))
+    manager.close()
+    vault_path = os.path.join("data", "accounts.vault")
+    with open(vault_path, 'rb') as f:
+        current = f.read()
+
+    assert backups.verify_backups(workers=1)[name]
+    assert not backups.restore_backup(name)
+    with open(vault_path, 'rb') as f:
+        assert f.read() == current
+
+def test_damaged_archive_is_reported(password, kdf):
+    manager = open_vault(password, kdf, count=10)
+    backups = BackupManager(session_key=manager.session_key)
+    assert backups.create_backup()
+    manager.close()
+    name = backups.list_backups()[0]["name"]
+    archive = os.path.join("backups", name + ARCHIVE_SUFFIX)
+    with open(archive, 'r+b') as f:
+        f.truncate(os.path.getsize(archive) - 5)
+
+    assert backups.verify_backups([name], workers=1)[name]
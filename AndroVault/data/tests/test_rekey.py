@@ -0,0 +1,99 @@
+# data/tests/test_rekey.py
+import os
+import pytest
+from auth.utils import hash_password, verify_password
+from constants import MASTER_PASSWORD_FILE, TWO_FA_FILE
+from data import rekey
+from data.backup_manager import BackupManager
+from data.rekey import VaultRekeyer, rekey_pending
+from data.vault_storage import BinaryVaultStorage, VaultLoadError
+from manager.account_manager import AccountManager
+from utils.crypto import CryptoService
+
+NEW_PASSWORD = "new and longer master password"
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+@pytest.fixture
+def vault(password, kdf):
+    """A vault of 30 accounts with a 2FA secret, master.hash and a backup."""
+    with open(MASTER_PASSWORD_FILE, 'wb') as f:
+        f.write(hash_password(password))
+    manager = AccountManager(password, kdf=kdf)
+    for i in range(30):
+        manager.save_account({'website': f"site{i}.example.com", 'username': "someone",
+                              'password': f"secret-{i}"})
+    with open(TWO_FA_FILE, 'wb') as f:
+        f.write(manager.session_key.encrypt_secret("JBSWY3DPEHPK3PXP"))
+    backups = BackupManager(session_key=manager.session_key)
+    assert backups.create_backup()
+    accounts = [a.to_dict() for a in manager.accounts]
+    manager.close()
+    return accounts
+
+def load_vault(password, kdf):
+    storage = BinaryVaultStorage(os.path.join("data", "accounts.vault"), CryptoService(password, kdf=kdf))
+    return [a.to_dict() for a in storage.load()]
+
+def test_everything_moves_to_the_new_password(vault, password, kdf):
+    new_key = VaultRekeyer(password, NEW_PASSWORD, kdf=kdf, workers=1).run()
+
+    assert load_vault(NEW_PASSWORD, kdf) == vault
+    with pytest.raises(VaultLoadError):
+        load_vault(password, kdf)
+    assert new_key.decrypt_secret(read_bytes(TWO_FA_FILE)) == b"JBSWY3DPEHPK3PXP"
+    assert verify_password(NEW_PASSWORD, read_bytes(MASTER_PASSWORD_FILE))
+    assert not rekey_pending()
+
+    # The backup restores under the new key
+    os.remove(os.path.join("data", "accounts.vault"))
+    backups = BackupManager(session_key=CryptoService(NEW_PASSWORD, kdf=kdf))
+    assert backups.restore_backup(backups.list_backups()[0]["name"])
+    assert load_vault(NEW_PASSWORD, kdf) == vault
+
+def test_wrong_password_changes_nothing(vault, kdf):
+    before = read_bytes(os.path.join("data", "accounts.vault"))
+    with pytest.raises(ValueError):
+        VaultRekeyer("not the password", NEW_PASSWORD, kdf=kdf, workers=1).run()
+    assert read_bytes(os.path.join("data", "accounts.vault")) == before
+    assert not rekey_pending()
+
+def test_interrupted_change_is_resumed(vault, password, kdf, monkeypatch):
+    def crash(self):
+        raise OSError("power cut")
+    with monkeypatch.context() as patch:
+        patch.setattr(VaultRekeyer, '_rekey_backups', crash)
+        with pytest.raises(OSError):
+            VaultRekeyer(password, NEW_PASSWORD, kdf=kdf, workers=1).run()
+    assert rekey_pending()
+    # The vault is done, master.hash is not
+    assert load_vault(NEW_PASSWORD, kdf) == vault
+    assert verify_password(password, read_bytes(MASTER_PASSWORD_FILE))
+
+    with pytest.raises(ValueError):
+        VaultRekeyer(password, "some other password", kdf=kdf, workers=1).run()
+
+    rekeyer = VaultRekeyer(password, NEW_PASSWORD, kdf=kdf, workers=1)
+    rekeyer.run()
+    assert rekeyer.stats.skipped >= 2  # the vault and the 2FA secret
+    assert load_vault(NEW_PASSWORD, kdf) == vault
+    assert verify_password(NEW_PASSWORD, read_bytes(MASTER_PASSWORD_FILE))
+    assert not rekey_pending()
+
+def test_workers_reseal_the_vault(vault, password, kdf, monkeypatch):
+    monkeypatch.setattr(rekey, 'PARALLEL_MIN_RECORDS', 1)
+    rekeyer = VaultRekeyer(password, NEW_PASSWORD, kdf=kdf, workers=2)
+    rekeyer.run()
+    assert rekeyer.stats.workers == 2
+    assert load_vault(NEW_PASSWORD, kdf) == vault
+
+def test_account_manager_reopens_on_the_new_password(vault, password, kdf):
+    manager = AccountManager(password, kdf=kdf)
+    assert manager.change_master_password(password, NEW_PASSWORD, workers=1)
+    assert [a.to_dict() for a in manager.accounts] == vault
+    # Saves after the change use the new key
+    manager.save_account({'website': "after.example.com", 'username': "someone", 'password': "x"})
+    manager.close()
+    assert len(AccountManager(NEW_PASSWORD, kdf=kdf).accounts) == len(vault) + 1
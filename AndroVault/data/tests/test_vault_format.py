@@ -0,0 +1,78 @@
+# data/tests/test_vault_format.py
+import os
+import pytest
+from benchmarks.common import make_accounts
+from data.vault_format import (
+    CHUNK_HEADER, MAX_HEADER_SIZE, NONCE_SIZE, RecordSealer, VaultHeader, iter_vault, read_vault
+)
+from data.vault_storage import BinaryVaultStorage, VaultLoadError
+from utils.crypto import CryptoService
+
+def saved_vault(session_key, accounts):
+    storage = BinaryVaultStorage("accounts.vault", session_key)
+    storage.load()
+    storage.commit(accounts)
+    return storage
+
+def test_loaded_passwords_stay_sealed_until_read(session_key, password, kdf):
+    accounts = make_accounts(10)
+    accounts[3]['password_history'] = [{'password': "older", 'changed_at': 1.0}]
+    saved_vault(session_key, accounts)
+
+    loaded = BinaryVaultStorage("accounts.vault", CryptoService(password, kdf=kdf)).load()
+    assert all(account.is_sealed for account in loaded)
+    assert accounts[0]['password'].encode() not in loaded[0]._password
+    assert [a.password for a in loaded] == [a['password'] for a in accounts]
+    assert loaded[3].password_history == accounts[3]['password_history']
+    assert loaded[4].password_history == []
+
+def test_sealed_field_is_bound_to_its_account(session_key):
+    sealer = RecordSealer(session_key, session_key.salt, session_key.kdf)
+    blob = sealer.seal('account-1', 'password', "hunter2")
+    assert sealer.open('account-1', 'password', blob) == "hunter2"
+    with pytest.raises(ValueError):
+        sealer.open('account-2', 'password', blob)
+    with pytest.raises(ValueError):
+        sealer.open('account-1', 'password_history', blob)
+
+def test_sealed_passwords_are_unreadable_once_locked(session_key):
+    storage = saved_vault(session_key, make_accounts(2))
+    loaded = storage.load()
+    session_key.wipe()
+    with pytest.raises(RuntimeError):
+        loaded[0].password
+
+def chunk_ends(path):
+    """File offset at which each chunk of a vault ends."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    _, offset = VaultHeader.unpack(data[:MAX_HEADER_SIZE])
+    ends = []
+    while offset < len(data):
+        length, _ = CHUNK_HEADER.unpack_from(data, offset)
+        offset += CHUNK_HEADER.size + NONCE_SIZE + length
+        ends.append(offset)
+    return ends
+
+def test_large_vault_is_read_chunk_by_chunk(session_key, password, kdf):
+    accounts = make_accounts(6000)
+    saved_vault(session_key, accounts)
+    assert len(chunk_ends("accounts.vault")) > 1
+
+    with open("accounts.vault", 'rb') as f:
+        _, chunks = iter_vault(f.read(), CryptoService(password, kdf=kdf))
+        sizes = [len(chunk) for chunk in chunks]
+    assert len(sizes) > 1 and sum(sizes) == len(accounts)
+
+    _, loaded = read_vault("accounts.vault", CryptoService(password, kdf=kdf))
+    assert [a.to_dict() for a in loaded] == accounts
+
+def test_vault_cut_at_a_chunk_boundary_is_refused(session_key, password, kdf):
+    saved_vault(session_key, make_accounts(6000))
+    first_chunk_end = chunk_ends("accounts.vault")[0]
+    with open("accounts.vault", 'r+b') as f:
+        f.truncate(first_chunk_end)
+
+    with pytest.raises(VaultLoadError):
+        BinaryVaultStorage("accounts.vault", CryptoService(password, kdf=kdf)).load()
+    assert os.path.getsize("accounts.vault") == first_chunk_end
@@ -0,0 +1,199 @@
+# data/tests/test_vault_storage.py
+import os
+import pytest
+from benchmarks.common import make_accounts
+from data.vault_format import read_vault
+from data.vault_storage import (
+    STORAGE_BACKENDS, BinaryVaultStorage, JournalStorage, WholeFileStorage, VaultLoadError,
+    JOURNAL_MAGIC, RECORD_HEADER, open_storage
+)
+from manager.account import Account
+from utils.crypto import CryptoService
+from utils.kdf import KDFParams
+from utils.session_key import SALT_SIZE
+
+FORMATS = ['file', 'journal', 'binary']
+
+def plain(accounts):
+    return [Account.from_dict(a).to_dict() for a in accounts]
+
+def open_backend(storage_format, key):
+    backend_class, filename = STORAGE_BACKENDS[storage_format]
+    return backend_class(filename, key)
+
+def flip_byte(path, offset):
+    """Corrupt one byte, keeping base64 text valid base64."""
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(b'B' if byte == b'A' else b'A')
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def journal_records(path):
+    """Number of complete records in a journal file."""
+    data = read_bytes(path)
+    offset = len(JOURNAL_MAGIC) + SALT_SIZE
+    count = 0
+    while offset + RECORD_HEADER.size <= len(data):
+        (length,) = RECORD_HEADER.unpack_from(data, offset)
+        offset += RECORD_HEADER.size + length
+        count += 1
+    return count
+
+@pytest.mark.parametrize('storage_format', FORMATS)
+def test_round_trip(storage_format, session_key, password, kdf):
+    accounts = make_accounts(20)
+    storage = open_backend(storage_format, session_key)
+    assert storage.load() == []
+    storage.commit(accounts)
+    storage.close()
+
+    reopened = open_backend(storage_format, CryptoService(password, kdf=kdf))
+    assert plain(reopened.load()) == plain(accounts)
+
+@pytest.mark.parametrize('storage_format', FORMATS)
+def test_corrupt_vault_is_not_loaded_or_written(storage_format, session_key, password, kdf):
+    storage = open_backend(storage_format, session_key)
+    storage.load()
+    storage.commit(make_accounts(5))
+    flip_byte(storage.path, os.path.getsize(storage.path) - 20)
+    corrupt = read_bytes(storage.path)
+
+    reopened = open_backend(storage_format, CryptoService(password, kdf=kdf))
+    with pytest.raises(VaultLoadError):
+        reopened.load()
+    with pytest.raises(VaultLoadError):
+        reopened.commit([])
+    assert read_bytes(storage.path) == corrupt
+
+@pytest.mark.parametrize('storage_format', FORMATS)
+def test_wrong_password_is_refused(storage_format, session_key, kdf):
+    storage = open_backend(storage_format, session_key)
+    storage.load()
+    storage.commit(make_accounts(3))
+
+    with pytest.raises(VaultLoadError):
+        open_backend(storage_format, CryptoService("not the password", kdf=kdf)).load()
+
+def test_binary_vault_moves_to_the_configured_kdf(session_key, password, kdf):
+    accounts = make_accounts(5)
+    storage = BinaryVaultStorage("accounts.vault", session_key)
+    storage.load()
+    storage.commit(accounts)
+
+    stronger = KDFParams.pbkdf2(2000)
+    upgraded = BinaryVaultStorage("accounts.vault", CryptoService(password, kdf=stronger))
+    assert plain(upgraded.load()) == plain(accounts)
+    assert upgraded.kdf == stronger
+
+    # Rewritten on load under the new parameters
+    header, stored = read_vault("accounts.vault", CryptoService(password, kdf=kdf))
+    assert header.kdf == stronger
+    assert plain(stored) == plain(accounts)
+
+def test_journal_replays_upserts_and_deletes(session_key, password, kdf):
+    accounts = make_accounts(4)
+    storage = JournalStorage("accounts.journal", session_key)
+    storage.load()
+    storage.commit(accounts)
+
+    updated = dict(accounts[1], username="renamed")
+    added = make_accounts(1)[0]
+    storage.commit([], [('upsert', updated), ('delete', accounts[2]['id']), ('upsert', added)])
+
+    loaded = JournalStorage("accounts.journal", CryptoService(password, kdf=kdf)).load()
+    assert plain(loaded) == plain([accounts[0], updated, accounts[3], added])
+
+def test_journal_drops_torn_tail(session_key, password, kdf):
+    accounts = make_accounts(3)
+    storage = JournalStorage("accounts.journal", session_key)
+    storage.load()
+    storage.commit(accounts)
+    complete = os.path.getsize(storage.path)
+    storage.commit([], [('delete', accounts[0]['id'])])
+    # A crash halfway through the append
+    with open(storage.path, 'r+b') as f:
+        f.truncate(os.path.getsize(storage.path) - 10)
+
+    reopened = JournalStorage("accounts.journal", CryptoService(password, kdf=kdf))
+    assert plain(reopened.load()) == plain(accounts)
+    assert os.path.getsize(storage.path) == complete
+
+    # New records go after the last complete one
+    reopened.commit([], [('delete', accounts[1]['id'])])
+    loaded = JournalStorage("accounts.journal", CryptoService(password, kdf=kdf)).load()
+    assert plain(loaded) == plain([accounts[0], accounts[2]])
+
+def test_journal_torn_header_is_dropped(session_key, password, kdf):
+    storage = JournalStorage("accounts.journal", session_key)
+    storage.load()
+    storage.commit(make_accounts(2))
+    complete = os.path.getsize(storage.path)
+    with open(storage.path, 'ab') as f:
+        f.write(RECORD_HEADER.pack(500)[:2])
+
+    assert len(JournalStorage("accounts.journal", CryptoService(password, kdf=kdf)).load()) == 2
+    assert os.path.getsize(storage.path) == complete
+
+def test_journal_compacts_to_live_accounts(session_key, password, kdf):
+    accounts = make_accounts(10)
+    storage = JournalStorage("accounts.journal", session_key, compact_threshold=1)
+    storage.load()
+    storage.commit(accounts)
+    for round_ in range(5):
+        for account in accounts:
+            account['notes'] = f"edit {round_}"
+            storage.commit(accounts, [('upsert', account)])
+    storage.close()
+
+    # Sixty records written; compaction dropped the superseded ones
+    assert journal_records(storage.path) < 60
+    loaded = JournalStorage("accounts.journal", CryptoService(password, kdf=kdf)).load()
+    assert plain(loaded) == plain(accounts)
+
+def test_journal_is_not_compacted_right_after_load(session_key, password, kdf):
+    accounts = make_accounts(10)
+    storage = JournalStorage("accounts.journal", session_key)
+    storage.load()
+    storage.commit(accounts)
+    before = read_bytes(storage.path)
+
+    reopened = JournalStorage("accounts.journal", CryptoService(password, kdf=kdf), compact_threshold=1)
+    loaded = reopened.load()
+    reopened.commit(loaded, [('delete', accounts[0]['id'])])
+    reopened.close()
+    # Appended to, not rewritten
+    after = read_bytes(storage.path)
+    assert after.startswith(before) and len(after) > len(before)
+
+def test_older_format_is_imported(session_key, password, kdf):
+    accounts = make_accounts(5)
+    old = WholeFileStorage("accounts.enc", session_key)
+    old.load()
+    old.commit(accounts)
+
+    storage = open_storage('binary', '.', CryptoService(password, kdf=kdf))
+    assert plain(storage.load()) == plain(accounts)
+    assert os.path.exists("accounts.enc")
+
+def test_failed_import_creates_nothing(session_key, password, kdf):
+    accounts = make_accounts(5)
+    old = WholeFileStorage("accounts.enc", session_key)
+    old.load()
+    old.commit(accounts)
+    good = read_bytes("accounts.enc")
+    flip_byte("accounts.enc", len(good) - 20)
+
+    with pytest.raises(VaultLoadError):
+        open_storage('binary', '.', CryptoService(password, kdf=kdf))
+    assert not os.path.exists("accounts.vault")
+
+    # Once the old vault is restored the import is tried again
+    with open("accounts.enc", 'wb') as f:
+        f.write(good)
+    storage = open_storage('binary', '.', CryptoService(password, kdf=kdf))
+    assert plain(storage.load()) == plain(accounts)
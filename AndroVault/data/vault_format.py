@@ -0,0 +1,491 @@
+# data/vault_format.py
+import json
+import mmap
+import os
+import struct
+import zlib
+from cryptography.exceptions import InvalidTag
+from manager.account import Account
+from utils.kdf import KDFParams, PACKED_PARAMS
+from utils.stream_crypto import ChunkCipher
+
+VAULT_MAGIC = b"AVLT"
+# 1: plaintext records inside the vault ciphertext
+# 2: password and history additionally sealed per record
+# 3: records encrypted in independent chunks that can be read one by one
+# 4: header carries any KDF (PBKDF2, scrypt, Argon2id) and its costs
+VAULT_VERSION = 4
+SUPPORTED_VERSIONS = (1, 2, 3, 4)
+
+# Versions 1-3 only knew PBKDF2-SHA256
+KDF_PBKDF2_SHA256 = 1
+
+COMPRESSION_NONE = 0
+COMPRESSION_ZLIB = 1
+# Saves run on every edit; level 1 is several times faster than the
+# default and only a little larger on account data
+ZLIB_LEVEL = 1
+
+NONCE_SIZE = 12
+
+# Encoded records per chunk before compression; bounds the plaintext
+# held at once while reading or writing a vault
+CHUNK_SIZE = 512 * 1024
+
+# magic, version; followed by KDFParams.pack(), salt length, salt
+HEADER = struct.Struct(">4sB")
+SALT_LENGTH = struct.Struct(">B")
+# Versions 1-3: magic, version, kdf id, kdf iterations, salt length
+HEADER_V1 = struct.Struct(">4sBBIB")
+MAX_HEADER_SIZE = HEADER.size + PACKED_PARAMS.size + SALT_LENGTH.size + 255 + 5
+# compression, record count
+BODY_INFO = struct.Struct(">BI")
+# Version 2 record: id, website, username and notes byte lengths,
+# created_at, modified_at, sealed password and sealed history byte lengths
+RECORD_HEADER = struct.Struct(">IIIIddII")
+# Version 1 record: id, website, username, password and notes byte lengths,
+# created_at, modified_at, password history byte length
+RECORD_HEADER_V1 = struct.Struct(">IIIIIddI")
+# Version 3 chunk: ciphertext byte length, record count
+CHUNK_HEADER = struct.Struct(">II")
+NAN = float('nan')
+
+class VaultHeader:
+    """Plaintext header of a binary vault file.
+
+    Everything needed to derive the key and decode the body without trying
+    formats: version, KDF algorithm and costs, salt, compression and the
+    record count. The header bytes are passed to AES-GCM as associated
+    data, so none of it can be altered without failing decryption.
+    """
+
+    __slots__ = ('version', 'kdf', 'salt', 'compression', 'count')
+
+    def __init__(self, salt, kdf, compression=COMPRESSION_ZLIB, count=0, version=VAULT_VERSION):
+        """Initialize vault header."""
+        self.version = version
+        self.kdf = kdf
+        self.salt = salt
+        self.compression = compression
+        self.count = count
+
+    def pack(self):
+        """Serialize the header (always in the current version's layout)."""
+        return (HEADER.pack(VAULT_MAGIC, VAULT_VERSION)
+                + self.kdf.pack()
+                + SALT_LENGTH.pack(len(self.salt))
+                + self.salt
+                + BODY_INFO.pack(self.compression, self.count))
+
+    @classmethod
+    def unpack(cls, data):
+        """Parse a header; returns (header, header_size)."""
+        if len(data) < HEADER_V1.size:
+            raise ValueError("Vault file too short")
+        magic, version = HEADER.unpack_from(data)
+        if magic != VAULT_MAGIC:
+            raise ValueError("Not a binary vault file")
+        if version not in SUPPORTED_VERSIONS:
+            raise ValueError(f"Unsupported vault version: {version}")
+        if version < 4:
+            _, _, kdf_id, iterations, salt_len = HEADER_V1.unpack_from(data)
+            if kdf_id != KDF_PBKDF2_SHA256:
+                raise ValueError(f"Unsupported key derivation function: {kdf_id}")
+            kdf = KDFParams.pbkdf2(iterations)
+            offset = HEADER_V1.size
+        else:
+            kdf, offset = KDFParams.unpack(data, HEADER.size)
+            (salt_len,) = SALT_LENGTH.unpack_from(data, offset)
+            offset += SALT_LENGTH.size
+        salt = data[offset:offset + salt_len]
+        offset += salt_len
+        if len(salt) != salt_len or len(data) < offset + BODY_INFO.size:
+            raise ValueError("Truncated vault header")
+        compression, count = BODY_INFO.unpack_from(data, offset)
+        offset += BODY_INFO.size
+        return cls(bytes(salt), kdf, compression, count, version), offset
+
+def field_aad(account_id, field):
+    """Associated data binding a sealed value to its account and field."""
+    return f"{account_id}\x00{field}".encode('utf-8')
+
+def reseal_field(old_aead, new_aead, account_id, field, blob):
+    """Move one sealed value to another key without decoding it.
+
+    Takes plain AESGCM objects rather than sealers so it can run in worker
+    processes that hold raw keys only.
+    """
+    if not blob:
+        return b''
+    aad = field_aad(account_id, field)
+    try:
+        data = old_aead.decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], aad)
+    except InvalidTag:
+        raise ValueError(f"Sealed {field} of account {account_id} failed authentication")
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + new_aead.encrypt(nonce, data, aad)
+
+class RecordSealer:
+    """Encrypts single account fields for sealed Account records.
+
+    Each sealed value is ``nonce(12) | AES-GCM(json(value))`` with the
+    account ID and field name as associated data, so ciphertext cannot be
+    moved to another account or field. The key comes from the session key
+    on every call, so sealed fields become unreadable once the session is
+    locked. Empty values (no password history, mostly) are stored as empty
+    bytes instead of being encrypted.
+    """
+
+    __slots__ = ('session_key', 'salt', 'kdf')
+
+    def __init__(self, session_key, salt, kdf):
+        """Initialize sealer for the vault's salt and KDFParams."""
+        self.session_key = session_key
+        self.salt = salt
+        self.kdf = kdf
+
+    def seal(self, account_id, field, value):
+        """Encrypt one field value."""
+        if not value:
+            return b''
+        nonce = os.urandom(NONCE_SIZE)
+        aead = self.session_key.aead(self.salt, self.kdf)
+        data = json.dumps(value).encode('utf-8')
+        return nonce + aead.encrypt(nonce, data, field_aad(account_id, field))
+
+    def open(self, account_id, field, blob):
+        """Decrypt one field value."""
+        if not blob:
+            return [] if field == 'password_history' else ''
+        aead = self.session_key.aead(self.salt, self.kdf)
+        try:
+            data = aead.decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], field_aad(account_id, field))
+        except InvalidTag:
+            raise ValueError(f"Sealed {field} of account {account_id} failed authentication")
+        return json.loads(data)
+
+    def __eq__(self, other):
+        if not isinstance(other, RecordSealer):
+            return NotImplemented
+        return (self.session_key is other.session_key and self.salt == other.salt
+                and self.kdf == other.kdf)
+
+    def __hash__(self):
+        return hash((id(self.session_key), self.salt, self.kdf))
+
+def _timestamp(value):
+    return NAN if value is None else value
+
+def encode_record_batches(accounts, sealer, batch_size=CHUNK_SIZE):
+    """Encode accounts as version 2/3 binary records.
+
+    Each record is a fixed ``RECORD_HEADER`` holding the byte lengths of
+    the text fields, the two timestamps (NaN when unset) and the lengths of
+    the sealed password and history, followed by those bytes. Accounts
+    already sealed by ``sealer`` are written without decrypting them.
+    Yields ``(record_count, data)`` batches of about ``batch_size`` bytes.
+    """
+    pack = RECORD_HEADER.pack
+    parts = []
+    append = parts.append
+    size = 0
+    count = 0
+    for account in accounts:
+        account = Account.from_dict(account)
+        fields = (
+            account.id.encode('utf-8'),
+            account.website.encode('utf-8'),
+            account.username.encode('utf-8'),
+            (account.notes or '').encode('utf-8'),
+        )
+        password, history = account.sealed_secrets(sealer)
+        append(pack(
+            len(fields[0]), len(fields[1]), len(fields[2]), len(fields[3]),
+            _timestamp(account.created_at), _timestamp(account.modified_at),
+            len(password), len(history)
+        ))
+        parts.extend(fields)
+        append(password)
+        append(history)
+        size += (RECORD_HEADER.size + len(fields[0]) + len(fields[1]) + len(fields[2])
+                 + len(fields[3]) + len(password) + len(history))
+        count += 1
+        if size >= batch_size:
+            yield count, b''.join(parts)
+            parts.clear()
+            size = 0
+            count = 0
+    if count:
+        yield count, b''.join(parts)
+
+def _text(body, offset, length):
+    return str(body[offset:offset + length], 'utf-8'), offset + length
+
+def decode_records(body, count, sealer):
+    """Inverse of encode_records; returns sealed accounts."""
+    unpack_from = RECORD_HEADER.unpack_from
+    header_size = RECORD_HEADER.size
+    body = memoryview(body)
+    accounts = []
+    offset = 0
+    for _ in range(count):
+        if offset + header_size > len(body):
+            raise ValueError("Truncated vault record")
+        (id_len, website_len, username_len, notes_len,
+         created_at, modified_at, password_len, history_len) = unpack_from(body, offset)
+        offset += header_size
+        account_id, offset = _text(body, offset, id_len)
+        website, offset = _text(body, offset, website_len)
+        username, offset = _text(body, offset, username_len)
+        notes, offset = _text(body, offset, notes_len)
+        password = bytes(body[offset:offset + password_len])
+        offset += password_len
+        history = bytes(body[offset:offset + history_len])
+        offset += history_len
+        if offset > len(body):
+            raise ValueError("Truncated vault record")
+        # NaN marks an unset timestamp
+        accounts.append(Account.sealed(
+            account_id, website, username, notes,
+            None if created_at != created_at else created_at,
+            None if modified_at != modified_at else modified_at,
+            password, history, sealer
+        ))
+    if offset != len(body):
+        raise ValueError("Trailing data after vault records")
+    return accounts
+
+def decode_records_v1(body, count):
+    """Decode version 1 records into plain (unsealed) accounts."""
+    loads = json.loads
+    unpack_from = RECORD_HEADER_V1.unpack_from
+    header_size = RECORD_HEADER_V1.size
+    body = memoryview(body)
+    accounts = []
+    offset = 0
+    for _ in range(count):
+        if offset + header_size > len(body):
+            raise ValueError("Truncated vault record")
+        (id_len, website_len, username_len, password_len, notes_len,
+         created_at, modified_at, history_len) = unpack_from(body, offset)
+        offset += header_size
+        fields = []
+        for length in (id_len, website_len, username_len, password_len, notes_len):
+            value, offset = _text(body, offset, length)
+            fields.append(value)
+        history = loads(str(body[offset:offset + history_len], 'utf-8')) if history_len else []
+        offset += history_len
+        if offset > len(body):
+            raise ValueError("Truncated vault record")
+        accounts.append(Account(
+            *fields,
+            None if created_at != created_at else created_at,
+            None if modified_at != modified_at else modified_at,
+            history
+        ))
+    if offset != len(body):
+        raise ValueError("Trailing data after vault records")
+    return accounts
+
+def write_vault(fileobj, accounts, session_key, compression=COMPRESSION_ZLIB, sealer=None, count=None):
+    """Encrypt accounts into fileobj as a binary vault, chunk by chunk.
+
+    Only one chunk is encoded at a time. The salt and KDF parameters of
+    ``sealer`` are used for the whole file; by default a sealer for the
+    session key's salt and KDF is made. With ``count``, ``accounts`` may be
+    a lazy iterable that is consumed as the file is written.
+    """
+    if count is None:
+        accounts = list(accounts)
+        count = len(accounts)
+    if sealer is None:
+        sealer = RecordSealer(session_key, session_key.salt, session_key.kdf)
+    write_vault_batches(fileobj, encode_record_batches(accounts, sealer), count,
+                        session_key, sealer.salt, sealer.kdf, compression)
+
+def write_vault_batches(fileobj, batches, count, session_key, salt, kdf, compression=COMPRESSION_ZLIB):
+    """Write already encoded ``(record_count, records)`` batches as a vault.
+
+    Layout: ``header | chunk*`` where each chunk is ``CHUNK_HEADER |
+    nonce(12) | AES-GCM(zlib(records))``. There is always at least one
+    chunk, so the last-chunk marker is present even for an empty vault.
+    Sealed fields in the records must be sealed under ``salt`` and ``kdf``.
+    """
+    header = VaultHeader(salt, kdf, compression, count).pack()
+    cipher = ChunkCipher(session_key.aead(salt, kdf), header)
+    fileobj.write(header)
+
+    batches = iter(batches)
+    batch = next(batches, (0, b''))
+    index = 0
+    while batch is not None:
+        following = next(batches, None)
+        count, body = batch
+        if compression == COMPRESSION_ZLIB:
+            body = zlib.compress(body, ZLIB_LEVEL)
+        nonce = os.urandom(NONCE_SIZE)
+        ciphertext = cipher.seal(nonce, index, following is None, body)
+        fileobj.write(CHUNK_HEADER.pack(len(ciphertext), count))
+        fileobj.write(nonce)
+        fileobj.write(ciphertext)
+        batch = following
+        index += 1
+
+def _decompress(header, body):
+    if header.compression == COMPRESSION_ZLIB:
+        return zlib.decompress(body)
+    if header.compression != COMPRESSION_NONE:
+        raise ValueError(f"Unsupported vault compression: {header.compression}")
+    return body
+
+def _release_pages(buffer, end):
+    """Drop already-decoded pages of a mapped vault from the resident set."""
+    if isinstance(buffer, mmap.mmap) and hasattr(mmap, 'MADV_DONTNEED'):
+        length = end - end % mmap.PAGESIZE
+        if length:
+            buffer.madvise(mmap.MADV_DONTNEED, 0, length)
+
+def iter_vault(buffer, session_key):
+    """Decrypt a binary vault file image one chunk at a time.
+
+    ``buffer`` may be bytes or an mmap of the file. Returns ``(header,
+    chunks)`` where ``chunks`` lazily yields the list of accounts in each
+    chunk; version 1 and 2 vaults have a single chunk. At most one chunk
+    of plaintext exists at a time. Version 2+ accounts come back sealed.
+    """
+    header, offset = VaultHeader.unpack(buffer[:MAX_HEADER_SIZE])
+    return header, _vault_chunks(buffer, session_key, header, offset)
+
+def _vault_chunks(buffer, session_key, header, offset):
+    sealer = RecordSealer(session_key, header.salt, header.kdf)
+    for count, body in _vault_bodies(buffer, session_key, header, offset):
+        if header.version == 1:
+            yield decode_records_v1(body, count)
+        else:
+            yield decode_records(body, count, sealer)
+
+def _vault_bodies(buffer, session_key, header, offset):
+    """Yield the decrypted, decompressed ``(record_count, records)`` of
+    each chunk."""
+    header_bytes = bytes(buffer[:offset])
+    aead = session_key.aead(header.salt, header.kdf)
+    cipher = ChunkCipher(aead, header_bytes)
+
+    with memoryview(buffer) as view:
+        if header.version < 3:
+            nonce = view[offset:offset + NONCE_SIZE]
+            if len(nonce) != NONCE_SIZE:
+                raise ValueError("Truncated vault file")
+            try:
+                body = aead.decrypt(bytes(nonce), view[offset + NONCE_SIZE:], header_bytes)
+            except InvalidTag:
+                raise ValueError("Vault authentication failed (wrong password or corrupted file)")
+            finally:
+                nonce.release()
+            yield header.count, _decompress(header, body)
+            return
+
+        decoded = 0
+        index = 0
+        while True:
+            start = offset + CHUNK_HEADER.size + NONCE_SIZE
+            if start > len(view):
+                raise ValueError("Truncated vault chunk")
+            length, count = CHUNK_HEADER.unpack_from(view, offset)
+            end = start + length
+            if end > len(view):
+                raise ValueError("Truncated vault chunk")
+            nonce = bytes(view[start - NONCE_SIZE:start])
+            last = end == len(view)
+            with view[start:end] as ciphertext:
+                body = cipher.open(nonce, index, last, ciphertext)
+            body = _decompress(header, body)
+            _release_pages(buffer, end)
+            decoded += count
+            if last and decoded != header.count:
+                raise ValueError("Vault record count does not match header")
+            yield count, body
+            del body
+            if last:
+                break
+            offset = end
+            index += 1
+
+def iter_vault_records(buffer, session_key):
+    """Decrypt a version 2+ vault into its encoded records, one at a time.
+
+    Returns ``(header, records)`` where ``records`` lazily yields
+    ``(account_id, record)`` byte strings. The sealed fields stay sealed,
+    so a record only changes when its account does; backups chunk on
+    these (see data/backup_manager.py).
+    """
+    header, offset = VaultHeader.unpack(buffer[:MAX_HEADER_SIZE])
+    if header.version < 2:
+        raise ValueError("Version 1 vaults have no sealed records")
+    return header, _vault_records(buffer, session_key, header, offset)
+
+def _vault_records(buffer, session_key, header, offset):
+    for count, body in _vault_bodies(buffer, session_key, header, offset):
+        yield from split_records(body, count)
+
+def split_records(body, count):
+    """Yield ``(account_id, record)`` bytes for count encoded records."""
+    unpack_from = RECORD_HEADER.unpack_from
+    header_size = RECORD_HEADER.size
+    offset = 0
+    for _ in range(count):
+        if offset + header_size > len(body):
+            raise ValueError("Truncated vault record")
+        (id_len, website_len, username_len, notes_len,
+         _, _, password_len, history_len) = unpack_from(body, offset)
+        end = (offset + header_size + id_len + website_len + username_len + notes_len
+               + password_len + history_len)
+        if end > len(body):
+            raise ValueError("Truncated vault record")
+        yield (bytes(body[offset + header_size:offset + header_size + id_len]),
+               bytes(body[offset:end]))
+        offset = end
+    if offset != len(body):
+        raise ValueError("Trailing data after vault records")
+
+def check_sealed_records(body, count, aead):
+    """Authenticate every sealed field of count encoded records.
+
+    Takes a plain AESGCM (see reseal_field) and raises ValueError for the
+    first record that is truncated or does not decrypt.
+    """
+    header_size = RECORD_HEADER.size
+    for account_id, record in split_records(body, count):
+        (id_len, website_len, username_len, notes_len,
+         _, _, password_len, _) = RECORD_HEADER.unpack_from(record)
+        offset = header_size + id_len + website_len + username_len + notes_len
+        account_id = account_id.decode('utf-8')
+        for field, blob in (('password', record[offset:offset + password_len]),
+                            ('password_history', record[offset + password_len:])):
+            if blob:
+                try:
+                    aead.decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], field_aad(account_id, field))
+                except InvalidTag:
+                    raise ValueError(f"Sealed {field} of account {account_id} failed authentication")
+
+def decode_vault(buffer, session_key):
+    """Decrypt a binary vault file image into Account records.
+
+    Returns ``(header, accounts)``; see iter_vault. Adopts the file's salt
+    on the session key so later saves keep it.
+    """
+    header, chunks = iter_vault(buffer, session_key)
+    accounts = []
+    for chunk in chunks:
+        accounts.extend(chunk)
+    session_key.salt = header.salt
+    return header, accounts
+
+def read_vault(path, session_key):
+    """Decode a vault file through a read-only memory map.
+
+    Avoids reading the whole file into a bytes object; see decode_vault.
+    """
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return decode_vault(mapped, session_key)
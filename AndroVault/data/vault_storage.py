@@ -0,0 +1,387 @@
+# data/vault_storage.py
+import json
+import os
+import struct
+import threading
+from logger import log_event, log_error, log_debug
+from utils.durable_io import atomic_write, atomic_stream, durable_append, recover_file
+from manager.account import account_to_json
+from data.vault_format import write_vault, read_vault, RecordSealer
+
+JOURNAL_MAGIC = b"AVJ1"
+RECORD_HEADER = struct.Struct(">I")
+
+# Journal size (bytes) after which a background compaction is considered
+DEFAULT_COMPACT_THRESHOLD = 1024 * 1024
+
+class VaultLoadError(ValueError):
+    """A vault file could not be read.
+
+    Raised by load(), and afterwards by commit(): the accounts in memory
+    are not the vault's, so writing them would destroy the accounts that
+    failed to load. The file is left as it is for a backup restore.
+    """
+
+class LoadGuard:
+    """Refuses writes to a vault whose load failed (see VaultLoadError)."""
+    _load_error = None
+
+    def _guarded_load(self, load):
+        try:
+            accounts = load()
+        except Exception as e:
+            self._load_error = e
+            log_error(f"Failed to load {self.path}; it will not be written: {str(e)}")
+            raise VaultLoadError(f"Failed to load {self.path}: {str(e) or type(e).__name__}") from e
+        self._load_error = None
+        return accounts
+
+    def _check_writable(self):
+        if self._load_error is not None:
+            raise VaultLoadError(f"Not writing {self.path}: it failed to load "
+                                 f"({str(self._load_error) or type(self._load_error).__name__})")
+
+class WholeFileStorage(LoadGuard):
+    """Original vault format: the whole account list as one encrypted blob.
+
+    Every commit re-serializes and rewrites the complete file.
+    """
+
+    def __init__(self, path, session_key):
+        """Initialize whole-file storage."""
+        self.path = path
+        self.session_key = session_key
+
+    def exists(self):
+        """Check whether the vault file exists."""
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Load and decrypt all accounts."""
+        return self._guarded_load(self._load)
+
+    def _load(self):
+        recover_file(self.path)
+        if not self.exists():
+            log_event("No accounts file found, starting fresh")
+            return []
+
+        with open(self.path, 'rb') as f:
+            encrypted_data = f.read()
+
+        if not encrypted_data:
+            log_event("Empty accounts file found")
+            return []
+
+        decrypted_data = self.session_key.decrypt(encrypted_data)
+        if not decrypted_data:
+            raise ValueError("Decryption returned empty data")
+
+        return json.loads(decrypted_data.decode('utf-8'))
+
+    def commit(self, accounts, changes=None):
+        """Rewrite the vault with the current account list."""
+        self._check_writable()
+        encrypted_data = self.session_key.encrypt(json.dumps(accounts, default=account_to_json).encode())
+        if not encrypted_data:
+            raise ValueError("Failed to encrypt accounts data")
+
+        atomic_write(self.path, encrypted_data)
+        return True
+
+    def close(self):
+        """Nothing to release for whole-file storage."""
+
+class JournalStorage(LoadGuard):
+    """Append-only encrypted journal of per-account operations.
+
+    Layout: ``AVJ1 | salt(16) | record*`` where each record is a 4-byte
+    big-endian length followed by a Fernet token of
+    ``{"op": "upsert", "account": {...}}`` or ``{"op": "delete", "id": ...}``.
+    A commit appends only the records for the accounts that changed; load
+    replays them in order. Once the journal outgrows ``compact_threshold``
+    (and twice its last compacted size) it is rewritten in the background
+    as one upsert per live account.
+    """
+
+    def __init__(self, path, session_key, compact_threshold=DEFAULT_COMPACT_THRESHOLD):
+        """Initialize journal storage."""
+        self.path = path
+        self.session_key = session_key
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self._salt = None
+        self._compacted_size = 0
+        self._pending = None  # Records appended while a compaction runs
+        self._compactor = None
+        # Whether the caller's account list mirrors the journal (after a
+        # successful load or a full snapshot); only then may it be compacted
+        self._loaded = False
+
+    def exists(self):
+        """Check whether the journal file exists."""
+        return os.path.exists(self.path)
+
+    def _cipher(self):
+        return self.session_key.cipher(self._salt)
+
+    def _encode(self, record):
+        token = self._cipher().encrypt(json.dumps(record, default=account_to_json).encode())
+        return RECORD_HEADER.pack(len(token)) + token
+
+    def _records(self, changes):
+        for op, payload in changes:
+            if op == 'upsert':
+                yield {'op': 'upsert', 'account': payload}
+            elif op == 'delete':
+                yield {'op': 'delete', 'id': payload}
+            else:
+                raise ValueError(f"Unknown journal operation: {op}")
+
+    def load(self):
+        """Replay the journal into the ordered account list."""
+        return self._guarded_load(self._load)
+
+    def _load(self):
+        if not self.exists():
+            log_event("No journal found, starting fresh")
+            self._salt = self.session_key.salt
+            self._compacted_size = 0
+            self._loaded = True
+            return []
+
+        with open(self.path, 'rb') as f:
+            data = f.read()
+
+        if len(data) < len(JOURNAL_MAGIC) + 16 or not data.startswith(JOURNAL_MAGIC):
+            raise ValueError("Invalid journal header")
+
+        offset = len(JOURNAL_MAGIC)
+        self._salt = data[offset:offset + 16]
+        self.session_key.salt = self._salt
+        offset += 16
+        cipher = self._cipher()
+
+        accounts = {}
+        replayed = 0
+        while offset < len(data):
+            start = offset
+            torn = None
+            if offset + RECORD_HEADER.size > len(data):
+                torn = "Truncated record header"
+            else:
+                (length,) = RECORD_HEADER.unpack_from(data, offset)
+                offset += RECORD_HEADER.size
+                if offset + length > len(data):
+                    torn = "Truncated record body"
+            if torn:
+                # A crash during append leaves a short record at the end;
+                # drop it so new records are not written after garbage
+                log_error(f"Discarding torn journal tail at byte {start}: {torn}")
+                with open(self.path, 'r+b') as f:
+                    f.truncate(start)
+                break
+
+            try:
+                record = json.loads(cipher.decrypt(data[offset:offset + length]))
+            except Exception as e:
+                # A complete record that does not authenticate or parse is
+                # corruption or tampering, not a torn write: keep the file
+                # as it is so it can be inspected or restored from backup
+                raise ValueError(f"Corrupt journal record at byte {start}: {str(e) or type(e).__name__}") from e
+            offset += length
+
+            if record['op'] == 'upsert':
+                account = record['account']
+                accounts[account['id']] = account
+            elif record['op'] == 'delete':
+                accounts.pop(record['id'], None)
+            replayed += 1
+
+        log_debug(f"Replayed {replayed} journal records")
+        # Compaction waits until the journal doubles from its loaded size
+        self._compacted_size = os.path.getsize(self.path)
+        self._loaded = True
+        return list(accounts.values())
+
+    def commit(self, accounts, changes=None):
+        """Append records for the changed accounts.
+
+        Without a change list the whole account list is written as a fresh
+        snapshot (used for imports and the first save).
+        """
+        self._check_writable()
+        if self._salt is None:
+            self._salt = self.session_key.salt
+
+        with self._lock:
+            if changes is None or not self.exists():
+                atomic_write(self.path, self._snapshot(list(accounts)))
+                self._compacted_size = os.path.getsize(self.path)
+                self._loaded = True
+                return True
+
+            frames = b''.join(self._encode(r) for r in self._records(changes))
+            durable_append(self.path, frames)
+            if self._pending is not None:
+                self._pending.append(frames)
+
+            size = os.path.getsize(self.path)
+            if (self._loaded and self._pending is None and size > self.compact_threshold
+                    and size > 2 * self._compacted_size):
+                self._start_compaction(list(accounts))
+        return True
+
+    def _snapshot(self, accounts):
+        """Encode a journal holding one upsert per account."""
+        frames = [JOURNAL_MAGIC + self._salt]
+        frames.extend(self._encode({'op': 'upsert', 'account': a}) for a in accounts)
+        return b''.join(frames)
+
+    def _start_compaction(self, snapshot):
+        """Compact in a background thread (called with the lock held)."""
+        self._pending = []
+        self._compactor = threading.Thread(
+            target=self._compact,
+            args=(snapshot,),
+            daemon=True
+        )
+        self._compactor.start()
+        log_event(f"Journal compaction started ({len(snapshot)} accounts)")
+
+    def _compact(self, snapshot):
+        try:
+            data = self._snapshot(snapshot)
+            with self._lock:
+                # Carry over records committed while the snapshot was encoded
+                data += b''.join(self._pending)
+                atomic_write(self.path, data)
+                self._compacted_size = len(data)
+            log_event(f"Journal compacted to {self._compacted_size} bytes")
+        except Exception as e:
+            log_error(f"Journal compaction failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending = None
+
+    def close(self):
+        """Wait for a running compaction to finish."""
+        compactor = self._compactor
+        if compactor and compactor.is_alive():
+            compactor.join()
+
+class BinaryVaultStorage(LoadGuard):
+    """Versioned binary vault (see data/vault_format.py).
+
+    Zlib-compressed, length-prefixed records encrypted with AES-GCM in
+    chunks, behind a plaintext header carrying the format version, KDF
+    parameters and salt. Like the whole-file format, every
+    commit rewrites the file, but without JSON object keys or base64.
+    Passwords and password histories are sealed per record; ``sealer`` is
+    exposed so callers can seal new accounts before committing them.
+    """
+
+    def __init__(self, path, session_key):
+        """Initialize binary vault storage."""
+        self.path = path
+        self.session_key = session_key
+        self.kdf = session_key.kdf
+        self.sealer = None
+
+    def exists(self):
+        """Check whether the vault file exists."""
+        return os.path.exists(self.path)
+
+    def load(self):
+        """Load and decrypt the account metadata; secrets stay sealed."""
+        return self._guarded_load(self._load)
+
+    def _load(self):
+        recover_file(self.path)
+        accounts = []
+        if not self.exists():
+            log_event("No vault file found, starting fresh")
+        elif not os.path.getsize(self.path):
+            log_event("Empty vault file found")
+        else:
+            # Mapped rather than read, so the file is never copied whole
+            header, accounts = read_vault(self.path, self.session_key)
+            self.kdf = header.kdf
+
+        # Vaults written with other KDF settings are re-encrypted under the
+        # configured KDF; seal() moves each record to the new sealer
+        upgrade = self.kdf != self.session_key.kdf
+        self.kdf = self.session_key.kdf
+
+        self.sealer = RecordSealer(self.session_key, self.session_key.salt, self.kdf)
+        # Version 1 vaults hold plain records; seal them now rather than on
+        # the next save
+        for account in accounts:
+            account.seal(self.sealer)
+        if upgrade:
+            self.commit(accounts)
+            log_event(f"Vault re-encrypted with {self.kdf.describe()}")
+        return accounts
+
+    def commit(self, accounts, changes=None):
+        """Rewrite the vault with the current account list."""
+        self._check_writable()
+        if self.sealer is None:
+            self.sealer = RecordSealer(self.session_key, self.session_key.salt, self.kdf)
+        # Streamed chunk by chunk into the replacement file
+        with atomic_stream(self.path) as f:
+            write_vault(f, accounts, self.session_key, sealer=self.sealer)
+        return True
+
+    def close(self):
+        """Nothing to release for binary storage."""
+
+STORAGE_BACKENDS = {
+    'file': (WholeFileStorage, "accounts.enc"),
+    'journal': (JournalStorage, "accounts.journal"),
+    'binary': (BinaryVaultStorage, "accounts.vault"),
+}
+
+def open_storage(storage_format, data_dir, session_key):
+    """Create the storage backend for a format, importing older vaults.
+
+    When the vault for the requested format does not exist yet but another
+    format's file does, the accounts are read from the most recently
+    written one and saved as the new vault's first snapshot. The old file
+    is left in place.
+
+    The new vault is only created once the import has succeeded. If the
+    old file cannot be read, VaultLoadError is raised rather than starting
+    empty: an empty new vault would hide the old one from every later
+    import.
+    """
+    if storage_format not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage format: {storage_format}")
+
+    backend_class, filename = STORAGE_BACKENDS[storage_format]
+    storage = backend_class(os.path.join(data_dir, filename), session_key)
+
+    if not storage.exists():
+        sources = [
+            other_class(os.path.join(data_dir, other_file), session_key)
+            for other_format, (other_class, other_file) in STORAGE_BACKENDS.items()
+            if other_format != storage_format
+        ]
+        sources = [s for s in sources if s.exists()]
+        if sources:
+            source = max(sources, key=lambda s: os.path.getmtime(s.path))
+            try:
+                accounts = source.load()
+                storage.commit(accounts)
+            except Exception as e:
+                log_error(f"Import of {source.path} into {storage_format} storage failed; "
+                          f"no new vault was created: {str(e)}")
+                if isinstance(e, VaultLoadError):
+                    raise
+                raise VaultLoadError(f"Failed to import {source.path}: {str(e)}") from e
+            finally:
+                source.close()
+            log_event(f"Imported {len(accounts)} accounts from {source.path} "
+                      f"into {storage_format} storage")
+
+    return storage
@@ -1,96 +1,304 @@
 # logger.py
+"""Application logging.
+
+``log_event``, ``log_error`` and ``log_debug`` only build a LogRecord and
+put it on a queue (logging.handlers.QueueHandler); a QueueListener thread
+formats it and writes it to the log file and the console. Messages are
+formatted lazily: pass printf-style arguments, as in
+``log_debug("Loaded %d accounts", count)``, and the string is only built
+on the listener thread. Stacks for ``log_error`` and ``include_trace`` are
+captured as frame summaries without reading source lines, and rendered
+by the listener too.
+
+Call ``flush()`` to wait until everything queued has been written; the
+listener is stopped (and drained) at exit.
+
+Records go to ``logs/app.log``, rotated by size or by time with a fixed
+number of old files kept, as text or as JSON lines (one object per
+record, stack included) for tools; utils/log_query.py filters and tails
+either. The level, console echo, format and rotation start at the
+defaults below; main.py applies the "logging" settings through
+``configure_logging``. Records below the level are dropped before a
+record is even built.
+"""
+import atexit
+import json
 import logging
+import logging.handlers
 import os
-from datetime import datetime
-import traceback
+import queue
 import sys
+import threading
+import traceback
+from datetime import datetime
+
+LOG_DIR = 'logs'
+LOG_FILE = os.path.join(LOG_DIR, 'app.log')
+# Before rotation every launch wrote its own app_<timestamp>.log
+LEGACY_LOG_PREFIX = 'app_'
+# How the log file is rotated:
+#   size - when it reaches max_bytes
+#   time - at each `when` boundary (see logging.handlers.TimedRotatingFileHandler)
+#   none - never; the file grows without bound
+ROTATIONS = ("size", "time", "none")
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+DEFAULT_LEVEL = "INFO"
+DEFAULT_CONSOLE = False
+DEFAULT_ROTATION = "size"
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+DEFAULT_WHEN = "midnight"
+# text - LOG_FORMAT, with stack traces over the following lines
+# json - one JSON object per line (see JsonFormatter)
+LOG_FORMATS = ("text", "json")
+DEFAULT_FORMAT = "text"
+LOG_FORMAT = '%(asctime)s - %(levelname)s - [%(pathname)s:%(lineno)d] - %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Console prefixes, as printed before the pipeline was asynchronous
+CONSOLE_PREFIXES = {
+    logging.DEBUG: "Debug",
+    logging.INFO: "Event",
+    logging.WARNING: "Warning",
+    logging.ERROR: "Error",
+    logging.CRITICAL: "Critical",
+}
 
 # Create logs directory if it doesn't exist
-if not os.path.exists('logs'):
-    os.makedirs('logs')
-
-# Configure logging with more detailed format
-logging.basicConfig(
-    filename=f'logs/app_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log',
-    level=logging.DEBUG,
-    format='%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
+if not os.path.exists(LOG_DIR):
+    os.makedirs(LOG_DIR)
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """Queues records as they are, leaving all formatting to the listener.
+
+    The stock QueueHandler formats every record on the calling thread so
+    that it can be pickled; this queue never leaves the process.
+    """
+
+    def prepare(self, record):
+        return record
+
+class StackFormatter(logging.Formatter):
+    """Formatter that renders the stack captured by _capture_stack."""
+
+    def format(self, record):
+        text = super().format(record)
+        stack = getattr(record, 'stack_summary', None)
+        if stack is not None:
+            text += "\nStack trace:\n" + ''.join(stack.format())
+        return text
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one line of JSON: ts (epoch seconds), time,
+    level, file, line, func and message, plus exc or stack when present."""
+
+    def format(self, record):
+        entry = {
+            "ts": record.created,
+            "time": self.formatTime(record, DATE_FORMAT),
+            "level": record.levelname,
+            "file": record.pathname,
+            "line": record.lineno,
+            "func": record.funcName,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        stack = getattr(record, 'stack_summary', None)
+        if stack is not None:
+            entry["stack"] = ''.join(stack.format())
+        return json.dumps(entry, ensure_ascii=False)
+
+class ConsoleHandler(logging.Handler):
+    """Echoes records to whatever sys.stdout is when they are written."""
+
+    def emit(self, record):
+        try:
+            prefix = CONSOLE_PREFIXES.get(record.levelno, record.levelname)
+            sys.stdout.write(f"{prefix}: {record.getMessage()}\n")
+        except Exception:
+            self.handleError(record)
+
+class FlushingQueueListener(logging.handlers.QueueListener):
+    """QueueListener that answers the flush markers put by flush()."""
+
+    def handle(self, record):
+        event = getattr(record, 'flush_event', None)
+        if event is not None:
+            event.set()
+            return
+        super().handle(record)
+
+# The format uses none of these; skip looking them up for every record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
+def _make_file_handler(rotation, max_bytes, backup_count, when, log_format):
+    if rotation not in ROTATIONS:
+        raise ValueError(f"Unknown log rotation: {rotation}")
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"Unknown log format: {log_format}")
+    # delay: worker processes that never log never open the file
+    if rotation == "size":
+        handler = logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=max_bytes, backupCount=backup_count, delay=True
+        )
+    elif rotation == "time":
+        handler = logging.handlers.TimedRotatingFileHandler(
+            LOG_FILE, when=when, backupCount=backup_count, delay=True
+        )
+    else:
+        handler = logging.FileHandler(LOG_FILE, delay=True)
+    if log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(StackFormatter(LOG_FORMAT, DATE_FORMAT))
+    return handler
+
+def _sinks(console):
+    return (_file_handler, _console_handler) if console else (_file_handler,)
+
+_file_handler = _make_file_handler(
+    DEFAULT_ROTATION, DEFAULT_MAX_BYTES, DEFAULT_BACKUP_COUNT, DEFAULT_WHEN, DEFAULT_FORMAT
 )
+_console_handler = ConsoleHandler()
+
+_queue = queue.SimpleQueue()
+_listener = FlushingQueueListener(_queue, *_sinks(DEFAULT_CONSOLE))
+
+_logger = logging.getLogger('androvault')
+_logger.setLevel(DEFAULT_LEVEL)
+_logger.addHandler(LazyQueueHandler(_queue))
+_logger.propagate = False
+
+_listener.start()
+_stopped = False
+
+def _shutdown():
+    global _stopped
+    _stopped = True
+    _listener.stop()
+    _file_handler.close()
+
+atexit.register(_shutdown)
+
+def _log(level, message, args, exc_info=None, stack_summary=None):
+    """Queue one record attributed to the caller of the log_* function.
+
+    Cheaper than Logger.info() and friends, which search the stack for
+    the caller and look up thread and process details for every record.
+    """
+    frame = sys._getframe(2)
+    code = frame.f_code
+    record = _logger.makeRecord(
+        _logger.name, level, code.co_filename, frame.f_lineno, message, args, exc_info, code.co_name
+    )
+    if stack_summary is not None:
+        record.stack_summary = stack_summary
+    _logger.handle(record)
 
-def log_event(message, include_trace=False):
+def _capture_stack():
+    """Stack of the log_* function's caller, without source lines (see
+    StackFormatter)."""
+    stack = traceback.StackSummary.extract(traceback.walk_stack(sys._getframe(2)), lookup_lines=False)
+    # Outermost call first, like a traceback
+    stack.reverse()
+    return stack
+
+def log_event(message, *args, include_trace=False):
     """
     Log an informational event
     Args:
-        message: The message to log
+        message: The message to log (printf-style with args)
         include_trace: Whether to include the stack trace
     """
-    # Get caller frame info
-    frame = sys._getframe(1)
-    caller = f"{frame.f_code.co_filename}:{frame.f_lineno}"
-    
-    # Log with caller information
-    full_message = f"[{caller}] {message}"
-    logging.info(full_message)
-    
-    if include_trace:
-        stack = ''.join(traceback.format_stack()[:-1])
-        logging.info(f"Stack trace:\n{stack}")
-    
-    # Also print to console for debugging
-    print(f"Event: {message}")
-
-def log_error(message, exc_info=None):
+    if _logger.isEnabledFor(logging.INFO):
+        _log(logging.INFO, message, args, stack_summary=_capture_stack() if include_trace else None)
+
+def log_error(message, *args, exc_info=None):
     """
     Log an error with full stack trace
     Args:
-        message: The error message
+        message: The error message (printf-style with args)
         exc_info: Exception information (optional)
     """
-    # Get caller frame info
-    frame = sys._getframe(1)
-    caller = f"{frame.f_code.co_filename}:{frame.f_lineno}"
-    
-    # Log with caller information
-    full_message = f"[{caller}] ERROR: {message}"
-    
+    if not _logger.isEnabledFor(logging.ERROR):
+        return
     if exc_info:
-        logging.error(full_message, exc_info=exc_info)
-        # Also log the full traceback
-        logging.error(f"Full traceback:\n{''.join(traceback.format_tb(exc_info.__traceback__))}")
+        # The traceback is rendered by the listener from the exception
+        if isinstance(exc_info, BaseException):
+            exc_info = (type(exc_info), exc_info, exc_info.__traceback__)
+        _log(logging.ERROR, message, args, exc_info=exc_info)
     else:
-        logging.error(full_message)
-        # Log current stack trace
-        stack = ''.join(traceback.format_stack()[:-1])
-        logging.error(f"Stack trace:\n{stack}")
-    
-    # Also print to console for debugging
-    print(f"Error: {message}")
-
-def log_debug(message):
-    """Log debug information"""
-    # Get caller frame info
-    frame = sys._getframe(1)
-    caller = f"{frame.f_code.co_filename}:{frame.f_lineno}"
-    
-    # Log with caller information
-    full_message = f"[{caller}] DEBUG: {message}"
-    logging.debug(full_message)
-    
-    # Also print to console for debugging
-    print(f"Debug: {message}")
+        _log(logging.ERROR, message, args, stack_summary=_capture_stack())
+
+def log_debug(message, *args):
+    """Log debug information (printf-style with args)"""
+    if _logger.isEnabledFor(logging.DEBUG):
+        _log(logging.DEBUG, message, args)
+
+def flush(timeout=None):
+    """Block until every record queued so far has been written."""
+    if _stopped:
+        return True
+    event = threading.Event()
+    _queue.put(logging.makeLogRecord({'flush_event': event}))
+    return event.wait(timeout)
+
+def configure_logging(level=DEFAULT_LEVEL, console=DEFAULT_CONSOLE, rotation=DEFAULT_ROTATION,
+                      max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT, when=DEFAULT_WHEN,
+                      log_format=DEFAULT_FORMAT):
+    """
+    Apply logging settings, swapping sinks once queued records are written.
+
+    Args:
+        level: Lowest level logged (one of LOG_LEVELS)
+        console: Also echo records to stdout
+        rotation: One of ROTATIONS
+        max_bytes: File size that triggers "size" rotation
+        backup_count: Rotated files kept; older ones are deleted, as are
+            per-launch logs from before rotation beyond this many
+        when: Interval of "time" rotation, e.g. "midnight" or "H"
+        log_format: One of LOG_FORMATS
+    """
+    global _file_handler
+    level = level.upper()
+    if level not in LOG_LEVELS:
+        raise ValueError(f"Unknown log level: {level}")
+    file_handler = _make_file_handler(rotation, max_bytes, backup_count, when, log_format)
+    flush()
+    old_handler, _file_handler = _file_handler, file_handler
+    # The listener reads this tuple for every record; replacing it whole
+    # is safe while it runs
+    _listener.handlers = _sinks(console)
+    old_handler.close()
+    _logger.setLevel(level)
+    _prune_legacy_logs(backup_count)
+    log_event("Logging configured: level=%s, console=%s, rotation=%s, format=%s",
+              level, console, rotation, log_format)
+
+def _prune_legacy_logs(keep):
+    try:
+        legacy = sorted(name for name in os.listdir(LOG_DIR)
+                        if name.startswith(LEGACY_LOG_PREFIX) and name.endswith('.log'))
+        for name in legacy[:max(0, len(legacy) - keep)]:
+            os.remove(os.path.join(LOG_DIR, name))
+    except OSError as e:
+        log_error("Failed to prune old log files: %s", e)
 
 def get_last_logs(n=10):
     """
-    Retrieve the last n log entries
+    Retrieve the last n log entries, reading back from the end of the log
     Args:
         n: Number of log entries to retrieve
     Returns:
-        List of last n log entries
+        List of last n log entries (a text entry with a stack trace spans
+        several lines)
     """
+    from utils.log_query import tail
     try:
-        with open(logging.getLoggerClass().root.handlers[0].baseFilename, 'r') as f:
-            logs = f.readlines()
-            return logs[-n:]
+        flush()
+        return [raw for _, raw in tail(n, log_dir=LOG_DIR)]
     except Exception as e:
         print(f"Error retrieving logs: {str(e)}")
         return []
@@ -1,14 +1,34 @@
 # main.py
 import tkinter as tk
-from auth.authentication import authenticate
+from tkinter import messagebox
+from auth.authentication import authenticate, resume_password_change
+from data.rekey import rekey_pending
 from ui.main_window import MainWindow
 from manager.account_manager import AccountManager
-from logger import log_event, log_error
+from data.settings_manager import SettingsManager
+from utils.kdf import KDFParams
+from utils.durable_io import configure_durable_writes, get_writer
+from logger import log_event, log_error, configure_logging
+from utils.metrics import configure_metrics
 import sys
 import traceback
 
 def main():
     try:
+        settings = SettingsManager()
+        configure_logging(
+            level=settings.get_setting('logging', 'level'),
+            console=settings.get_setting('logging', 'console'),
+            rotation=settings.get_setting('logging', 'rotation'),
+            max_bytes=settings.get_setting('logging', 'max_bytes'),
+            backup_count=settings.get_setting('logging', 'backup_count'),
+            when=settings.get_setting('logging', 'when'),
+            log_format=settings.get_setting('logging', 'format')
+        )
+        configure_metrics(
+            enabled=settings.get_setting('metrics', 'enabled'),
+            dump_on_exit=settings.get_setting('metrics', 'dump_on_exit')
+        )
         root = tk.Tk()
         root.withdraw()  # Hide root during authentication
         
@@ -22,7 +42,43 @@ def main():
             master_password = authenticate(root)
             if master_password:
                 # Initialize account manager with decrypted data
-                account_manager = AccountManager(master_password)
+                configure_durable_writes(
+                    policy=settings.get_setting('storage', 'fsync_policy'),
+                    batch_size=settings.get_setting('storage', 'fsync_batch_size'),
+                    idle_delay=settings.get_setting('storage', 'fsync_idle_delay')
+                )
+                kdf = KDFParams.from_dict(settings.get_setting('security', 'kdf'))
+                if rekey_pending():
+                    master_password = resume_password_change(root, master_password, kdf)
+                    if not master_password:
+                        root.destroy()
+                        return
+                try:
+                    account_manager = AccountManager(
+                        master_password,
+                        storage_format=settings.get_setting('storage', 'format'),
+                        write_behind=settings.get_setting('storage', 'write_behind'),
+                        kdf=kdf
+                    )
+                except Exception as e:
+                    # Never open an empty vault in place of one that failed
+                    # to load; the file is left as it is
+                    log_error(f"Failed to open the vault: {str(e)}")
+                    messagebox.showerror(
+                        "Vault Error",
+                        f"Your vault could not be opened:\n{e}\n\n"
+                        "It has not been modified. Restore a backup to recover your accounts.",
+                        parent=root
+                    )
+                    root.destroy()
+                    return
+                if settings.get_setting('backup', 'auto_backup'):
+                    account_manager.start_auto_backup(
+                        interval_hours=settings.get_setting('backup', 'backup_interval'),
+                        change_threshold=settings.get_setting('backup', 'backup_after_changes'),
+                        keep_backups=settings.get_setting('backup', 'keep_backups'),
+                        max_age_days=settings.get_setting('backup', 'max_age_days')
+                    )
                 
                 # Show main window
                 root.deiconify()
@@ -31,6 +87,8 @@ def main():
                 # Launch main UI
                 app = MainWindow(root, account_manager)
                 root.mainloop()
+                account_manager.close()
+                get_writer().close()
             else:
                 log_event("Authentication failed or cancelled")
                 root.destroy()
@@ -0,0 +1,193 @@
+# manager/account.py
+ACCOUNT_FIELDS = (
+    'id',
+    'website',
+    'username',
+    'password',
+    'notes',
+    'created_at',
+    'modified_at',
+    'password_history',
+)
+
+class Account:
+    """One vault entry.
+
+    Uses ``__slots__`` so a large vault does not carry a per-account dict
+    with the same eight keys repeated. Item access (``account['website']``,
+    ``account.get('notes', '')``) still works for code written against the
+    old dict records; the on-disk format is unchanged and produced by
+    ``to_dict()``.
+
+    An account can be *sealed* (see ``seal()``): its password and password
+    history are then kept only as ciphertext and decrypted by the sealer
+    each time they are read, so listing and searching a vault never puts
+    every password in memory. A sealed history is returned as a new list;
+    assign to ``password_history`` to change it.
+    """
+
+    __slots__ = (
+        'id', 'website', 'username', 'notes', 'created_at', 'modified_at',
+        '_password', '_password_history', '_sealer'
+    )
+
+    def __init__(self, id=None, website='', username='', password='', notes='',
+                 created_at=None, modified_at=None, password_history=None):
+        """Initialize account record."""
+        self._sealer = None
+        self.id = id
+        self.website = website
+        self.username = username
+        self.password = password
+        self.notes = notes
+        self.created_at = created_at
+        self.modified_at = modified_at
+        self.password_history = password_history if password_history is not None else []
+
+    @classmethod
+    def sealed(cls, id, website, username, notes, created_at, modified_at,
+               password_blob, history_blob, sealer):
+        """Build a sealed account from ciphertext read from the vault."""
+        account = cls.__new__(cls)
+        account.id = id
+        account.website = website
+        account.username = username
+        account.notes = notes
+        account.created_at = created_at
+        account.modified_at = modified_at
+        account._password = password_blob
+        account._password_history = history_blob
+        account._sealer = sealer
+        return account
+
+    @property
+    def password(self):
+        if self._sealer is not None:
+            return self._sealer.open(self.id, 'password', self._password)
+        return self._password
+
+    @password.setter
+    def password(self, value):
+        if self._sealer is not None:
+            value = self._sealer.seal(self.id, 'password', value)
+        self._password = value
+
+    @property
+    def password_history(self):
+        if self._sealer is not None:
+            return self._sealer.open(self.id, 'password_history', self._password_history)
+        return self._password_history
+
+    @password_history.setter
+    def password_history(self, value):
+        if self._sealer is not None:
+            value = self._sealer.seal(self.id, 'password_history', value)
+        self._password_history = value
+
+    @property
+    def is_sealed(self):
+        """True when the password and history are held encrypted."""
+        return self._sealer is not None
+
+    def seal(self, sealer):
+        """Encrypt the password and history in place with sealer.
+
+        Accounts sealed by another sealer (e.g. one for an older salt) are
+        re-encrypted.
+        """
+        if self._sealer == sealer:
+            return
+        password, history = self.password, self.password_history
+        self._password = sealer.seal(self.id, 'password', password)
+        self._password_history = sealer.seal(self.id, 'password_history', history)
+        self._sealer = sealer
+
+    def sealed_secrets(self, sealer):
+        """Password and history ciphertext under sealer, without unsealing
+        accounts that are already sealed by it."""
+        if self._sealer == sealer:
+            return self._password, self._password_history
+        return (sealer.seal(self.id, 'password', self.password),
+                sealer.seal(self.id, 'password_history', self.password_history))
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build an account from a stored dict, ignoring unknown keys."""
+        if isinstance(data, cls):
+            return data
+        get = data.get
+        return cls(
+            get('id'),
+            get('website', ''),
+            get('username', ''),
+            get('password', ''),
+            get('notes', ''),
+            get('created_at'),
+            get('modified_at'),
+            get('password_history')
+        )
+
+    def to_dict(self):
+        """Plain dict for JSON serialization (unseals the secrets)."""
+        return {
+            'id': self.id,
+            'website': self.website,
+            'username': self.username,
+            'password': self.password,
+            'notes': self.notes,
+            'created_at': self.created_at,
+            'modified_at': self.modified_at,
+            'password_history': self.password_history
+        }
+
+    def copy(self):
+        """Shallow copy; a sealed account's copy shares its ciphertext."""
+        if self._sealer is not None:
+            return Account.sealed(
+                self.id, self.website, self.username, self.notes,
+                self.created_at, self.modified_at,
+                self._password, self._password_history, self._sealer
+            )
+        return Account(
+            self.id, self.website, self.username, self.password, self.notes,
+            self.created_at, self.modified_at, list(self.password_history)
+        )
+
+    # Dict-style access for callers that predate the record type
+
+    def __getitem__(self, key):
+        if key not in ACCOUNT_FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in ACCOUNT_FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in ACCOUNT_FIELDS
+
+    def get(self, key, default=None):
+        """Return a field value, or default for unknown or unset fields."""
+        if key not in ACCOUNT_FIELDS:
+            return default
+        value = getattr(self, key)
+        return default if value is None else value
+
+    def __eq__(self, other):
+        if not isinstance(other, Account):
+            return NotImplemented
+        return all(getattr(self, f) == getattr(other, f) for f in ACCOUNT_FIELDS)
+
+    __hash__ = None
+
+    def __repr__(self):
+        # Never include the password; form data ends up in debug logs
+        return f"Account(id={self.id!r}, website={self.website!r}, username={self.username!r})"
+
+def account_to_json(obj):
+    """``json.dumps(default=...)`` hook for Account records."""
+    if isinstance(obj, Account):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
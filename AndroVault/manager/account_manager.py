@@ -1,37 +1,108 @@
 # manager/account_manager.py
+import contextlib
 import json
 import os
-from utils.password_utils import encrypt_data, decrypt_data
+import threading
+from utils.crypto import CryptoService
+from utils.session_key import add_wipe_listener, remove_wipe_listener
+from utils.kdf import DEFAULT_KDF
+from data.vault_storage import open_storage
+from data.backup_manager import BackupManager
+from data.backup_scheduler import BackupScheduler
+from data.rekey import VaultRekeyer
+from manager.account import Account
+from manager.save_queue import SaveQueue
+from manager.search_index import TrigramIndex
+from manager.change_set import ChangeSet
+from constants import VAULT_STORAGE_FORMAT
 from logger import log_error, log_event, log_debug
+from utils.metrics import timed, increment
 from datetime import datetime
 from cryptography.fernet import InvalidToken
 import uuid
 
 ACCOUNTS_FILE = "accounts.json"
+# Longest a session lock waits for queued saves before wiping the keys
+LOCK_FLUSH_TIMEOUT = 30
 
 class AccountManager:
-    def __init__(self, master_password):
-        """Initialize account manager."""
+    def __init__(self, master_password, storage_format=VAULT_STORAGE_FORMAT, write_behind=False, kdf=None):
+        """
+        Initialize account manager.
+
+        Args:
+            master_password: Master password the vault key is derived from
+            storage_format: Vault storage backend: "binary" (the default,
+                VAULT_STORAGE_FORMAT), "journal" or "file" (see
+                data/vault_storage.py)
+            write_behind: Persist changes on a background thread instead of
+                blocking the caller (see manager/save_queue.py)
+            kdf: KDFParams the vault is encrypted with (see utils/kdf.py);
+                vaults written with other parameters are re-encrypted on load
+        Raises:
+            VaultLoadError (data/vault_storage.py) when the vault cannot be
+            read; nothing is written over it
+        """
+        # Guards the accounts against the background save thread
+        self._lock = threading.RLock()
+        # Ordered id -> account map: O(1) lookup, update and delete while
+        # keeping vault order
+        self._accounts = {}
+        self.save_queue = None
+        self.save_callback = None
+        self.backup_scheduler = None
+        self.search_index = TrigramIndex()
+        self.change_listeners = []
         try:
-            self.master_password = master_password
-            self.accounts_file = "data/accounts.enc"
+            # Derive the vault key once and reuse it for every save/load. The
+            # password is kept only by the session key, which a session lock
+            # wipes; the manager holds no copy of it
+            self.session_key = CryptoService(master_password, kdf=kdf or DEFAULT_KDF)
+            self.data_dir = "data"
             # Ensure data directory exists
-            os.makedirs(os.path.dirname(self.accounts_file), exist_ok=True)
+            os.makedirs(self.data_dir, exist_ok=True)
+            self.storage = open_storage(storage_format, self.data_dir, self.session_key)
+            self.accounts_file = self.storage.path
             self.accounts = self._load_accounts()
-            log_event(f"AccountManager initialized with {len(self.accounts)} accounts")
+            self.search_index.rebuild(self.accounts)
+            if write_behind:
+                self.save_queue = SaveQueue(self._save_accounts)
+                # Queued saves need the vault key; write them before a
+                # session lock wipes it
+                add_wipe_listener(self._flush_before_lock)
+            log_event("AccountManager initialized with %d accounts", len(self._accounts))
         except Exception as e:
+            # Carrying on with an empty vault would let the next save
+            # replace the accounts that failed to load
             log_error(f"Failed to initialize AccountManager: {str(e)}")
-            self.accounts = []
+            raise
+
+    @property
+    def accounts(self):
+        """All accounts in vault order (a new list)."""
+        with self._lock:
+            return list(self._accounts.values())
+
+    @accounts.setter
+    def accounts(self, accounts):
+        with self._lock:
+            accounts = (Account.from_dict(acc) for acc in accounts)
+            self._accounts = {acc.id: acc for acc in accounts}
 
-    def get_accounts(self, search_term=None):
-        """Get all accounts or filtered by search term"""
+    @timed("accounts.get")
+    def get_accounts(self, search_term=None, within=None):
+        """
+        Get all accounts or those matching a search term.
+
+        Args:
+            search_term: Substring of website, username or notes
+            within: Optional earlier result list to narrow down instead of
+                searching the whole vault
+        """
         if not search_term:
             return self.accounts
         
-        search_term = search_term.lower()
-        return [acc for acc in self.accounts 
-                if search_term in acc.get('website', '').lower() or 
-                   search_term in acc.get('username', '').lower()]
+        return self.search_index.search(search_term, within)
 
     def save_account(self, account_data):
         """Save or update an account"""
@@ -40,40 +111,40 @@ class AccountManager:
                 log_error("No account data provided")
                 return False
             
-            log_debug(f"Attempting to save account: {account_data.get('website')}")
-            
-            # Ensure accounts list exists
-            if not hasattr(self, 'accounts'):
-                self.accounts = []
-                log_debug("Initialized empty accounts list")
+            account_data = Account.from_dict(account_data)
+            log_debug("Attempting to save account: %s", account_data.website)
             
             # Validate required fields
             required_fields = ['website', 'username', 'password']
-            if not all(account_data.get(field) for field in required_fields):
-                log_error(f"Missing required fields: {[f for f in required_fields if not account_data.get(f)]}")
+            if not all(account_data[field] for field in required_fields):
+                log_error(f"Missing required fields: {[f for f in required_fields if not account_data[f]]}")
                 return False
 
-            # Generate ID for new accounts
-            if not account_data.get('id'):
-                account_data['id'] = str(uuid.uuid4())
-                self.accounts.append(account_data)
-                log_event(f"New account created with ID: {account_data['id']}")
+            with self._lock:
+                # Generate ID for new accounts
+                if not account_data.id:
+                    account_data.id = str(uuid.uuid4())
+                    log_event("New account created with ID: %s", account_data.id)
+                # Existing accounts keep their position when replaced
+                updated = account_data.id in self._accounts
+                # Keep the password encrypted while it sits in memory
+                sealer = getattr(self.storage, 'sealer', None)
+                if sealer is not None:
+                    account_data.seal(sealer)
+                self._accounts[account_data.id] = account_data
+                if updated:
+                    log_event("Updated account: %s", account_data.id)
+                self.search_index.add(account_data)
+
+            if updated:
+                self._notify_changes(ChangeSet(updated=[account_data.id]))
             else:
-                # Update existing account
-                updated = False
-                for i, acc in enumerate(self.accounts):
-                    if acc['id'] == account_data['id']:
-                        self.accounts[i] = account_data
-                        updated = True
-                        log_event(f"Updated account: {account_data['id']}")
-                        break
-                if not updated:
-                    self.accounts.append(account_data)
+                self._notify_changes(ChangeSet(inserted=[account_data.id]))
 
             # Save to disk
-            success = self._save_accounts()
+            success = self._persist([('upsert', account_data)])
             if success:
-                log_event(f"Account saved successfully: {account_data.get('website')}")
+                log_event("Account saved successfully: %s", account_data.website)
                 return True
             return False
             
@@ -81,108 +152,221 @@ class AccountManager:
             log_error(f"Error saving account: {str(e)}")
             return False
 
+    @timed("accounts.load")
     def _load_accounts(self):
-        """Load accounts from encrypted file"""
+        """Load accounts from encrypted storage.
+
+        Failures propagate (see data/vault_storage.VaultLoadError); the
+        storage then refuses writes.
+        """
         try:
-            if not os.path.exists(self.accounts_file):
-                log_event("No accounts file found, starting fresh")
-                return []
-            
-            with open(self.accounts_file, 'rb') as f:
-                encrypted_data = f.read()
-            
-            if not encrypted_data:
-                log_event("Empty accounts file found")
-                return []
-            
-            # Decrypt data
-            decrypted_data = decrypt_data(encrypted_data, self.master_password)
-            if not decrypted_data:
-                raise ValueError("Decryption returned empty data")
-            
-            # Parse JSON
-            accounts = json.loads(decrypted_data.decode('utf-8'))
-            log_event(f"Successfully loaded {len(accounts)} accounts")
+            accounts = [Account.from_dict(a) for a in self.storage.load()]
+            log_event("Successfully loaded %d accounts", len(accounts))
             return accounts
-            
+
         except Exception as e:
             log_error(f"Error loading accounts: {str(e)}")
-            return []
+            increment("accounts.load_failed")
+            raise
+
+    @timed("accounts.save")
+    def _save_accounts(self, changes=None):
+        """Encrypt and persist accounts.
 
-    def _save_accounts(self):
-        """Encrypt and save accounts to file."""
+        Args:
+            changes: List of ('upsert', account) / ('delete', account_id)
+                operations since the last save; None rewrites everything
+        """
         try:
             # Ensure data directory exists
-            os.makedirs(os.path.dirname(self.accounts_file), exist_ok=True)
-            
-            # Convert accounts to JSON
-            accounts_json = json.dumps(self.accounts)
+            os.makedirs(self.data_dir, exist_ok=True)
             
-            # Encrypt data
-            encrypted_data = encrypt_data(accounts_json.encode(), self.master_password)
-            if not encrypted_data:
-                raise ValueError("Failed to encrypt accounts data")
-            
-            # Save to file
-            with open(self.accounts_file, 'wb') as f:
-                f.write(encrypted_data)
+            with self._lock:
+                accounts = list(self._accounts.values())
+            self.storage.commit(accounts, changes)
                 
-            log_event(f"Saved {len(self.accounts)} accounts to disk")
+            log_event("Saved %d accounts to disk", len(accounts))
             return True
                 
         except Exception as e:
             log_error(f"Error saving accounts file: {str(e)}")
+            increment("accounts.save_failed")
             return False
 
+    def _persist(self, changes):
+        """Write changes now, or queue them when write-behind is enabled."""
+        if self.save_queue:
+            self.save_queue.submit(changes, self.save_callback)
+            return True
+        return self._save_accounts(changes)
+
+    def add_change_listener(self, callback):
+        """Register callback(change_set) run after accounts change in memory."""
+        if callback not in self.change_listeners:
+            self.change_listeners.append(callback)
+
+    def _notify_changes(self, change_set):
+        """Tell listeners which account IDs changed."""
+        for listener in self.change_listeners:
+            try:
+                listener(change_set)
+            except Exception as e:
+                log_error(f"Change listener failed: {str(e)}")
+
+    def set_save_callback(self, callback):
+        """Set callback(success) run on the save thread after each background write."""
+        self.save_callback = callback
+
+    def flush(self, timeout=None):
+        """Wait until every queued change is on disk."""
+        if not self.save_queue:
+            return True
+        return self.save_queue.flush(timeout)
+
+    def start_auto_backup(self, interval_hours=24, change_threshold=0, keep_backups=None, max_age_days=None):
+        """
+        Back up the vault in the background (see data/backup_scheduler.py).
+
+        Args:
+            interval_hours: Hours between backups (0: only on changes)
+            change_threshold: Back up after this many changed accounts
+                (0: only on the interval)
+            keep_backups: Keep at most this many backups
+            max_age_days: Delete backups older than this (0: never)
+        """
+        backup_manager = BackupManager(
+            self.data_dir,
+            session_key=self.session_key,
+            keep_backups=keep_backups,
+            max_age_days=max_age_days
+        )
+        self.backup_scheduler = BackupScheduler(
+            backup_manager,
+            interval_hours=interval_hours,
+            change_threshold=change_threshold,
+            before_backup=self.flush
+        )
+        self.add_change_listener(self._count_backup_changes)
+
+    def _count_backup_changes(self, change_set):
+        self.backup_scheduler.record_changes(len(change_set))
+
+    def _backups_paused(self):
+        if not self.backup_scheduler:
+            return contextlib.nullcontext()
+        return self.backup_scheduler.paused()
+
+    def _flush_before_lock(self):
+        if not self.flush(LOCK_FLUSH_TIMEOUT):
+            log_error("Queued saves were not written before the session locked")
+
+    def close(self):
+        """Flush pending saves and release storage resources."""
+        try:
+            remove_wipe_listener(self._flush_before_lock)
+            if self.backup_scheduler:
+                self.backup_scheduler.close()
+            if self.save_queue:
+                self.save_queue.close()
+            self.storage.close()
+        except Exception as e:
+            log_error(f"Failed to close account storage: {str(e)}")
+
+    def change_master_password(self, old_password, new_password, workers=None):
+        """
+        Re-encrypt the vault, 2FA secret and backups under a new password.
+
+        Blocks until done (see data/rekey.py); edits wait for it.
+
+        Args:
+            old_password: Current master password
+            new_password: Master password to switch to
+            workers: Worker processes for re-keying the binary vault
+        Returns:
+            RekeyStats with the work done and throughput, or None on failure
+        """
+        try:
+            self.flush()
+            with self._backups_paused(), self._lock:
+                self.storage.close()
+                rekeyer = VaultRekeyer(
+                    old_password,
+                    new_password,
+                    data_dir=self.data_dir,
+                    kdf=self.session_key.kdf,
+                    workers=workers
+                )
+                new_key = rekeyer.run()
+                # Reopen on the new key; accounts sealed by the old one are
+                # replaced by the re-keyed vault
+                self.session_key.wipe()
+                self.session_key = new_key
+                self.storage = type(self.storage)(self.storage.path, new_key)
+                if self.backup_scheduler:
+                    self.backup_scheduler.backup_manager.set_session_key(new_key)
+                self.accounts = self._load_accounts()
+                self.search_index.rebuild(self.accounts)
+            return rekeyer.stats
+        except Exception as e:
+            log_error(f"Failed to change master password: {str(e)}")
+            return None
+
     def get_account(self, account_id):
         """Get a single account by ID."""
         try:
-            accounts = self.get_accounts()
-            # Find account with matching ID
-            for account in accounts:
-                if account.get('id') == account_id:
-                    return account
-            return None
+            return self._accounts.get(account_id)
         except Exception as e:
             log_error(f"Failed to get account {account_id}: {str(e)}")
             return None
 
+    def get_accounts_by_ids(self, account_ids):
+        """Get the accounts for several IDs, skipping unknown ones."""
+        with self._lock:
+            return [self._accounts[i] for i in account_ids if i in self._accounts]
+
     def get_password_history(self, account_id):
         """Get password history for an account."""
         try:
-            # Implementation depends on how you store password history
-            # Return empty list if no history exists
-            return []
+            account = self.get_account(account_id)
+            # Decrypted on demand; sealed accounts keep only ciphertext
+            return account.password_history if account else []
         except Exception as e:
             log_error(f"Failed to get password history: {str(e)}")
             return None
 
     def delete_account(self, account_id):
         """Delete an account by ID."""
+        if not account_id:
+            log_error("No account ID provided for deletion")
+            return False
+        return self.delete_accounts([account_id])
+
+    def delete_accounts(self, account_ids):
+        """Delete several accounts by ID with a single save."""
         try:
-            if not account_id:
-                log_error("No account ID provided for deletion")
+            log_debug("Attempting to delete %d accounts", len(account_ids))
+            
+            with self._lock:
+                deleted = [i for i in account_ids if self._accounts.pop(i, None) is not None]
+                for account_id in deleted:
+                    self.search_index.remove(account_id)
+            
+            missing = len(account_ids) - len(deleted)
+            if missing:
+                log_error(f"{missing} accounts not found for deletion")
+            if not deleted:
                 return False
             
-            log_debug(f"Attempting to delete account: {account_id}")
+            self._notify_changes(ChangeSet(deleted=deleted))
             
-            # Find account index
-            for i, account in enumerate(self.accounts):
-                if account.get('id') == account_id:
-                    # Remove account
-                    self.accounts.pop(i)
-                    
-                    # Save changes to disk
-                    if self._save_accounts():
-                        log_event(f"Account deleted successfully: {account_id}")
-                        return True
-                    else:
-                        log_error("Failed to save changes after deletion")
-                        return False
-                    
-            log_error(f"Account not found for deletion: {account_id}")
-            return False
+            # Save changes to disk
+            if self._persist([('delete', account_id) for account_id in deleted]):
+                log_event("Deleted %d accounts successfully", len(deleted))
+                return True
+            else:
+                log_error("Failed to save changes after deletion")
+                return False
             
         except Exception as e:
-            log_error(f"Error deleting account: {str(e)}")
+            log_error(f"Error deleting accounts: {str(e)}")
             return False
@@ -0,0 +1,22 @@
+# manager/change_set.py
+
+class ChangeSet:
+    """IDs of accounts inserted, updated and deleted by one mutation."""
+
+    __slots__ = ('inserted', 'updated', 'deleted')
+
+    def __init__(self, inserted=(), updated=(), deleted=()):
+        """Initialize change set."""
+        self.inserted = list(inserted)
+        self.updated = list(updated)
+        self.deleted = list(deleted)
+
+    def __bool__(self):
+        return bool(self.inserted or self.updated or self.deleted)
+
+    def __len__(self):
+        return len(self.inserted) + len(self.updated) + len(self.deleted)
+
+    def __repr__(self):
+        return (f"ChangeSet(inserted={self.inserted}, updated={self.updated}, "
+                f"deleted={self.deleted})")
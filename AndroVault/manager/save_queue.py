@@ -0,0 +1,136 @@
+# manager/save_queue.py
+import threading
+import time
+from logger import log_event, log_error, log_debug
+
+class SaveQueue:
+    """Write-behind persistence worker.
+
+    Mutations are queued as change lists and committed on a background
+    thread, so encryption and disk I/O never run on the Tk event loop.
+    Changes submitted within ``coalesce_delay`` of each other are committed
+    together in a single write. Failed changes stay queued and are retried
+    with the next commit.
+    """
+
+    def __init__(self, commit_callback, coalesce_delay=0.25):
+        """
+        Initialize save queue.
+
+        Args:
+            commit_callback: Called as commit_callback(changes) on the worker
+                thread; returns True when the changes are on disk
+            coalesce_delay: Seconds to wait for more changes before writing
+        """
+        self.commit_callback = commit_callback
+        self.coalesce_delay = coalesce_delay
+        self._condition = threading.Condition()
+        self._pending = []
+        self._callbacks = []
+        self._busy = False
+        self._closed = False
+        self._urgent = False
+        self._rounds = 0
+        self._last_success = True
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, changes, callback=None):
+        """Queue changes; callback(success) runs on the worker thread."""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Save queue is closed")
+            self._pending.extend(changes)
+            if callback:
+                self._callbacks.append(callback)
+            self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if not self._pending and self._closed:
+                    return
+                self._busy = True
+
+                # Let a burst of edits land before writing, unless a flush
+                # or close is waiting on us
+                deadline = time.monotonic() + self.coalesce_delay
+                while not (self._closed or self._urgent):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(timeout=remaining)
+                self._urgent = False
+
+                changes, self._pending = self._pending, []
+                callbacks, self._callbacks = self._callbacks, []
+
+            try:
+                success = bool(self.commit_callback(changes))
+            except Exception as e:
+                log_error(f"Background save failed: {str(e)}")
+                success = False
+
+            with self._condition:
+                if success:
+                    log_debug(f"Background save committed {len(changes)} changes")
+                else:
+                    # Keep the changes for the next attempt
+                    self._pending[:0] = changes
+                self._rounds += 1
+                self._last_success = success
+                self._busy = False
+                self._condition.notify_all()
+
+            for callback in callbacks:
+                try:
+                    callback(success)
+                except Exception as e:
+                    log_error(f"Save callback failed: {str(e)}")
+
+            if not success:
+                with self._condition:
+                    if self._closed:
+                        log_error(f"Dropping {len(self._pending)} unsaved changes on close")
+                        return
+                    # Back off instead of spinning on a persistent failure
+                    self._condition.wait(timeout=1.0)
+
+    def has_pending(self):
+        """Check whether changes are waiting or being written."""
+        with self._condition:
+            return bool(self._pending) or self._busy
+
+    def flush(self, timeout=None):
+        """Block until every queued change has been committed.
+
+        Returns False when the timeout expires or the last commit failed.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            start_round = self._rounds
+            while self._pending or self._busy:
+                if self._rounds > start_round and not self._last_success:
+                    log_error("Background save still failing during flush")
+                    return False
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    log_error("Timed out waiting for background saves")
+                    return False
+                # Skip the coalescing delay and any back-off after a failure
+                self._urgent = True
+                self._condition.notify_all()
+                self._condition.wait(timeout=remaining)
+        return True
+
+    def close(self, timeout=None):
+        """Flush outstanding changes and stop the worker."""
+        flushed = self.flush(timeout)
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._worker.join(timeout)
+        log_event("Save queue closed")
+        return flushed
@@ -0,0 +1,119 @@
+# manager/search_index.py
+import threading
+from logger import log_debug
+
+SEARCH_FIELDS = ('website', 'username', 'notes')
+# Joins the fields of one account; never typed in a query, so no trigram
+# containing it can match and hits never span two fields
+FIELD_SEPARATOR = '\x00'
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class TrigramIndex:
+    """In-memory trigram index for substring search over accounts.
+
+    Each account's searchable fields are lowercased once when it is added.
+    A query of three or more characters intersects the posting sets of its
+    trigrams (smallest first) and confirms the candidates with a substring
+    check; shorter queries scan the pre-lowercased text. Results come back in
+    the order accounts were first added, matching the vault order.
+    """
+
+    def __init__(self, accounts=()):
+        """Initialize index, optionally with an initial account list."""
+        self._lock = threading.RLock()
+        self.rebuild(accounts)
+
+    def rebuild(self, accounts):
+        """Index a fresh account list from scratch."""
+        with self._lock:
+            self._postings = {}
+            self._texts = {}
+            self._accounts = {}
+            self._order = {}
+            self._next_order = 0
+            for account in accounts:
+                self.add(account)
+            log_debug(f"Search index built for {len(self._accounts)} accounts")
+
+    def _text(self, account):
+        return FIELD_SEPARATOR.join(
+            str(account.get(field) or '').lower() for field in SEARCH_FIELDS
+        )
+
+    def add(self, account):
+        """Add or replace an account."""
+        account_id = account['id']
+        text = self._text(account)
+        with self._lock:
+            old_text = self._texts.get(account_id)
+            if old_text is not None:
+                if old_text != text:
+                    self._unlink(account_id, old_text)
+                    self._link(account_id, text)
+            else:
+                self._order[account_id] = self._next_order
+                self._next_order += 1
+                self._link(account_id, text)
+            self._texts[account_id] = text
+            self._accounts[account_id] = account
+
+    def remove(self, account_id):
+        """Remove an account if present."""
+        with self._lock:
+            text = self._texts.pop(account_id, None)
+            if text is None:
+                return
+            self._unlink(account_id, text)
+            del self._accounts[account_id]
+            del self._order[account_id]
+
+    def _link(self, account_id, text):
+        for gram in _trigrams(text):
+            self._postings.setdefault(gram, set()).add(account_id)
+
+    def _unlink(self, account_id, text):
+        for gram in _trigrams(text):
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(account_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def search(self, term, candidates=None):
+        """
+        Find accounts whose website, username or notes contain term.
+
+        Args:
+            term: Case-insensitive substring to look for
+            candidates: Optional account list to restrict the search to
+        Returns:
+            Matching accounts in vault order
+        """
+        term = term.lower()
+        with self._lock:
+            if candidates is not None:
+                ids = [acc['id'] for acc in candidates]
+            elif len(term) < 3:
+                ids = self._texts.keys()
+            else:
+                postings = sorted(
+                    (self._postings.get(gram, ()) for gram in _trigrams(term)),
+                    key=len
+                )
+                if not postings or not postings[0]:
+                    return []
+                ids = set(postings[0])
+                for other in postings[1:]:
+                    ids &= other
+                    if not ids:
+                        return []
+
+            texts = self._texts
+            matches = [i for i in ids if i in texts and term in texts[i]]
+            matches.sort(key=self._order.__getitem__)
+            return [self._accounts[i] for i in matches]
+
+    def __len__(self):
+        return len(self._accounts)
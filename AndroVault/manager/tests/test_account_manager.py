@@ -0,0 +1,51 @@
+# manager/tests/test_account_manager.py
+import os
+import pytest
+from data.vault_storage import VaultLoadError
+from manager.account_manager import AccountManager
+
+FORMATS = ['binary', 'journal', 'file']
+
+def new_account(website):
+    return {'website': website, 'username': 'someone', 'password': f"secret-{website}"}
+
+@pytest.mark.parametrize('storage_format', FORMATS)
+def test_saved_accounts_are_loaded_again(storage_format, password, kdf):
+    manager = AccountManager(password, storage_format=storage_format, kdf=kdf)
+    for website in ("mail.example.com", "bank.example.com", "shop.example.com"):
+        assert manager.save_account(new_account(website))
+    bank = manager.get_accounts("bank")[0]
+    assert manager.delete_account(bank.id)
+    manager.close()
+
+    reopened = AccountManager(password, storage_format=storage_format, kdf=kdf)
+    assert [(a.website, a.password) for a in reopened.accounts] == [
+        ("mail.example.com", "secret-mail.example.com"),
+        ("shop.example.com", "secret-shop.example.com"),
+    ]
+    reopened.close()
+
+def test_write_behind_saves_reach_disk(password, kdf):
+    manager = AccountManager(password, write_behind=True, kdf=kdf)
+    for i in range(20):
+        manager.save_account(new_account(f"site{i}.example.com"))
+    manager.close()
+
+    assert len(AccountManager(password, kdf=kdf).accounts) == 20
+
+@pytest.mark.parametrize('storage_format', FORMATS)
+def test_vault_that_fails_to_load_is_left_alone(storage_format, password, kdf):
+    manager = AccountManager(password, storage_format=storage_format, kdf=kdf)
+    manager.save_account(new_account("mail.example.com"))
+    manager.close()
+    path = manager.accounts_file
+    with open(path, 'r+b') as f:
+        f.seek(os.path.getsize(path) - 20)
+        f.write(b'A' if f.read(1) != b'A' else b'B')
+    with open(path, 'rb') as f:
+        corrupt = f.read()
+
+    with pytest.raises(VaultLoadError):
+        AccountManager(password, storage_format=storage_format, kdf=kdf)
+    with open(path, 'rb') as f:
+        assert f.read() == corrupt
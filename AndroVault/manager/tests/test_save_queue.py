@@ -0,0 +1,70 @@
+# manager/tests/test_save_queue.py
+import threading
+import pytest
+from manager.save_queue import SaveQueue
+
+class Recorder:
+    """Commit callback that records each commit and fails on demand."""
+
+    def __init__(self, failures=0):
+        self.commits = []
+        self.failures = failures
+
+    def __call__(self, changes):
+        if self.failures:
+            self.failures -= 1
+            return False
+        self.commits.append(list(changes))
+        return True
+
+def test_burst_is_committed_once():
+    recorder = Recorder()
+    queue = SaveQueue(recorder, coalesce_delay=0.5)
+    for i in range(10):
+        queue.submit([('upsert', i)])
+    assert queue.flush(timeout=5)
+    assert recorder.commits == [[('upsert', i) for i in range(10)]]
+    assert not queue.has_pending()
+    queue.close()
+
+def test_callbacks_get_the_result():
+    results = []
+    done = threading.Event()
+    queue = SaveQueue(Recorder(), coalesce_delay=0)
+
+    def callback(success):
+        results.append(success)
+        done.set()
+
+    queue.submit([('delete', 'a')], callback)
+    assert done.wait(5)
+    assert results == [True]
+    queue.close()
+
+def test_failed_changes_are_retried():
+    recorder = Recorder(failures=1)
+    queue = SaveQueue(recorder, coalesce_delay=0)
+    queue.submit([('upsert', 1)])
+    # The first flush sees the failure; the changes stay queued
+    assert not queue.flush(timeout=5)
+    queue.submit([('upsert', 2)])
+    assert queue.flush(timeout=5)
+    assert recorder.commits == [[('upsert', 1), ('upsert', 2)]]
+    queue.close()
+
+def test_flush_gives_up_while_commits_keep_failing():
+    queue = SaveQueue(Recorder(failures=1000), coalesce_delay=0)
+    queue.submit([('upsert', 1)])
+    assert not queue.flush(timeout=5)
+    assert queue.has_pending()
+    assert not queue.close(timeout=5)
+
+def test_closed_queue_refuses_changes():
+    recorder = Recorder()
+    queue = SaveQueue(recorder, coalesce_delay=10)
+    queue.submit([('upsert', 1)])
+    # Closing skips the coalescing delay and writes what is queued
+    assert queue.close(timeout=5)
+    assert recorder.commits == [[('upsert', 1)]]
+    with pytest.raises(RuntimeError):
+        queue.submit([('upsert', 2)])
@@ -0,0 +1,58 @@
+# manager/tests/test_search_index.py
+from manager.search_index import TrigramIndex
+
+def account(account_id, website, username='', notes=''):
+    return {'id': account_id, 'website': website, 'username': username, 'notes': notes}
+
+def ids(accounts):
+    return [a['id'] for a in accounts]
+
+def make_index():
+    return TrigramIndex([
+        account('1', "mail.example.com", "alice@mail.example.com"),
+        account('2', "Bank.example.org", "alice", "Joint account"),
+        account('3', "shop.example.net", "bob", "Gift cards"),
+        account('4', "forum.example.com", "carol"),
+    ])
+
+def test_substring_search_is_case_insensitive_in_vault_order():
+    index = make_index()
+    assert ids(index.search("ALICE")) == ['1', '2']
+    assert ids(index.search("example.com")) == ['1', '4']
+    assert ids(index.search("gift")) == ['3']
+    assert index.search("nowhere") == []
+
+def test_short_terms_are_scanned():
+    index = make_index()
+    assert ids(index.search("bo")) == ['3']
+    assert ids(index.search("o")) == ['1', '2', '3', '4']
+
+def test_matches_do_not_span_fields():
+    index = TrigramIndex([account('1', "abc", "def")])
+    assert index.search("cde") == []
+    assert ids(index.search("abc")) == ['1']
+
+def test_updates_and_removals_are_indexed():
+    index = make_index()
+    index.add(account('1', "mail.example.com", "dave"))
+    assert ids(index.search("alice")) == ['2']
+    # Replacing an account keeps its position
+    assert ids(index.search("dave")) == ['1']
+    index.add(account('5', "dave.example.com"))
+    assert ids(index.search("dave")) == ['1', '5']
+    index.remove('1')
+    index.remove('missing')
+    assert ids(index.search("dave")) == ['5']
+    assert len(index) == 4
+
+def test_search_within_earlier_results():
+    index = make_index()
+    earlier = index.search("example.com")
+    assert ids(index.search("mail", earlier)) == ['1']
+    assert ids(index.search("ex", earlier)) == ['1', '4']
+
+def test_rebuild_replaces_everything():
+    index = make_index()
+    index.rebuild([account('9', "new.example.com")])
+    assert index.search("alice") == []
+    assert ids(index.search("new")) == ['9']
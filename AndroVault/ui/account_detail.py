@@ -9,6 +9,7 @@ from .password_history import PasswordHistory
 from logger import log_event, log_error, log_debug
 from datetime import datetime
 from .feedback import Feedback
+from manager.account import Account
 
 class AccountDetail(ttk.Frame):
     def __init__(self, parent, account_manager, feedback_callback, clipboard_manager):
@@ -127,14 +128,14 @@ class AccountDetail(ttk.Frame):
         """Load account data into form."""
         try:
             self.current_account = account  # Store the full account data
-            self.website_var.set(account['website'])
-            self.username_var.set(account['username'])
-            self.password_var.set(account['password'])
+            self.website_var.set(account.website)
+            self.username_var.set(account.username)
+            self.password_var.set(account.password)
             if hasattr(self, 'notes_text'):
                 self.notes_text.delete('1.0', tk.END)
-                self.notes_text.insert('1.0', account.get('notes', ''))
+                self.notes_text.insert('1.0', account.notes or '')
             self.enable()
-            log_event(f"Account loaded: {account['id']}")
+            log_event(f"Account loaded: {account.id}")
             return True
         except Exception as e:
             log_error(f"Failed to load account: {str(e)}")
@@ -142,25 +143,26 @@ class AccountDetail(ttk.Frame):
 
     def get_current_id(self):
         """Get current account ID."""
-        if hasattr(self, 'current_account') and isinstance(self.current_account, dict):
-            return self.current_account.get('id')
+        if isinstance(getattr(self, 'current_account', None), Account):
+            return self.current_account.id
         return None
 
     def get_form_data(self):
-        """Get current form data as dictionary"""
+        """Get current form data as an Account"""
         try:
             timestamp = datetime.now().timestamp()
+            current = getattr(self, 'current_account', {})
             
-            data = {
-                'id': self.get_current_id(),  # Use helper method
-                'website': self.website_var.get().strip(),
-                'username': self.username_var.get().strip(),
-                'password': self.password_var.get().strip(),
-                'notes': self.notes_text.get('1.0', tk.END).strip() if hasattr(self, 'notes_text') else '',
-                'created_at': getattr(self, 'current_account', {}).get('created_at', timestamp),
-                'modified_at': timestamp,
-                'password_history': getattr(self, 'current_account', {}).get('password_history', [])
-            }
+            data = Account(
+                id=self.get_current_id(),  # Use helper method
+                website=self.website_var.get().strip(),
+                username=self.username_var.get().strip(),
+                password=self.password_var.get().strip(),
+                notes=self.notes_text.get('1.0', tk.END).strip() if hasattr(self, 'notes_text') else '',
+                created_at=current.get('created_at', timestamp),
+                modified_at=timestamp,
+                password_history=current.get('password_history', [])
+            )
             
             log_debug(f"Form data collected: {data}")
             return data
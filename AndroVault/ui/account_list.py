@@ -4,12 +4,33 @@ from tkinter import ttk
 import constants
 from .tooltip import create_tooltip
 from logger import log_event, log_error, log_debug
+from utils.metrics import timed
 
 class AccountList(ttk.Frame):
-    def __init__(self, parent, select_callback):
-        """Initialize account list."""
+    def __init__(self, parent, select_callback, virtual=False, overscan=constants.VIRTUAL_LIST_OVERSCAN):
+        """
+        Initialize account list.
+
+        Args:
+            parent: Parent widget
+            select_callback: Called with the selected account ID
+            virtual: Keep the full list in Python and only create Treeview
+                rows for the visible window (for large vaults)
+            overscan: Extra rows materialized below the viewport in
+                virtual mode
+        """
         super().__init__(parent)
         self.select_callback = select_callback
+        self.virtual = virtual
+        self.overscan = overscan
+
+        # Virtual mode model: every row, plus the viewport into it
+        self._rows = []
+        self._row_index = {}
+        self._first = 0
+        self._visible = 20
+        self._selected_id = None
+
         self.setup_widgets()
 
     def setup_widgets(self):
@@ -29,84 +50,278 @@ class AccountList(ttk.Frame):
         # Configure columns
         self.tree.heading('website', text='Website')
         self.tree.heading('username', text='Username')
-        
+
         self.tree.column('website', width=150, minwidth=100)
         self.tree.column('username', width=150, minwidth=100)
 
         # Add scrollbars
-        y_scroll = ttk.Scrollbar(
-            list_frame,
-            orient=tk.VERTICAL,
-            command=self.tree.yview
-        )
-        self.tree.configure(yscrollcommand=y_scroll.set)
+        if self.virtual:
+            # The scrollbar drives the viewport over the Python-side rows
+            self.y_scroll = ttk.Scrollbar(
+                list_frame,
+                orient=tk.VERTICAL,
+                command=self._on_scrollbar
+            )
+            self.tree.bind('<Configure>', self._on_resize)
+            self.tree.bind('<MouseWheel>', self._on_mousewheel)
+            self.tree.bind('<Button-4>', self._on_mousewheel)
+            self.tree.bind('<Button-5>', self._on_mousewheel)
+            self.tree.bind('<Up>', lambda e: self._move_selection(-1))
+            self.tree.bind('<Down>', lambda e: self._move_selection(1))
+            self.tree.bind('<Prior>', lambda e: self._move_selection(-self._visible))
+            self.tree.bind('<Next>', lambda e: self._move_selection(self._visible))
+        else:
+            self.y_scroll = ttk.Scrollbar(
+                list_frame,
+                orient=tk.VERTICAL,
+                command=self.tree.yview
+            )
+            self.tree.configure(yscrollcommand=self.y_scroll.set)
 
         # Pack widgets
         self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        y_scroll.pack(side=tk.RIGHT, fill=tk.Y)
+        self.y_scroll.pack(side=tk.RIGHT, fill=tk.Y)
 
         # Bind selection event
         self.tree.bind('<<TreeviewSelect>>', self._on_select)
-        
+
         # Add tooltips
         create_tooltip(self.tree, "Double-click to edit account")
 
+    @timed("ui.account_list.update")
     def update_accounts(self, accounts):
         """Update the account list."""
         try:
+            if self.virtual:
+                self._rows = list(accounts)
+                self._row_index = {acc.id: i for i, acc in enumerate(self._rows)}
+                if self._selected_id not in self._row_index:
+                    self._selected_id = None
+                self._render()
+                log_event("Account list updated with %d items", len(accounts))
+                return
+
             # Store current selection
             current_selection = self.tree.selection()
-            
+
             # Clear existing items
-            for item in self.tree.get_children():
-                self.tree.delete(item)
+            self.tree.delete(*self.tree.get_children())
 
             # Add new items
             for account in accounts:
                 self.tree.insert(
                     '',
                     'end',
-                    iid=account['id'],
+                    iid=account.id,
                     values=(
-                        account['website'],
-                        account['username']
+                        account.website,
+                        account.username
                     )
                 )
 
             # Restore selection if it still exists
-            if current_selection and current_selection[0] in self.tree.get_children():
+            if current_selection and self.tree.exists(current_selection[0]):
                 self.tree.selection_set(current_selection)
 
-            log_event(f"Account list updated with {len(accounts)} items")
+            log_event("Account list updated with %d items", len(accounts))
 
         except Exception as e:
             log_error(f"Failed to update account list: {str(e)}")
 
+    def apply_changes(self, change_set, get_account):
+        """
+        Apply an account change set without rebuilding the whole list.
+
+        Args:
+            change_set: ChangeSet of inserted/updated/deleted account IDs
+            get_account: Callable returning the current account for an ID
+        Selection and scroll position are left as they are.
+        """
+        try:
+            if self.virtual:
+                self._apply_virtual_changes(change_set, get_account)
+                log_debug("Account list applied %d changes", len(change_set))
+                return
+
+            for account_id in change_set.deleted:
+                if self.tree.exists(account_id):
+                    self.tree.delete(account_id)
+
+            for account_id in change_set.updated:
+                account = get_account(account_id)
+                if account and self.tree.exists(account_id):
+                    self.tree.item(account_id, values=(account.website, account.username))
+
+            for account_id in change_set.inserted:
+                account = get_account(account_id)
+                if account and not self.tree.exists(account_id):
+                    self.tree.insert(
+                        '',
+                        'end',
+                        iid=account_id,
+                        values=(
+                            account.website,
+                            account.username
+                        )
+                    )
+
+            log_debug("Account list applied %d changes", len(change_set))
+
+        except Exception as e:
+            log_error(f"Failed to apply account list changes: {str(e)}")
+
+    def _apply_virtual_changes(self, change_set, get_account):
+        """Patch the Python-side rows, then re-render the viewport."""
+        positions = []
+        for account_id in change_set.deleted:
+            position = self._row_index.pop(account_id, None)
+            if position is not None:
+                positions.append(position)
+                if account_id == self._selected_id:
+                    self._selected_id = None
+        # Delete from the bottom up so earlier positions stay valid
+        for position in sorted(positions, reverse=True):
+            del self._rows[position]
+
+        # Deletions shift everything after them
+        first_changed = min(positions) if positions else len(self._rows)
+        for position in range(first_changed, len(self._rows)):
+            self._row_index[self._rows[position].id] = position
+
+        for account_id in change_set.updated:
+            account = get_account(account_id)
+            position = self._row_index.get(account_id)
+            if account and position is not None:
+                self._rows[position] = account
+
+        for account_id in change_set.inserted:
+            account = get_account(account_id)
+            if account and account_id not in self._row_index:
+                self._row_index[account_id] = len(self._rows)
+                self._rows.append(account)
+
+        # Only touch Treeview rows when the viewport could have changed
+        end = self._first + self._visible + self.overscan
+        if (change_set.deleted or change_set.inserted or
+                any(self._first <= self._row_index.get(i, -1) < end for i in change_set.updated)):
+            self._render()
+
+    def _render(self):
+        """Materialize only the rows inside the viewport (virtual mode)."""
+        total = len(self._rows)
+        self._first = max(0, min(self._first, total - self._visible))
+        end = min(total, self._first + self._visible + self.overscan)
+
+        self.tree.delete(*self.tree.get_children())
+        for account in self._rows[self._first:end]:
+            self.tree.insert(
+                '',
+                'end',
+                iid=account.id,
+                values=(
+                    account.website,
+                    account.username
+                )
+            )
+
+        # Restore selection from the model when it is in view
+        if self._selected_id and self.tree.exists(self._selected_id):
+            self.tree.selection_set(self._selected_id)
+
+        if total:
+            self.y_scroll.set(self._first / total, min(1.0, (self._first + self._visible) / total))
+        else:
+            self.y_scroll.set(0.0, 1.0)
+
+    def _scroll_to(self, first):
+        """Move the viewport so that row `first` is at the top."""
+        first = max(0, min(first, len(self._rows) - self._visible))
+        if first != self._first:
+            self._first = first
+            self._render()
+
+    def _on_scrollbar(self, action, *args):
+        """Handle scrollbar drags and clicks (virtual mode)."""
+        if action == 'moveto':
+            self._scroll_to(int(float(args[0]) * len(self._rows)))
+        elif action == 'scroll':
+            amount = int(args[0])
+            step = self._visible if args[1] == 'pages' else 1
+            self._scroll_to(self._first + amount * step)
+
+    def _on_mousewheel(self, event):
+        """Scroll the viewport with the mouse wheel (virtual mode)."""
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            self._scroll_to(self._first - 3)
+        else:
+            self._scroll_to(self._first + 3)
+        return 'break'
+
+    def _on_resize(self, event):
+        """Recompute how many rows fit in the viewport (virtual mode)."""
+        row_height = ttk.Style().lookup('Treeview', 'rowheight') or 20
+        # Leave room for the heading row
+        visible = max(1, (event.height - int(row_height)) // int(row_height))
+        if visible != self._visible:
+            self._visible = visible
+            self._render()
+
+    def _move_selection(self, offset):
+        """Move the selection with the keyboard across the whole model."""
+        if not self._rows:
+            return 'break'
+        position = self._row_index.get(self._selected_id, -1 if offset > 0 else len(self._rows))
+        position = max(0, min(len(self._rows) - 1, position + offset))
+        self.select_account(self._rows[position].id)
+        return 'break'
+
     def _on_select(self, event):
         """Handle account selection."""
         selection = self.tree.selection()
         if selection and self.select_callback:
             account_id = selection[0]
-            log_debug(f"Account selected from list: {account_id}")
+            if self.virtual:
+                # Re-rendering restores the selection; only react to real changes
+                if account_id == self._selected_id:
+                    return
+                self._selected_id = account_id
+            log_debug("Account selected from list: %s", account_id)
             self.select_callback(account_id)
 
     def get_selected(self):
         """Get selected account ID."""
+        if self.virtual:
+            return self._selected_id
         selection = self.tree.selection()
         return selection[0] if selection else None
 
     def clear_selection(self):
         """Clear current selection."""
+        self._selected_id = None
         self.tree.selection_remove(self.tree.selection())
 
     def select_account(self, account_id):
         """Select specific account."""
         try:
-            if account_id in self.tree.get_children():
+            if self.virtual:
+                position = self._row_index.get(account_id)
+                if position is None:
+                    return
+                self._selected_id = account_id
+                # Ensure visible
+                if not self._first <= position < self._first + self._visible:
+                    self._first = position - self._visible // 2
+                self._render()
+                self.tree.focus(account_id)
+                self.select_callback(account_id)
+                log_debug("Selected account: %s", account_id)
+                return
+
+            if self.tree.exists(account_id):
                 self.tree.selection_set(account_id)
                 self.tree.see(account_id)  # Ensure visible
                 # Important: Trigger the selection callback
                 self.select_callback(account_id)
-                log_debug(f"Selected account: {account_id}")
+                log_debug("Selected account: %s", account_id)
         except Exception as e:
             log_error(f"Failed to select account: {str(e)}")
@@ -33,7 +33,7 @@ class Feedback(ttk.Frame):
                 
             # Set message
             self.message_var.set(message)
-            log_event(f"Feedback shown: {message} ({message_type})")
+            log_event("Feedback shown: %s (%s)", message, message_type)
             
         except Exception as e:
             log_error(f"Failed to show feedback: {str(e)}")
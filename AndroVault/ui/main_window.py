@@ -8,11 +8,14 @@ from .action_buttons import ActionButtons
 from .feedback import Feedback
 from .password_generator import PasswordGenerator
 from logger import log_event, log_error, log_debug
+from utils import metrics
 import constants
 import uuid
+import queue
 from datetime import datetime
 from tkinter import messagebox
 from .clipboard_manager import ClipboardManager
+from .search_pipeline import SearchPipeline
 
 class MainWindow(ttk.Frame):
     def __init__(self, root, account_manager):
@@ -44,6 +47,16 @@ class MainWindow(ttk.Frame):
             # Now that everything is initialized, load accounts
             self.refresh_accounts()
             
+            # Apply account edits to the list as deltas
+            if hasattr(self.account_store, 'add_change_listener'):
+                self.account_store.add_change_listener(self.on_accounts_changed)
+            
+            # Background saves report back through this queue
+            self.save_results = queue.Queue()
+            if hasattr(self.account_store, 'set_save_callback'):
+                self.account_store.set_save_callback(self.save_results.put)
+                self.root.after(100, self._poll_save_results)
+            
             log_event("Main window initialized successfully")
             
         except Exception as e:
@@ -56,6 +69,7 @@ class MainWindow(ttk.Frame):
         self.root.geometry("1024x768")
         self.root.minsize(800, 600)
         self.pack(fill=tk.BOTH, expand=True)
+        self.root.bind('<Control-Shift-M>', lambda e: self.dump_metrics())
 
     def setup_styles(self):
         """Setup ttk styles."""
@@ -85,8 +99,19 @@ class MainWindow(ttk.Frame):
             self.search_box.pack(fill=tk.X, pady=(0, 10))
             
             # Create account list after search box
-            self.account_list = AccountList(left_panel, self.on_account_select)
+            self.account_list = AccountList(
+                left_panel,
+                self.on_account_select,
+                virtual=constants.VIRTUAL_ACCOUNT_LIST
+            )
             self.account_list.pack(fill=tk.BOTH, expand=True)
+            
+            # Searches run in the background and land in the account list
+            self.search_pipeline = SearchPipeline(
+                self.root,
+                self._run_search,
+                self._show_search_results
+            )
 
             # Right panel
             right_panel = ttk.Frame(main_container)
@@ -127,25 +152,32 @@ class MainWindow(ttk.Frame):
     def on_search(self, search_term):
         """Handle search."""
         try:
-            results = self.account_store.get_accounts(search_term)
-            self.account_list.update_accounts(results)
+            self.search_pipeline.submit(search_term)
         except Exception as e:
             log_error(f"Search error: {str(e)}")
             self.show_feedback("Search failed", "error")
 
+    def _run_search(self, search_term, within):
+        """Search the store (runs on the search worker thread)."""
+        return self.account_store.get_accounts(search_term, within)
+
+    def _show_search_results(self, search_term, results):
+        """Show search results (runs on the Tk thread)."""
+        self.account_list.update_accounts(results)
+
     def on_account_select(self, account_id):
         """Handle account selection."""
         try:
             if not account_id:
                 return
             
-            log_debug(f"Loading account: {account_id}")
+            log_debug("Loading account: %s", account_id)
             account = self.account_store.get_account(account_id)
             
             if account:
                 self.account_detail.load_account(account)
                 self.actions.enable_save()  # Enable save button for editing
-                log_event(f"Account loaded: {account_id}")
+                log_event("Account loaded: %s", account_id)
             else:
                 log_error(f"Account not found: {account_id}")
             
@@ -176,7 +208,7 @@ class MainWindow(ttk.Frame):
             # Save to store
             if self.account_store.save_account(account_data):
                 self.show_feedback("New account added", "success")
-                self.refresh_accounts()
+                self._refresh_if_unobserved()
                 # Select the new account
                 self.account_list.select_account(account_data['id'])
                 log_event(f"New account added: {account_data.get('website')}")
@@ -217,7 +249,7 @@ class MainWindow(ttk.Frame):
             # Save changes
             if self.account_store.save_account(account_data):
                 self.show_feedback("Account updated successfully", "success")
-                self.refresh_accounts()
+                self._refresh_if_unobserved()
                 return True
             else:
                 self.show_feedback("Failed to update account", "error")
@@ -247,7 +279,7 @@ class MainWindow(ttk.Frame):
             # Delete the account
             if self.account_store.delete_account(current_id):
                 self.show_feedback("Account deleted successfully", "success")
-                self.refresh_accounts()
+                self._refresh_if_unobserved()
                 # Clear the form
                 self.account_detail.clear()
                 return True
@@ -260,14 +292,60 @@ class MainWindow(ttk.Frame):
             self.show_feedback("Error deleting account", "error")
             return False
 
+    def _poll_save_results(self):
+        """Show the outcome of background saves (runs on the Tk thread)."""
+        try:
+            results = []
+            while True:
+                try:
+                    results.append(self.save_results.get_nowait())
+                except queue.Empty:
+                    break
+            if results and not all(results):
+                self.show_feedback("Failed to write changes to disk - will retry", "error")
+            elif results:
+                self.show_feedback("All changes saved", "success")
+        except Exception as e:
+            log_error(f"Failed to process save results: {str(e)}")
+        finally:
+            self.root.after(100, self._poll_save_results)
+
+    def dump_metrics(self):
+        """Write the timings recorded so far to the log."""
+        if not metrics.is_enabled():
+            self.show_feedback("Metrics are disabled in settings", "info")
+            return
+        metrics.dump()
+        self.show_feedback("Metrics written to the log", "success")
+
     def show_feedback(self, message, message_type="info"):
         """Show feedback message."""
         self.feedback.show_message(message, message_type)
 
+    def on_accounts_changed(self, change_set):
+        """Patch the account list with the IDs that just changed."""
+        try:
+            self.search_pipeline.invalidate()
+            search_term = self.search_box.get_search_term()
+            if search_term:
+                # Changed accounts may enter or leave the filtered results
+                self.search_pipeline.submit(search_term)
+            else:
+                self.account_list.apply_changes(change_set, self.account_store.get_account)
+        except Exception as e:
+            log_error(f"Failed to apply account changes: {str(e)}")
+            self.refresh_accounts()
+
+    def _refresh_if_unobserved(self):
+        """Fully refresh stores that do not report change sets."""
+        if not hasattr(self.account_store, 'add_change_listener'):
+            self.refresh_accounts()
+
     def refresh_accounts(self):
         """Refresh the accounts list."""
         try:
             log_debug("Refreshing account list")
+            self.search_pipeline.invalidate()
             accounts = self.account_store.get_accounts()
             
             if accounts is not None:
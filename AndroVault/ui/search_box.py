@@ -5,10 +5,20 @@ import constants
 from .tooltip import create_tooltip
 
 class SearchBox(ttk.Frame):
-    def __init__(self, parent, search_callback):
-        """Initialize search box."""
+    def __init__(self, parent, search_callback, debounce_ms=constants.SEARCH_DEBOUNCE_MS):
+        """
+        Initialize search box.
+
+        Args:
+            parent: Parent widget
+            search_callback: Called with the search text once typing pauses
+            debounce_ms: Quiet period after the last keystroke before
+                search_callback fires (0 to search on every keystroke)
+        """
         super().__init__(parent)
         self.search_callback = search_callback
+        self.debounce_ms = debounce_ms
+        self._pending_search = None
         self.setup_widgets()
 
     def setup_widgets(self):
@@ -36,7 +46,7 @@ class SearchBox(ttk.Frame):
         )
         self.search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
         
-        create_tooltip(self.search_entry, "Search accounts by website or username")
+        create_tooltip(self.search_entry, "Search accounts by website, username or notes")
 
         # Clear button
         self.clear_button = ttk.Button(
@@ -64,9 +74,20 @@ class SearchBox(ttk.Frame):
         else:
             self.clear_button.pack_forget()
         
-        # Call search callback
+        # Restart the debounce timer; clearing the box searches right away
+        if self._pending_search:
+            self.after_cancel(self._pending_search)
+            self._pending_search = None
+        if not search_text or not self.debounce_ms:
+            self._fire_search()
+        else:
+            self._pending_search = self.after(self.debounce_ms, self._fire_search)
+
+    def _fire_search(self):
+        """Run the search callback with the current text."""
+        self._pending_search = None
         if self.search_callback:
-            self.search_callback(search_text)
+            self.search_callback(self.search_var.get())
 
     def clear_search(self):
         """Clear search field."""
@@ -0,0 +1,107 @@
+# ui/search_pipeline.py
+import queue
+import threading
+from logger import log_error, log_debug
+
+class SearchPipeline:
+    """Runs account searches off the Tk thread and delivers the newest result.
+
+    Only the latest submitted query is ever waiting to run; a query that is
+    superseded before the worker picks it up is dropped, and results of a
+    query that finishes after a newer one was submitted are discarded. When
+    a query extends the previously delivered one (e.g. "ban" -> "bank") the
+    earlier results are narrowed down instead of searching the whole vault.
+    Results reach ``deliver_callback`` on the Tk thread via ``after()``.
+    """
+
+    POLL_MS = 15
+
+    def __init__(self, root, search_callback, deliver_callback):
+        """
+        Initialize search pipeline.
+
+        Args:
+            root: Tk widget used for after() scheduling
+            search_callback: search_callback(term, within) -> account list,
+                called on the worker thread
+            deliver_callback: deliver_callback(term, results), called on the
+                Tk thread
+        """
+        self.root = root
+        self.search_callback = search_callback
+        self.deliver_callback = deliver_callback
+        self._condition = threading.Condition()
+        self._request = None
+        self._generation = 0
+        self._completed = 0
+        self._results = queue.Queue()
+        self._polling = False
+        self._last_term = None
+        self._last_results = None
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, term):
+        """Search for term, superseding any query still in flight."""
+        within = None
+        if (self._last_term and self._last_results is not None
+                and term.lower().startswith(self._last_term.lower())):
+            within = self._last_results
+
+        with self._condition:
+            self._generation += 1
+            self._request = (self._generation, term, within)
+            self._condition.notify()
+
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+
+    def invalidate(self):
+        """Forget cached results after the vault changed."""
+        self._last_term = None
+        self._last_results = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._request is None:
+                    self._condition.wait()
+                generation, term, within = self._request
+                self._request = None
+
+            try:
+                results = self.search_callback(term, within)
+            except Exception as e:
+                log_error(f"Background search failed: {str(e)}")
+                results = None
+
+            if generation != self._generation:
+                log_debug("Dropped stale search results for '%s'", term)
+                continue
+            self._results.put((generation, term, results))
+
+    def _poll(self):
+        """Deliver finished results on the Tk thread."""
+        try:
+            while True:
+                try:
+                    generation, term, results = self._results.get_nowait()
+                except queue.Empty:
+                    break
+                if generation != self._generation:
+                    continue
+                self._completed = generation
+                if results is None:
+                    continue
+                self._last_term = term
+                self._last_results = results
+                self.deliver_callback(term, results)
+        except Exception as e:
+            log_error(f"Failed to deliver search results: {str(e)}")
+
+        # Keep polling until the newest query has been answered
+        if self._completed == self._generation:
+            self._polling = False
+        else:
+            self.root.after(self.POLL_MS, self._poll)
@@ -1,54 +1,99 @@
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.backends import default_backend
-import base64
-import os
-
-def derive_key(password: str, salt: bytes = None) -> bytes:
-    """Derive encryption key from password"""
-    if salt is None:
-        salt = os.urandom(16)
-    password = password.encode()
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=100000,
-        backend=default_backend()
-    )
-    return base64.urlsafe_b64encode(kdf.derive(password))
-
-def encrypt_data(data: bytes, key: str) -> bytes:
-    """Encrypt data using key"""
+# utils/crypto.py
+"""One place for the master-password cryptography.
+
+``CryptoService`` is a ``SessionKey`` (keys derived once per salt and KDF,
+wiped when the session locks) with an API per use:
+
+* vault:   ``aead(salt, kdf)``, ``cipher(salt)``, ``encrypt``/``decrypt``
+* 2FA:     ``encrypt_secret``/``decrypt_secret``
+* backups: ``stream_writer``/``stream_reader``
+
+Every password-keyed blob outside the binary vault and the streams uses
+the ``salt(16) | Fernet token`` layout, so any of them can be decrypted
+from the password alone. ``encrypt_data``/``decrypt_data`` accept a
+password string or a service; strings go through a cached service instead
+of deriving a key for every call.
+"""
+import threading
+from cryptography.fernet import InvalidToken
+from logger import log_error
+from utils import kdf
+from utils.session_key import SessionKey, SALT_SIZE
+from utils.stream_crypto import EncryptingWriter, DecryptingReader, DEFAULT_CHUNK_SIZE
+
+# Service for the last master password passed as a string; one slot, so
+# no password-keyed table outlives a session lock
+_cached_service = None
+_cache_lock = threading.Lock()
+
+class CryptoService(SessionKey):
+    """Keyed cipher cache for one master password (see module docstring)."""
+
+    @classmethod
+    def for_password(cls, master_password):
+        """Shared service for master_password, created on first use."""
+        global _cached_service
+        with _cache_lock:
+            service = _cached_service
+            if service is None or service.is_locked or service._password != master_password:
+                service = cls(master_password)
+                _cached_service = service
+            return service
+
+    def encrypt_secret(self, secret):
+        """Encrypt a small secret (str or bytes) such as the 2FA seed."""
+        if isinstance(secret, str):
+            secret = secret.encode('utf-8')
+        return self.salt + self.cipher().encrypt(secret)
+
+    def decrypt_secret(self, encrypted_data):
+        """Decrypt ``salt | token`` bytes under the salt they carry.
+
+        Unlike ``decrypt`` the session salt is left alone.
+        """
+        salt = encrypted_data[:SALT_SIZE]
+        try:
+            return self.cipher(salt).decrypt(encrypted_data[SALT_SIZE:])
+        except InvalidToken:
+            raise ValueError("Decryption failed (wrong password or corrupted data)")
+
+    def stream_writer(self, fileobj, chunk_size=DEFAULT_CHUNK_SIZE):
+        """File-like writer encrypting into fileobj chunk by chunk."""
+        return EncryptingWriter(fileobj, self, chunk_size)
+
+    def stream_reader(self, fileobj):
+        """File-like reader decrypting a stream_writer stream."""
+        return DecryptingReader(fileobj, self)
+
+def _service(key):
+    return CryptoService.for_password(key) if isinstance(key, str) else key
+
+def derive_key(password: str, salt: bytes) -> bytes:
+    """Fernet key for password and salt (PBKDF2-SHA256, see utils/kdf.py)."""
+    return kdf.fernet_key(password, salt)
+
+def encrypt_data(data: bytes, key) -> bytes:
+    """Encrypt data as ``salt | Fernet token``.
+
+    ``key`` is a master password string or a SessionKey/CryptoService.
+    """
     try:
         if not isinstance(data, bytes):
             raise ValueError("Data must be bytes")
-            
-        # Generate encryption key from password
-        fernet = Fernet(derive_key(key))
-        
-        # Encrypt data
-        return fernet.encrypt(data)
-        
+        return _service(key).encrypt(data)
     except Exception as e:
         log_error(f"Failed to encrypt data: {str(e)}")
         raise
 
-def decrypt_data(encrypted_data: bytes, key: str) -> bytes:
-    """Decrypt data using key"""
+def decrypt_data(encrypted_data: bytes, key) -> bytes:
+    """Decrypt ``salt | Fernet token`` data from encrypt_data."""
     try:
         if not isinstance(encrypted_data, bytes):
             raise ValueError("Encrypted data must be bytes")
-            
-        # Generate encryption key from password
-        fernet = Fernet(derive_key(key))
-        
-        # Decrypt data
-        return fernet.decrypt(encrypted_data)
-        
+        service = _service(key)
+        if isinstance(service, CryptoService):
+            return service.decrypt_secret(encrypted_data)
+        return service.decrypt(encrypted_data)
     except Exception as e:
         log_error(f"Failed to decrypt data: {str(e)}")
-        raise
\ No newline at end of file
+        raise
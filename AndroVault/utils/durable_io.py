@@ -0,0 +1,286 @@
+# utils/durable_io.py
+import contextlib
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from logger import log_event, log_error, log_debug
+
+# When data written by a DurableWriter is forced to disk:
+#   always  - fsync before every rename/append returns (slowest, no data loss)
+#   batched - fsync once every `batch_size` writes
+#   idle    - fsync after `idle_delay` seconds without writes
+# Replacements always fsync the temp file's data before renaming it over
+# the target; the policy only defers the directory fsync that makes the
+# rename durable, plus the fsync of appended data. So a crash under
+# batched/idle can lose the latest writes, but a replaced file is always
+# either its old or its new contents in full.
+FSYNC_POLICIES = ("always", "batched", "idle")
+
+# Write-ahead logs written by earlier versions; recover() still replays one
+# a crash left behind
+WAL_SUFFIX = ".wal"
+WAL_RECORD_HEADER = struct.Struct(">II")  # length, crc32
+
+def _fsync_path(path):
+    """fsync an existing file by path."""
+    # Writable: on Windows fsync (_commit) fails with EBADF on a read-only
+    # descriptor
+    fd = os.open(path, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _fsync_dir(path):
+    """fsync the directory holding path so a rename is durable (POSIX only)."""
+    if os.name != 'posix':
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class DurableWriter:
+    """Crash-safe file writes with an explicit fsync policy.
+
+    ``write_file`` replaces a file atomically (temp file + rename).
+    ``open_file`` streams a replacement without holding it in memory.
+    ``append_file`` appends to a log-structured file such as the journal.
+    ``recover`` replays a write-ahead log left by an earlier version.
+    """
+
+    def __init__(self, policy="always", batch_size=10, idle_delay=2.0):
+        """Initialize durable writer."""
+        if policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {policy}")
+        self.policy = policy
+        self.batch_size = max(1, int(batch_size))
+        self.idle_delay = idle_delay
+        self._lock = threading.RLock()
+        # Appended files whose data is not synced yet
+        self._dirty = set()
+        # Replaced files whose rename is not synced yet (their data is)
+        self._renamed = set()
+        self._writes_since_sync = 0
+        # Idle policy: one flusher thread sleeps until this deadline, which
+        # every write pushes back
+        self._deadline = None
+        self._wakeup = threading.Event()
+        self._flusher = None
+        self._closed = False
+
+    def write_file(self, path, data: bytes):
+        """Atomically replace path with data."""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        with self._lock:
+            self._replace(path, data)
+            self._after_replace(path)
+        return True
+
+    def _replace(self, path, data):
+        """Write data to a temp file next to path, sync it and rename it
+        over path."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(
+            dir=directory,
+            prefix=os.path.basename(path) + ".",
+            suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _after_replace(self, path):
+        """Sync or defer the rename of path (lock held)."""
+        if self.policy == "always":
+            _fsync_dir(path)
+        else:
+            self._renamed.add(path)
+        self._after_write()
+
+    @contextlib.contextmanager
+    def open_file(self, path):
+        """Stream a replacement for path; it is renamed over path on success.
+
+        The temp file is synced before the rename. If the with-block
+        raises, path is left untouched.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(
+            dir=directory,
+            prefix=os.path.basename(path) + ".",
+            suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                yield f
+                f.flush()
+                os.fsync(f.fileno())
+            with self._lock:
+                os.replace(temp_path, path)
+                self._after_replace(path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def append_file(self, path, data: bytes):
+        """Append data to path, syncing per the policy."""
+        with self._lock:
+            with open(path, 'ab') as f:
+                f.write(data)
+                f.flush()
+                if self.policy == "always":
+                    os.fsync(f.fileno())
+            if self.policy != "always":
+                self._dirty.add(path)
+            self._after_write()
+        return True
+
+    def _after_write(self):
+        self._writes_since_sync += 1
+        if self.policy == "batched":
+            if self._writes_since_sync >= self.batch_size:
+                self.flush()
+        elif self.policy == "idle":
+            if self._closed:
+                self.flush()
+                return
+            idle = self._deadline is None
+            self._deadline = time.monotonic() + self.idle_delay
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_when_idle, daemon=True)
+                self._flusher.start()
+            elif idle:
+                # With a deadline pending the flusher re-reads it when it
+                # wakes; without one it sleeps until woken here
+                self._wakeup.set()
+
+    def _flush_when_idle(self):
+        """Flusher thread of the idle policy."""
+        while True:
+            self._wakeup.clear()
+            with self._lock:
+                if self._closed:
+                    return
+                deadline = self._deadline
+            if deadline is None:
+                self._wakeup.wait()
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining > 0:
+                self._wakeup.wait(remaining)
+                continue
+            self.flush()
+
+    def flush(self):
+        """fsync pending appends and renames."""
+        try:
+            with self._lock:
+                self._deadline = None
+                for path in self._dirty:
+                    if os.path.exists(path):
+                        _fsync_path(path)
+                synced_dirs = set()
+                for path in self._renamed:
+                    directory = os.path.dirname(os.path.abspath(path))
+                    if directory not in synced_dirs:
+                        _fsync_dir(path)
+                        synced_dirs.add(directory)
+                flushed = len(self._dirty) + len(self._renamed)
+                self._dirty.clear()
+                self._renamed.clear()
+                self._writes_since_sync = 0
+                if flushed:
+                    log_debug(f"Flushed {flushed} files to disk")
+            return True
+        except Exception as e:
+            log_error(f"Failed to flush durable writes: {str(e)}")
+            return False
+
+    def recover(self, path):
+        """Replay the last complete record of a WAL left for path, if any."""
+        wal_path = path + WAL_SUFFIX
+        try:
+            if not os.path.exists(wal_path):
+                return False
+            with open(wal_path, 'rb') as f:
+                wal = f.read()
+
+            latest = None
+            offset = 0
+            while offset + WAL_RECORD_HEADER.size <= len(wal):
+                length, crc = WAL_RECORD_HEADER.unpack_from(wal, offset)
+                start = offset + WAL_RECORD_HEADER.size
+                record = wal[start:start + length]
+                if len(record) != length or zlib.crc32(record) != crc:
+                    break  # Torn record from a crash during the WAL write
+                latest = record
+                offset = start + length
+
+            with self._lock:
+                if latest is not None:
+                    self._replace(path, latest)
+                    _fsync_dir(path)
+                os.remove(wal_path)
+            if latest is not None:
+                log_event(f"Recovered {os.path.basename(path)} from write-ahead log")
+            return latest is not None
+        except Exception as e:
+            log_error(f"Failed to recover {path} from write-ahead log: {str(e)}")
+            return False
+
+    def close(self):
+        """Flush everything still pending and stop the flusher thread.
+
+        Later writes are flushed as they happen.
+        """
+        with self._lock:
+            self._closed = True
+        self._wakeup.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        return self.flush()
+
+_writer = DurableWriter()
+
+def configure_durable_writes(policy="always", batch_size=10, idle_delay=2.0):
+    """Replace the shared writer, flushing whatever the old one had pending."""
+    global _writer
+    _writer.close()
+    _writer = DurableWriter(policy, batch_size, idle_delay)
+    log_event(f"Durable writes configured: policy={policy}")
+    return _writer
+
+def get_writer():
+    """Get the shared writer."""
+    return _writer
+
+def atomic_write(path, data):
+    """Atomically replace path with data using the shared writer."""
+    return _writer.write_file(path, data)
+
+def atomic_stream(path):
+    """Context manager yielding a file that atomically replaces path."""
+    return _writer.open_file(path)
+
+def durable_append(path, data):
+    """Append data to path using the shared writer."""
+    return _writer.append_file(path, data)
+
+def recover_file(path):
+    """Replay a write-ahead log left for path by an earlier version."""
+    return _writer.recover(path)
@@ -0,0 +1,247 @@
+# utils/kdf.py
+"""Password-based key derivation: PBKDF2-SHA256, scrypt and Argon2id.
+
+Every file that derives its key from the master password records the
+algorithm and cost parameters it was written with (``KDFParams.pack``), so
+costs can be raised later without breaking older files. ``calibrate``
+picks parameters that take a target time on this machine; run
+
+    python -m utils.kdf --algorithm argon2id --target-ms 500 --save
+
+from the AndroVault directory to store them in settings.json.
+"""
+import argparse
+import base64
+import os
+import struct
+import time
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+try:
+    from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+except ImportError:  # cryptography < 44
+    Argon2id = None
+from logger import log_event
+
+KEY_SIZE = 32
+
+PBKDF2_SHA256 = "pbkdf2-sha256"
+SCRYPT = "scrypt"
+ARGON2ID = "argon2id"
+KDF_ALGORITHMS = (PBKDF2_SHA256, SCRYPT, ARGON2ID)
+
+# Algorithm ids as stored in file headers
+KDF_IDS = {PBKDF2_SHA256: 1, SCRYPT: 2, ARGON2ID: 3}
+KDF_NAMES = {kdf_id: name for name, kdf_id in KDF_IDS.items()}
+
+# id, then three u32 cost parameters whose meaning depends on the algorithm:
+#   pbkdf2-sha256: iterations, -, -
+#   scrypt:        log2(n), r, p
+#   argon2id:      time cost, memory cost (KiB), parallelism
+PACKED_PARAMS = struct.Struct(">BIII")
+
+# Defaults match the iteration count used before KDFs were configurable
+DEFAULT_PBKDF2_ITERATIONS = 100_000
+DEFAULT_SCRYPT = (15, 8, 1)
+DEFAULT_ARGON2ID = (3, 64 * 1024, 4)
+
+class KDFParams:
+    """Immutable algorithm + cost parameters; hashable for key caches."""
+
+    __slots__ = ('algorithm', 'costs')
+
+    def __init__(self, algorithm=PBKDF2_SHA256, costs=None):
+        """
+        Initialize KDF parameters.
+
+        Args:
+            algorithm: One of KDF_ALGORITHMS
+            costs: Tuple of cost parameters for the algorithm (see
+                PACKED_PARAMS); defaults per algorithm when omitted
+        """
+        if algorithm not in KDF_ALGORITHMS:
+            raise ValueError(f"Unknown key derivation function: {algorithm}")
+        if costs is None:
+            costs = {
+                PBKDF2_SHA256: (DEFAULT_PBKDF2_ITERATIONS,),
+                SCRYPT: DEFAULT_SCRYPT,
+                ARGON2ID: DEFAULT_ARGON2ID,
+            }[algorithm]
+        object.__setattr__(self, 'algorithm', algorithm)
+        object.__setattr__(self, 'costs', tuple(int(c) for c in costs))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("KDFParams is immutable")
+
+    @classmethod
+    def pbkdf2(cls, iterations=DEFAULT_PBKDF2_ITERATIONS):
+        return cls(PBKDF2_SHA256, (iterations,))
+
+    @classmethod
+    def scrypt(cls, log2_n=DEFAULT_SCRYPT[0], r=DEFAULT_SCRYPT[1], p=DEFAULT_SCRYPT[2]):
+        return cls(SCRYPT, (log2_n, r, p))
+
+    @classmethod
+    def argon2id(cls, time_cost=DEFAULT_ARGON2ID[0], memory_kib=DEFAULT_ARGON2ID[1],
+                 parallelism=DEFAULT_ARGON2ID[2]):
+        return cls(ARGON2ID, (time_cost, memory_kib, parallelism))
+
+    def pack(self):
+        """Fixed-size binary form for file headers."""
+        costs = self.costs + (0,) * (3 - len(self.costs))
+        return PACKED_PARAMS.pack(KDF_IDS[self.algorithm], *costs)
+
+    @classmethod
+    def unpack(cls, data, offset=0):
+        """Parse pack() output; returns (params, next offset)."""
+        kdf_id, a, b, c = PACKED_PARAMS.unpack_from(data, offset)
+        if kdf_id not in KDF_NAMES:
+            raise ValueError(f"Unsupported key derivation function: {kdf_id}")
+        algorithm = KDF_NAMES[kdf_id]
+        costs = (a,) if algorithm == PBKDF2_SHA256 else (a, b, c)
+        return cls(algorithm, costs), offset + PACKED_PARAMS.size
+
+    def to_dict(self):
+        """Settings form, e.g. {"algorithm": "scrypt", "costs": [15, 8, 1]}."""
+        return {"algorithm": self.algorithm, "costs": list(self.costs)}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Inverse of to_dict; missing costs use the algorithm defaults."""
+        return cls(data.get("algorithm", PBKDF2_SHA256), data.get("costs"))
+
+    def describe(self):
+        """Human-readable summary for logs and the calibration command."""
+        if self.algorithm == PBKDF2_SHA256:
+            return f"PBKDF2-SHA256, {self.costs[0]} iterations"
+        if self.algorithm == SCRYPT:
+            log2_n, r, p = self.costs
+            return f"scrypt, n=2^{log2_n}, r={r}, p={p} ({128 * r * (1 << log2_n) // (1024 * 1024)} MiB)"
+        time_cost, memory_kib, parallelism = self.costs
+        return f"Argon2id, t={time_cost}, m={memory_kib // 1024} MiB, p={parallelism}"
+
+    def __eq__(self, other):
+        if not isinstance(other, KDFParams):
+            return NotImplemented
+        return self.algorithm == other.algorithm and self.costs == other.costs
+
+    def __hash__(self):
+        return hash((self.algorithm, self.costs))
+
+    def __repr__(self):
+        return f"KDFParams({self.algorithm!r}, {self.costs!r})"
+
+DEFAULT_KDF = KDFParams.pbkdf2()
+
+def derive(password, salt, params=DEFAULT_KDF):
+    """Derive a raw 32-byte key from password (str or bytes)."""
+    if isinstance(password, str):
+        password = password.encode()
+    if params.algorithm == PBKDF2_SHA256:
+        kdf = PBKDF2HMAC(
+            algorithm=hashes.SHA256(),
+            length=KEY_SIZE,
+            salt=salt,
+            iterations=params.costs[0],
+        )
+    elif params.algorithm == SCRYPT:
+        log2_n, r, p = params.costs
+        kdf = Scrypt(salt=salt, length=KEY_SIZE, n=1 << log2_n, r=r, p=p)
+    else:
+        if Argon2id is None:
+            raise RuntimeError("Argon2id needs cryptography 44 or newer")
+        time_cost, memory_kib, parallelism = params.costs
+        kdf = Argon2id(
+            salt=salt,
+            length=KEY_SIZE,
+            iterations=time_cost,
+            lanes=parallelism,
+            memory_cost=memory_kib,
+        )
+    return kdf.derive(password)
+
+def fernet_key(password, salt, iterations=DEFAULT_PBKDF2_ITERATIONS):
+    """Fernet key (urlsafe base64) for the salt-prefixed Fernet formats.
+
+    Those formats have no header to record KDF parameters in, so they stay
+    on PBKDF2-SHA256.
+    """
+    return base64.urlsafe_b64encode(derive(password, salt, KDFParams.pbkdf2(iterations)))
+
+def time_kdf(params, repeat=3):
+    """Median seconds one derivation with params takes on this machine."""
+    salt = os.urandom(16)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        derive(b"calibration", salt, params)
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+def calibrate(algorithm=ARGON2ID, target_ms=500, max_memory_mib=256):
+    """
+    Pick cost parameters whose derivation takes about target_ms here.
+
+    Args:
+        algorithm: One of KDF_ALGORITHMS
+        target_ms: Desired unlock latency of one derivation
+        max_memory_mib: Memory ceiling for scrypt and Argon2id
+    Returns:
+        (KDFParams, measured milliseconds)
+    """
+    target = target_ms / 1000.0
+    if algorithm == PBKDF2_SHA256:
+        # Cost is linear in iterations; scale from a short probe
+        probe = KDFParams.pbkdf2(20_000)
+        iterations = int(20_000 * target / time_kdf(probe))
+        params = KDFParams.pbkdf2(max(10_000, iterations // 1000 * 1000))
+    elif algorithm == SCRYPT:
+        # Double n (memory and time) until the target or the ceiling
+        r, p = DEFAULT_SCRYPT[1], DEFAULT_SCRYPT[2]
+        log2_n = 12
+        while (128 * r * (1 << (log2_n + 1)) <= max_memory_mib * 1024 * 1024
+               and time_kdf(KDFParams.scrypt(log2_n, r, p), repeat=1) * 2 <= target):
+            log2_n += 1
+        params = KDFParams.scrypt(log2_n, r, p)
+    elif algorithm == ARGON2ID:
+        # Use the memory ceiling (bounded to 1 GiB), then add passes
+        parallelism = min(4, os.cpu_count() or 1)
+        memory_kib = min(max_memory_mib, 1024) * 1024
+        time_cost = 1
+        while time_kdf(KDFParams.argon2id(time_cost, memory_kib, parallelism), repeat=1) > target:
+            if memory_kib <= 8 * 1024:
+                break
+            memory_kib //= 2
+        per_pass = time_kdf(KDFParams.argon2id(1, memory_kib, parallelism), repeat=1)
+        time_cost = max(1, int(target / per_pass))
+        params = KDFParams.argon2id(time_cost, memory_kib, parallelism)
+    else:
+        raise ValueError(f"Unknown key derivation function: {algorithm}")
+
+    measured_ms = time_kdf(params) * 1000
+    log_event(f"KDF calibrated: {params.describe()} ({measured_ms:.0f} ms)")
+    return params, measured_ms
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate the vault key derivation cost")
+    parser.add_argument("--algorithm", choices=KDF_ALGORITHMS, default=ARGON2ID)
+    parser.add_argument("--target-ms", type=int, default=None,
+                        help="desired unlock time (default: security.kdf_target_ms setting)")
+    parser.add_argument("--max-memory-mib", type=int, default=256)
+    parser.add_argument("--save", action="store_true",
+                        help="store the result as security.kdf in settings.json")
+    args = parser.parse_args(argv)
+
+    from data.settings_manager import SettingsManager
+    settings = SettingsManager()
+    target_ms = args.target_ms or settings.get_setting('security', 'kdf_target_ms')
+
+    params, measured_ms = calibrate(args.algorithm, target_ms, args.max_memory_mib)
+    print(f"{params.describe()}: {measured_ms:.0f} ms (target {target_ms} ms)")
+    if args.save:
+        settings.update_setting('security', 'kdf', params.to_dict())
+        print("Saved; vaults are re-encrypted with these parameters on next unlock")
+
+if __name__ == "__main__":
+    main()
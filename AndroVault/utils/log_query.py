@@ -0,0 +1,341 @@
+# utils/log_query.py
+"""Query the application logs without reading them whole.
+
+Reads the current log and its rotated predecessors (see logger.py), in
+either format: JSON lines, or the text format, where a stack trace
+continues a record over several lines.
+
+* ``tail`` reads blocks backwards from the end of the newest file and
+  stops as soon as it has enough matching records.
+* ``query`` filters by level, message pattern and time range. A sidecar
+  index (``logs/log_index.json``) keeps, for every file, its time span,
+  record count per level and the byte offset of a record every
+  MARK_INTERVAL bytes. Files that cannot match are skipped, and a time
+  range starts reading at the nearest mark rather than the top.
+
+Index entries are keyed by a file's first line, so they stay valid when
+rotation renames the file; the live file is indexed incrementally as it
+grows. Run from the AndroVault directory:
+
+    python -m utils.log_query --level ERROR --since 2h
+    python -m utils.log_query --tail 50 --event "backup"
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+LOG_DIR = 'logs'
+LOG_NAME = 'app'
+INDEX_FILE = 'log_index.json'
+INDEX_VERSION = 1
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+# Bytes between index marks; a time range reads at most this much before
+# its first record
+MARK_INTERVAL = 64 * 1024
+BLOCK_SIZE = 64 * 1024
+# Enough of the first line to tell files apart (it starts with a timestamp)
+FINGERPRINT_BYTES = 4096
+
+TEXT_RECORD = re.compile(r'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d) - (\w+) - \[(.*?)\] - (.*)$')
+TEXT_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def parse_line(line):
+    """Record dict for the first line of a log record, or None for a
+    continuation line (a stack trace in the text format)."""
+    if line.startswith('{'):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        return record if isinstance(record, dict) and 'ts' in record else None
+    match = TEXT_RECORD.match(line)
+    if match is None:
+        return None
+    time_text, level, where, message = match.groups()
+    return {
+        "ts": datetime.strptime(time_text, TEXT_TIME_FORMAT).timestamp(),
+        "time": time_text,
+        "level": level,
+        "where": where,
+        "message": message,
+    }
+
+def log_files(log_dir=LOG_DIR):
+    """Log files oldest first: rotated files (size or time rotation), the
+    per-launch logs from before rotation, then the live file."""
+    try:
+        names = [name for name in os.listdir(log_dir) if name.startswith(LOG_NAME) and '.log' in name]
+    except FileNotFoundError:
+        return []
+    paths = [os.path.join(log_dir, name) for name in names]
+    return sorted(paths, key=lambda path: (os.path.getmtime(path), path))
+
+class Filter:
+    """Record predicate: minimum level, message pattern and time range."""
+
+    def __init__(self, level=None, event=None, since=None, until=None):
+        """
+        Initialize filter.
+
+        Args:
+            level: Lowest level name to include
+            event: Regular expression searched in the message
+            since: Earliest time (epoch seconds)
+            until: Latest time (epoch seconds)
+        """
+        self.min_level = LEVELS[level.upper()] if level else None
+        self.pattern = re.compile(event) if event else None
+        self.since = since
+        self.until = until
+
+    def __call__(self, record):
+        if self.min_level is not None and LEVELS.get(record.get("level"), 0) < self.min_level:
+            return False
+        if self.since is not None and record["ts"] < self.since:
+            return False
+        if self.until is not None and record["ts"] > self.until:
+            return False
+        if self.pattern is not None and not self.pattern.search(record.get("message", "")):
+            return False
+        return True
+
+    def may_match(self, entry):
+        """Whether a file with this index entry can hold matching records."""
+        if not entry or not entry["count"]:
+            return False
+        if self.since is not None and entry["last_ts"] < self.since:
+            return False
+        if self.until is not None and entry["first_ts"] > self.until:
+            return False
+        if self.min_level is not None:
+            return any(count for level, count in entry["levels"].items()
+                       if LEVELS.get(level, 0) >= self.min_level)
+        return True
+
+def _read_records(f, offset):
+    """Yield ``(offset, record, raw text)`` from offset on, joining
+    continuation lines to their record; stops at a partial last line."""
+    f.seek(offset)
+    current = None
+    while True:
+        line = f.readline()
+        if not line.endswith(b'\n'):
+            break
+        text = line.decode('utf-8', errors='replace')
+        record = parse_line(text)
+        if record is not None:
+            if current is not None:
+                yield current
+            current = [offset, record, text]
+        elif current is not None:
+            current[2] += text
+        offset += len(line)
+    if current is not None:
+        yield current
+
+def _reverse_lines(f, end):
+    """Yield the complete lines before end, last first."""
+    position = end
+    remainder = b''
+    while position > 0:
+        size = min(BLOCK_SIZE, position)
+        position -= size
+        f.seek(position)
+        lines = (f.read(size) + remainder).split(b'\n')
+        remainder = lines.pop(0)
+        for line in reversed(lines):
+            if line:
+                yield line
+    if remainder:
+        yield remainder
+
+def _reverse_records(path):
+    """Yield ``(record, raw text)`` of a file, last first."""
+    continuation = []
+    with open(path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        # A record being written has no newline yet; leave it out
+        if end:
+            f.seek(end - 1)
+            if f.read(1) != b'\n':
+                end = _last_newline(f, end)
+        for line in _reverse_lines(f, end):
+            text = line.decode('utf-8', errors='replace') + '\n'
+            record = parse_line(text)
+            if record is None:
+                continuation.append(text)
+                continue
+            yield record, text + ''.join(reversed(continuation))
+            continuation = []
+
+def _last_newline(f, end):
+    position = end
+    while position > 0:
+        size = min(BLOCK_SIZE, position)
+        position -= size
+        f.seek(position)
+        index = f.read(size).rfind(b'\n')
+        if index >= 0:
+            return position + index + 1
+    return 0
+
+class LogIndex:
+    """Sidecar index of the log files (see module docstring)."""
+
+    def __init__(self, log_dir=LOG_DIR):
+        self.log_dir = log_dir
+        self.path = os.path.join(log_dir, INDEX_FILE)
+        self.entries = {}
+        self._dirty = False
+        try:
+            with open(self.path, 'r') as f:
+                index = json.load(f)
+            if index.get("version") == INDEX_VERSION:
+                self.entries = index["files"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def entry(self, path):
+        """Index entry of a file, brought up to date; None for an empty file."""
+        with open(path, 'rb') as f:
+            head = f.read(FINGERPRINT_BYTES).split(b'\n', 1)[0]
+            if not head:
+                return None
+            key = hashlib.sha256(head).hexdigest()
+            size = f.seek(0, os.SEEK_END)
+            entry = self.entries.get(key)
+            if entry is None or entry["size"] > size:
+                entry = {"size": 0, "count": 0, "first_ts": None, "last_ts": None,
+                         "levels": {}, "marks": []}
+            if entry["size"] < size:
+                self._extend(f, entry)
+                self.entries[key] = entry
+                self._dirty = True
+            entry["seen"] = True
+            return entry
+
+    def _extend(self, f, entry):
+        last_mark = entry["marks"][-1][1] if entry["marks"] else -MARK_INTERVAL
+        end = entry["size"]
+        for offset, record, raw in _read_records(f, entry["size"]):
+            end = offset + len(raw.encode('utf-8'))
+            entry["count"] += 1
+            if entry["first_ts"] is None:
+                entry["first_ts"] = record["ts"]
+            entry["last_ts"] = record["ts"]
+            level = record.get("level", "")
+            entry["levels"][level] = entry["levels"].get(level, 0) + 1
+            if offset - last_mark >= MARK_INTERVAL:
+                entry["marks"].append([record["ts"], offset])
+                last_mark = offset
+        # Up to the last complete line; a record being written is picked
+        # up next time
+        entry["size"] = end
+
+    def start_offset(self, entry, since):
+        """Offset of the last mark at or before since."""
+        offset = 0
+        if since is None:
+            return offset
+        for ts, mark in entry["marks"]:
+            if ts >= since:
+                break
+            offset = mark
+        return offset
+
+    def save(self, prune=False):
+        """Write the index if it changed; with prune, drop files not seen."""
+        if prune:
+            stale = [key for key, entry in self.entries.items() if not entry.get("seen")]
+            for key in stale:
+                del self.entries[key]
+            self._dirty = self._dirty or bool(stale)
+        if not self._dirty:
+            return
+        files = {key: {k: v for k, v in entry.items() if k != "seen"} for key, entry in self.entries.items()}
+        fd, temp_path = tempfile.mkstemp(dir=self.log_dir, prefix=INDEX_FILE + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({"version": INDEX_VERSION, "files": files}, f)
+            os.replace(temp_path, self.path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._dirty = False
+
+def query(log_filter=None, log_dir=LOG_DIR):
+    """Yield ``(record, raw text)`` of matching records, oldest first."""
+    log_filter = log_filter or Filter()
+    index = LogIndex(log_dir)
+    try:
+        for path in log_files(log_dir):
+            entry = index.entry(path)
+            if not log_filter.may_match(entry):
+                continue
+            with open(path, 'rb') as f:
+                for offset, record, raw in _read_records(f, index.start_offset(entry, log_filter.since)):
+                    if log_filter.until is not None and record["ts"] > log_filter.until:
+                        break
+                    if log_filter(record):
+                        yield record, raw
+    finally:
+        index.save(prune=True)
+
+def tail(n=10, log_filter=None, log_dir=LOG_DIR):
+    """The last n matching ``(record, raw text)``, oldest first.
+
+    Files are read backwards, newest first, until n records are found;
+    with a filter, files the index rules out are skipped.
+    """
+    matches = []
+    index = LogIndex(log_dir) if log_filter else None
+    try:
+        for path in reversed(log_files(log_dir)):
+            if index is not None and not log_filter.may_match(index.entry(path)):
+                continue
+            for record, raw in _reverse_records(path):
+                if log_filter is None or log_filter(record):
+                    matches.append((record, raw))
+                    if len(matches) >= n:
+                        return matches[::-1]
+        return matches[::-1]
+    finally:
+        if index is not None:
+            index.save()
+
+def parse_time(text):
+    """Epoch seconds from an ISO time or an age such as "30m", "2h", "7d"."""
+    match = re.fullmatch(r'(\d+)([smhd])', text)
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        seconds = amount * {"s": 1, "m": 60, "h": 3600, "d": 86400}[unit]
+        return (datetime.now() - timedelta(seconds=seconds)).timestamp()
+    return datetime.fromisoformat(text).timestamp()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Filter and tail the application logs")
+    parser.add_argument("--dir", default=LOG_DIR, help="log directory (default: logs)")
+    parser.add_argument("--level", choices=list(LEVELS), type=str.upper, help="lowest level to show")
+    parser.add_argument("--event", help="regular expression searched in messages")
+    parser.add_argument("--since", type=parse_time, help='ISO time or age such as "2h"')
+    parser.add_argument("--until", type=parse_time, help='ISO time or age such as "30m"')
+    parser.add_argument("--tail", type=int, metavar="N", help="only the last N matching records")
+    args = parser.parse_args(argv)
+
+    log_filter = Filter(args.level, args.event, args.since, args.until)
+    if args.tail:
+        records = tail(args.tail, log_filter, args.dir)
+    else:
+        records = query(log_filter, args.dir)
+    for _, raw in records:
+        sys.stdout.write(raw)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,228 @@
+# utils/metrics.py
+"""Timing and count metrics for the hot paths.
+
+``timed(name)`` times a block or, as a decorator, every call of a
+function, in milliseconds. ``increment(name)`` counts events and
+``observe(name, value)`` records any other value. Names are dotted
+operations such as "accounts.save".
+
+Metrics are off until ``configure_metrics(enabled=True)`` (main.py applies
+the "metrics" settings). While off, a decorated function costs one flag
+check per call and a timed block a small Timer object; nothing is
+recorded.
+
+Histograms keep exact count, total, min and max, and a fixed-size random
+sample (reservoir sampling) for the percentiles, so memory stays bounded
+however long the session runs. ``dump()`` writes p50/p95/p99 per
+operation to the log, and it runs at exit with "dump_on_exit".
+"""
+import atexit
+import functools
+import json
+import random
+import threading
+import time
+from logger import log_event, log_error
+
+# Values kept per histogram for the percentiles
+RESERVOIR_SIZE = 2048
+PERCENTILES = (50, 95, 99)
+
+_enabled = False
+_dump_registered = False
+_registry_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+class Counter:
+    """Count of events."""
+
+    def __init__(self, name):
+        self.name = name
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def increment(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+class Histogram:
+    """Distribution of values (see module docstring)."""
+
+    def __init__(self, name, reservoir_size=RESERVOIR_SIZE):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self._reservoir_size = reservoir_size
+        self._sample = []
+        self._random = random.Random()
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.count += 1
+            self.total += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+            if len(self._sample) < self._reservoir_size:
+                self._sample.append(value)
+            else:
+                # Every value seen so far stays in the sample with equal odds
+                slot = self._random.randrange(self.count)
+                if slot < self._reservoir_size:
+                    self._sample[slot] = value
+
+    def percentile(self, percent):
+        """Nearest-rank percentile of the sample, or None when empty."""
+        with self._lock:
+            sample = sorted(self._sample)
+        if not sample:
+            return None
+        rank = max(1, -(-percent * len(sample) // 100))
+        return sample[rank - 1]
+
+    def summary(self):
+        """Dict of count, total, mean, min, max and p50/p95/p99."""
+        with self._lock:
+            count, total, low, high = self.count, self.total, self.min, self.max
+        summary = {"count": count, "total": total, "mean": total / count if count else None,
+                   "min": low, "max": high}
+        for percent in PERCENTILES:
+            summary[f"p{percent}"] = self.percentile(percent)
+        return summary
+
+def counter(name):
+    """The counter called name, created on first use."""
+    metric = _counters.get(name)
+    if metric is None:
+        with _registry_lock:
+            metric = _counters.setdefault(name, Counter(name))
+    return metric
+
+def histogram(name):
+    """The histogram called name, created on first use."""
+    metric = _histograms.get(name)
+    if metric is None:
+        with _registry_lock:
+            metric = _histograms.setdefault(name, Histogram(name))
+    return metric
+
+def increment(name, amount=1):
+    """Add amount to a counter when metrics are enabled."""
+    if _enabled:
+        counter(name).increment(amount)
+
+def observe(name, value):
+    """Record a value in a histogram when metrics are enabled."""
+    if _enabled:
+        histogram(name).observe(value)
+
+class Timer:
+    """Times a block or, as a decorator, every call of a function into
+    the histogram name, in milliseconds.
+
+    Whether metrics are enabled is checked when the block or call starts,
+    so functions decorated at import follow later configure_metrics calls.
+    """
+    __slots__ = ('name', '_start')
+
+    def __init__(self, name):
+        self.name = name
+        self._start = None
+
+    def __enter__(self):
+        if _enabled:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._start is not None:
+            histogram(self.name).observe((time.perf_counter() - self._start) * 1000)
+            self._start = None
+        return False
+
+    def __call__(self, func):
+        name = self.name
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram(name).observe((time.perf_counter() - start) * 1000)
+        return wrapper
+
+def timed(name):
+    """Timer for ``with timed("x"):`` or ``@timed("x")``."""
+    return Timer(name)
+
+def is_enabled():
+    return _enabled
+
+def configure_metrics(enabled=False, dump_on_exit=True):
+    """
+    Turn metrics collection on or off.
+
+    Args:
+        enabled: Record timings and counts
+        dump_on_exit: Write the report to the log when the process exits
+    """
+    global _enabled, _dump_registered
+    _enabled = bool(enabled)
+    if _enabled and dump_on_exit and not _dump_registered:
+        # Registered after logger.py's handler, so it runs before the log
+        # listener stops
+        atexit.register(dump)
+        _dump_registered = True
+    log_event("Metrics %s", "enabled" if _enabled else "disabled")
+
+def snapshot():
+    """{"timings": {name: summary}, "counters": {name: value}}."""
+    return {
+        "timings": {name: metric.summary() for name, metric in sorted(_histograms.items())},
+        "counters": {name: metric.value for name, metric in sorted(_counters.items())},
+    }
+
+def report():
+    """Text table of every timing and counter recorded so far."""
+    data = snapshot()
+    lines = [f"{'operation':<32} {'count':>7} {'total ms':>10} {'p50 ms':>9} {'p95 ms':>9}"
+             f" {'p99 ms':>9} {'max ms':>9}"]
+    for name, summary in data["timings"].items():
+        if not summary["count"]:
+            continue
+        lines.append(f"{name:<32} {summary['count']:>7} {summary['total']:>10.1f} {summary['p50']:>9.2f}"
+                     f" {summary['p95']:>9.2f} {summary['p99']:>9.2f} {summary['max']:>9.2f}")
+    for name, value in data["counters"].items():
+        lines.append(f"{name:<32} {value:>7}")
+    return "\n".join(lines)
+
+def dump(path=None):
+    """
+    Write the report to the log, and optionally a JSON snapshot to path.
+
+    Returns:
+        The report text
+    """
+    text = report()
+    log_event("Metrics:\n%s", text)
+    if path:
+        try:
+            with open(path, 'w') as f:
+                json.dump(snapshot(), f, indent=2)
+        except OSError as e:
+            log_error("Failed to write metrics to %s: %s", path, e)
+    return text
+
+def reset():
+    """Forget everything recorded so far."""
+    with _registry_lock:
+        _counters.clear()
+        _histograms.clear()
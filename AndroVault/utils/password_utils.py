@@ -4,12 +4,11 @@ import string
 from tkinter import messagebox
 from constants import COLORS
 from logger import log_error
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
-from cryptography.fernet import Fernet
-import base64
+from utils import crypto, kdf
 import os
 
+PBKDF2_ITERATIONS = kdf.DEFAULT_PBKDF2_ITERATIONS
+
 def generate_password(length=16):
     try:
         characters = string.ascii_letters + string.digits + string.punctuation
@@ -40,48 +39,30 @@ def evaluate_strength(password):
         log_error(f"Failed to evaluate password strength: {str(e)}")
         return "", "black"
 
-def derive_key(master_password: str, salt: bytes = None) -> bytes:
-    """Derive a secret key from the master password using PBKDF2."""
+def derive_key(master_password: str, salt: bytes = None, iterations: int = PBKDF2_ITERATIONS) -> bytes:
+    """Derive a Fernet key from the master password using PBKDF2 (see utils/kdf.py)."""
     try:
         if not salt:
             salt = os.urandom(16)  # Generate a new salt
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=salt,
-            iterations=100_000,
-        )
-        key = base64.urlsafe_b64encode(kdf.derive(master_password.encode()))
-        return key, salt
+        return kdf.fernet_key(master_password, salt, iterations), salt
     except Exception as e:
         log_error(f"Failed to derive key: {str(e)}")
         return None, None
 
 def encrypt_data(data: bytes, master_password: str) -> bytes:
-    """Encrypt data using a key derived from the master password."""
+    """Encrypt data as ``salt | Fernet token`` (see utils/crypto.py).
+
+    ``master_password`` may be a string or a ``SessionKey``; either way the
+    key is derived once and reused instead of running PBKDF2 per call.
+    """
     try:
-        key, salt = derive_key(master_password)
-        if not key:
-            return None
-        fernet = Fernet(key)
-        encrypted = fernet.encrypt(data)
-        # Prepend salt to encrypted data for later key derivation
-        return salt + encrypted
-    except Exception as e:
-        log_error(f"Failed to encrypt data: {str(e)}")
+        return crypto.encrypt_data(data, master_password)
+    except Exception:
         return None
 
 def decrypt_data(encrypted_data: bytes, master_password: str) -> bytes:
-    """Decrypt data using a key derived from the master password."""
+    """Decrypt data from encrypt_data with the master password (or a SessionKey)."""
     try:
-        salt = encrypted_data[:16]
-        encrypted = encrypted_data[16:]
-        key, _ = derive_key(master_password, salt)
-        if not key:
-            return None
-        fernet = Fernet(key)
-        decrypted = fernet.decrypt(encrypted)
-        return decrypted
-    except Exception as e:
-        log_error(f"Failed to decrypt data: {str(e)}")
+        return crypto.decrypt_data(encrypted_data, master_password)
+    except Exception:
         return None
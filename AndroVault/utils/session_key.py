@@ -0,0 +1,172 @@
+# utils/session_key.py
+import os
+import threading
+import weakref
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from logger import log_event, log_error
+from utils import kdf as kdf_module
+from utils.metrics import timed
+
+SALT_SIZE = 16
+# Separates the AEAD key from the Fernet key derived from the same password
+AEAD_KEY_INFO = b"AndroVault vault AEAD key"
+
+# Every live session key, so a session lock can wipe them all at once
+_session_keys = weakref.WeakSet()
+_registry_lock = threading.Lock()
+# Run before the keys are wiped, e.g. to write queued saves that need them
+_wipe_listeners = []
+
+class SessionKey:
+    """Vault key derived once at unlock and reused for the whole session.
+
+    The derived key is cached per salt, so decrypting the vault file (whose
+    header carries the salt) and re-encrypting it on every save only pays for
+    PBKDF2 once. Encrypted output keeps the ``salt + Fernet token`` layout used
+    by ``encrypt_data``/``decrypt_data``.
+    """
+
+    def __init__(self, master_password, salt=None, kdf=kdf_module.DEFAULT_KDF):
+        """
+        Initialize session key for a master password.
+
+        Args:
+            master_password: Master password keys are derived from
+            salt: Salt for new files (random by default)
+            kdf: KDFParams new files are encrypted with; files record their
+                own parameters and are read with those
+        """
+        self._lock = threading.Lock()
+        self._password = master_password
+        self.kdf = kdf
+        self._ciphers = {}
+        self._aeads = {}
+        self._aead_keys = {}
+        self.salt = salt or os.urandom(SALT_SIZE)
+        self.is_locked = False
+        with _registry_lock:
+            _session_keys.add(self)
+
+    def cipher(self, salt=None):
+        """Get the Fernet cipher for a salt, deriving the key on first use."""
+        salt = salt or self.salt
+        with self._lock:
+            if self.is_locked:
+                raise RuntimeError("Session key is locked")
+            cipher = self._ciphers.get(salt)
+            if cipher is None:
+                with timed("crypto.kdf"):
+                    cipher = Fernet(kdf_module.fernet_key(self._password, salt))
+                self._ciphers[salt] = cipher
+                log_event("Session key derived")
+            return cipher
+
+    def _aead_key(self, salt, kdf):
+        """Raw AEAD key for salt and kdf (lock held)."""
+        if self.is_locked:
+            raise RuntimeError("Session key is locked")
+        aead_key = self._aead_keys.get((salt, kdf))
+        if aead_key is None:
+            with timed("crypto.kdf"):
+                master_key = kdf_module.derive(self._password, salt, kdf)
+            aead_key = HKDF(
+                algorithm=hashes.SHA256(),
+                length=32,
+                salt=None,
+                info=AEAD_KEY_INFO
+            ).derive(master_key)
+            self._aead_keys[(salt, kdf)] = aead_key
+            log_event(f"Session AEAD key derived ({kdf.describe()})")
+        return aead_key
+
+    def aead(self, salt=None, kdf=None):
+        """Get an AES-256-GCM cipher for a salt and KDFParams.
+
+        The key is expanded with HKDF from the KDF output, so it never
+        equals the Fernet key for the same salt.
+        """
+        salt = salt or self.salt
+        kdf = kdf or self.kdf
+        with self._lock:
+            aead = self._aeads.get((salt, kdf))
+            if aead is None:
+                aead = AESGCM(self._aead_key(salt, kdf))
+                self._aeads[(salt, kdf)] = aead
+            return aead
+
+    def aead_key(self, salt=None, kdf=None):
+        """Raw bytes of the aead() key, for handing to worker processes."""
+        with self._lock:
+            return self._aead_key(salt or self.salt, kdf or self.kdf)
+
+    @timed("crypto.fernet_encrypt")
+    def encrypt(self, data: bytes) -> bytes:
+        """Encrypt data with the session salt, prefixing the salt."""
+        return self.salt + self.cipher().encrypt(data)
+
+    @timed("crypto.fernet_decrypt")
+    def decrypt(self, encrypted_data: bytes) -> bytes:
+        """Decrypt salt-prefixed data and adopt its salt for later saves."""
+        salt = encrypted_data[:SALT_SIZE]
+        decrypted = self.cipher(salt).decrypt(encrypted_data[SALT_SIZE:])
+        # Keep writing under the salt found in the file header
+        self.salt = salt
+        return decrypted
+
+    def wipe(self):
+        """Drop the password and every derived key."""
+        with self._lock:
+            self._ciphers.clear()
+            self._aeads.clear()
+            self._aead_keys.clear()
+            self._password = None
+            self.is_locked = True
+
+    def unlock(self, master_password):
+        """Restore the password after a wipe; keys are re-derived lazily."""
+        with self._lock:
+            self._password = master_password
+            self.is_locked = False
+
+def add_wipe_listener(callback):
+    """Register callback() run before wipe_session_keys wipes anything."""
+    with _registry_lock:
+        if callback not in _wipe_listeners:
+            _wipe_listeners.append(callback)
+
+def remove_wipe_listener(callback):
+    """Unregister a callback added with add_wipe_listener."""
+    with _registry_lock:
+        if callback in _wipe_listeners:
+            _wipe_listeners.remove(callback)
+
+def wipe_session_keys():
+    """Wipe all live session keys (used when the session locks).
+
+    Wipe listeners run first, while the keys still work.
+    """
+    with _registry_lock:
+        listeners = list(_wipe_listeners)
+    for listener in listeners:
+        try:
+            listener()
+        except Exception as e:
+            log_error(f"Wipe listener failed: {str(e)}")
+    try:
+        with _registry_lock:
+            keys = list(_session_keys)
+        for key in keys:
+            key.wipe()
+        log_event(f"Wiped {len(keys)} session keys")
+    except Exception as e:
+        log_error(f"Failed to wipe session keys: {str(e)}")
+
+def unlock_session_keys(master_password):
+    """Re-arm all live session keys after a successful unlock."""
+    with _registry_lock:
+        keys = list(_session_keys)
+    for key in keys:
+        key.unlock(master_password)
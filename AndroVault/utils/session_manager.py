@@ -2,6 +2,7 @@ import threading
 import time
 from datetime import datetime, timedelta
 from logger import log_event, log_error
+from utils.session_key import wipe_session_keys, unlock_session_keys
 
 class SessionManager:
     def __init__(self, state_manager, settings_manager):
@@ -11,6 +12,7 @@ class SessionManager:
         self.last_activity = datetime.now()
         self.lock_timer = None
         self.is_locked = False
+        self.lock_listeners = []
         
         # Start monitoring
         self.start_monitoring()
@@ -47,6 +49,11 @@ class SessionManager:
                 log_error(f"Session monitoring error: {str(e)}")
                 time.sleep(5)  # Wait before retrying
 
+    def add_lock_listener(self, callback):
+        """Register a callback run just before the session locks."""
+        if callback not in self.lock_listeners:
+            self.lock_listeners.append(callback)
+
     def record_activity(self):
         """Record user activity."""
         self.last_activity = datetime.now()
@@ -56,6 +63,15 @@ class SessionManager:
         try:
             if not self.is_locked:
                 self.is_locked = True
+                # Listeners run while keys still exist; so do the wipe
+                # listeners (e.g. AccountManager's flush of queued saves)
+                for listener in self.lock_listeners:
+                    try:
+                        listener()
+                    except Exception as e:
+                        log_error(f"Lock listener failed: {str(e)}")
+                # Forget derived vault keys while locked
+                wipe_session_keys()
                 self.state_manager.set_state(self.state_manager.AppState.LOCKED)
                 log_event("Session locked due to inactivity")
         except Exception as e:
@@ -67,6 +83,7 @@ class SessionManager:
             from auth.authentication import verify_master_password
             
             if verify_master_password(master_password):
+                unlock_session_keys(master_password)
                 self.is_locked = False
                 self.record_activity()
                 self.state_manager.set_state(self.state_manager.AppState.READY)
@@ -0,0 +1,254 @@
+# utils/stream_crypto.py
+import io
+import os
+import shutil
+import struct
+from cryptography.exceptions import InvalidTag
+from utils.session_key import SessionKey
+from utils.kdf import KDFParams, PACKED_PARAMS
+
+STREAM_MAGIC = b"AVS1"
+# 1: PBKDF2-SHA256 only
+# 2: header carries any KDF and its costs
+STREAM_VERSION = 2
+SUPPORTED_STREAM_VERSIONS = (1, 2)
+KDF_PBKDF2_SHA256 = 1
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+NONCE_PREFIX_SIZE = 8
+
+# magic, version; followed by KDFParams.pack() and the salt length
+STREAM_HEADER = struct.Struct(">4sB")
+SALT_LENGTH = struct.Struct(">B")
+# Version 1: magic, version, kdf id, kdf iterations, salt length
+STREAM_HEADER_V1 = struct.Struct(">4sBBIB")
+# chunk size, nonce prefix
+STREAM_INFO = struct.Struct(">I8s")
+# ciphertext length, last-chunk flag
+STREAM_CHUNK = struct.Struct(">IB")
+# Associated data appended to the file header for each chunk: chunk index
+# and last-chunk flag
+CHUNK_AAD = struct.Struct(">IB")
+NONCE_COUNTER = struct.Struct(">I")
+
+class ChunkCipher:
+    """AES-GCM for the chunks of one file.
+
+    Every chunk is authenticated together with the file header, its index
+    and whether it is the last chunk, so chunks cannot be swapped between
+    files, reordered, dropped, or cut off at the end without failing
+    decryption.
+    """
+
+    __slots__ = ('aead', 'header')
+
+    def __init__(self, aead, header):
+        """Initialize chunk cipher for a file header."""
+        self.aead = aead
+        self.header = bytes(header)
+
+    def _aad(self, index, last):
+        return self.header + CHUNK_AAD.pack(index, last)
+
+    def seal(self, nonce, index, last, data):
+        """Encrypt one chunk."""
+        return self.aead.encrypt(nonce, data, self._aad(index, last))
+
+    def open(self, nonce, index, last, data):
+        """Decrypt one chunk."""
+        try:
+            return self.aead.decrypt(nonce, data, self._aad(index, last))
+        except InvalidTag:
+            raise ValueError(f"Chunk {index} failed authentication (wrong password or corrupted file)")
+
+def _session_key(key):
+    """Accept a SessionKey or a master password string."""
+    return SessionKey(key) if isinstance(key, str) else key
+
+def _read_exact(fileobj, size):
+    data = fileobj.read(size)
+    if len(data) != size:
+        raise ValueError("Truncated encrypted stream")
+    return data
+
+class StreamHeader:
+    """Parsed plaintext header of an encrypted stream."""
+
+    __slots__ = ('kdf', 'salt', 'chunk_size', 'nonce_prefix', 'raw')
+
+    def __init__(self, kdf, salt, chunk_size, nonce_prefix, raw):
+        """Initialize stream header; raw is the header bytes as stored."""
+        self.kdf = kdf
+        self.salt = salt
+        self.chunk_size = chunk_size
+        self.nonce_prefix = nonce_prefix
+        self.raw = raw
+
+def read_stream_header(fileobj):
+    """Read the header of an encrypted stream, leaving fileobj at chunk 0.
+
+    Needs no key, so callers can tell which salt and KDF a file was
+    written with before deriving anything.
+    """
+    fixed = _read_exact(fileobj, STREAM_HEADER.size)
+    magic, version = STREAM_HEADER.unpack(fixed)
+    if magic != STREAM_MAGIC:
+        raise ValueError("Not an encrypted stream")
+    if version not in SUPPORTED_STREAM_VERSIONS:
+        raise ValueError(f"Unsupported stream version: {version}")
+    if version == 1:
+        fixed += _read_exact(fileobj, STREAM_HEADER_V1.size - STREAM_HEADER.size)
+        _, _, kdf_id, iterations, salt_len = STREAM_HEADER_V1.unpack(fixed)
+        if kdf_id != KDF_PBKDF2_SHA256:
+            raise ValueError(f"Unsupported key derivation function: {kdf_id}")
+        kdf = KDFParams.pbkdf2(iterations)
+    else:
+        fixed += _read_exact(fileobj, PACKED_PARAMS.size + SALT_LENGTH.size)
+        kdf, offset = KDFParams.unpack(fixed, STREAM_HEADER.size)
+        (salt_len,) = SALT_LENGTH.unpack_from(fixed, offset)
+    salt = _read_exact(fileobj, salt_len)
+    info = _read_exact(fileobj, STREAM_INFO.size)
+    chunk_size, nonce_prefix = STREAM_INFO.unpack(info)
+    return StreamHeader(kdf, salt, chunk_size, nonce_prefix, fixed + salt + info)
+
+class EncryptingWriter(io.RawIOBase):
+    """File-like writer that encrypts into ``fileobj`` chunk by chunk.
+
+    Layout: ``header | kdf | salt | chunk size | nonce prefix | chunk*`` where
+    each chunk is ``STREAM_CHUNK | AES-GCM(plaintext)`` and its nonce is the
+    file's random prefix plus the chunk index. At most one chunk of
+    plaintext is buffered. ``close()`` writes the final chunk (empty if
+    needed) but leaves ``fileobj`` open.
+    """
+
+    def __init__(self, fileobj, key, chunk_size=DEFAULT_CHUNK_SIZE, kdf=None):
+        """
+        Initialize encrypting writer.
+
+        Args:
+            fileobj: Binary file object to write the encrypted stream to
+            key: SessionKey (or master password) to encrypt with
+            chunk_size: Plaintext bytes per chunk
+            kdf: KDFParams recorded in the header (default: the session
+                key's)
+        """
+        super().__init__()
+        session_key = _session_key(key)
+        salt = session_key.salt
+        kdf = kdf or session_key.kdf
+        self._fileobj = fileobj
+        self._chunk_size = chunk_size
+        self._nonce_prefix = os.urandom(NONCE_PREFIX_SIZE)
+        header = (STREAM_HEADER.pack(STREAM_MAGIC, STREAM_VERSION)
+                  + kdf.pack()
+                  + SALT_LENGTH.pack(len(salt))
+                  + salt
+                  + STREAM_INFO.pack(chunk_size, self._nonce_prefix))
+        self._cipher = ChunkCipher(session_key.aead(salt, kdf), header)
+        self._buffer = bytearray()
+        self._index = 0
+        fileobj.write(header)
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        """Buffer data, encrypting every full chunk."""
+        if self.closed:
+            raise ValueError("write to closed EncryptingWriter")
+        self._buffer += data
+        while len(self._buffer) > self._chunk_size:
+            self._write_chunk(bytes(self._buffer[:self._chunk_size]), last=False)
+            del self._buffer[:self._chunk_size]
+        return len(data)
+
+    def _write_chunk(self, data, last):
+        nonce = self._nonce_prefix + NONCE_COUNTER.pack(self._index)
+        ciphertext = self._cipher.seal(nonce, self._index, last, data)
+        self._fileobj.write(STREAM_CHUNK.pack(len(ciphertext), last))
+        self._fileobj.write(ciphertext)
+        self._index += 1
+
+    def close(self):
+        """Write the last chunk; the underlying file stays open."""
+        if not self.closed:
+            self._write_chunk(bytes(self._buffer), last=True)
+            self._buffer = bytearray()
+        super().close()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            # Never finish a stream that failed halfway; without its last
+            # chunk it will not decrypt as complete
+            self._buffer = bytearray()
+            io.RawIOBase.close(self)
+            return False
+        return super().__exit__(exc_type, exc, tb)
+
+class DecryptingReader(io.RawIOBase):
+    """File-like reader that decrypts a stream written by EncryptingWriter.
+
+    Chunks are read and authenticated one at a time, so memory use does not
+    depend on the file size. A stream that ends before its last chunk
+    raises ValueError.
+    """
+
+    def __init__(self, fileobj, key):
+        """
+        Initialize decrypting reader.
+
+        Args:
+            fileobj: Binary file object positioned at the stream header
+            key: SessionKey (or master password) to decrypt with
+        """
+        super().__init__()
+        session_key = _session_key(key)
+        self._fileobj = fileobj
+        header = read_stream_header(fileobj)
+        self.kdf = header.kdf
+        self.salt = header.salt
+        self.chunk_size = header.chunk_size
+        self._nonce_prefix = header.nonce_prefix
+        self._cipher = ChunkCipher(session_key.aead(header.salt, header.kdf), header.raw)
+        self._buffer = b''
+        self._position = 0
+        self._index = 0
+        self._finished = False
+
+    def _read_exact(self, size):
+        return _read_exact(self._fileobj, size)
+
+    def readable(self):
+        return True
+
+    def _next_chunk(self):
+        length, last = STREAM_CHUNK.unpack(self._read_exact(STREAM_CHUNK.size))
+        nonce = self._nonce_prefix + NONCE_COUNTER.pack(self._index)
+        self._buffer = self._cipher.open(nonce, self._index, bool(last), self._read_exact(length))
+        self._position = 0
+        self._index += 1
+        if last:
+            self._finished = True
+            if self._fileobj.read(1):
+                raise ValueError("Data after the last chunk of encrypted stream")
+
+    def readinto(self, target):
+        """Fill target with decrypted bytes; returns 0 at the end."""
+        while self._position >= len(self._buffer):
+            if self._finished:
+                return 0
+            self._next_chunk()
+        count = min(len(target), len(self._buffer) - self._position)
+        target[:count] = self._buffer[self._position:self._position + count]
+        self._position += count
+        return count
+
+def encrypt_stream(source, destination, key, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Encrypt everything readable from source into destination."""
+    with EncryptingWriter(destination, key, chunk_size) as writer:
+        shutil.copyfileobj(source, writer, chunk_size)
+
+def decrypt_stream(source, destination, key):
+    """Decrypt an encrypted stream from source into destination."""
+    with DecryptingReader(source, key) as reader:
+        shutil.copyfileobj(reader, destination, DEFAULT_CHUNK_SIZE)
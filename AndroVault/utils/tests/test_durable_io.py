@@ -0,0 +1,98 @@
+# utils/tests/test_durable_io.py
+import os
+import threading
+import time
+import zlib
+import pytest
+from utils import durable_io
+from utils.durable_io import DurableWriter, WAL_SUFFIX, WAL_RECORD_HEADER
+
+@pytest.fixture
+def synced_dirs(monkeypatch):
+    """Directory fsyncs done, one entry per call."""
+    calls = []
+    monkeypatch.setattr(durable_io, '_fsync_dir', lambda path: calls.append(path))
+    return calls
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def test_write_file_replaces_and_leaves_no_temp_file():
+    writer = DurableWriter()
+    writer.write_file("vault", b"old")
+    writer.write_file("vault", "new")
+    assert read_bytes("vault") == b"new"
+    assert os.listdir() == ["vault"]
+
+def test_failed_stream_leaves_target_untouched():
+    writer = DurableWriter()
+    writer.write_file("vault", b"old")
+    with pytest.raises(RuntimeError):
+        with writer.open_file("vault") as f:
+            f.write(b"half of the new")
+            raise RuntimeError("interrupted")
+    assert read_bytes("vault") == b"old"
+    assert os.listdir() == ["vault"]
+
+def test_always_syncs_every_rename(synced_dirs):
+    writer = DurableWriter("always")
+    for _ in range(3):
+        writer.write_file("vault", b"data")
+    with writer.open_file("vault") as f:
+        f.write(b"streamed")
+    assert len(synced_dirs) == 4
+
+def test_batched_syncs_once_per_batch(synced_dirs):
+    writer = DurableWriter("batched", batch_size=5)
+    for _ in range(4):
+        writer.write_file("vault", b"data")
+    assert synced_dirs == []
+    writer.write_file("vault", b"data")
+    assert len(synced_dirs) == 1
+
+def test_deferred_appends_are_synced_on_flush(monkeypatch):
+    synced = []
+    monkeypatch.setattr(durable_io, '_fsync_path', lambda path: synced.append(path))
+    writer = DurableWriter("batched", batch_size=100)
+    writer.append_file("journal", b"one")
+    writer.append_file("journal", b"two")
+    assert read_bytes("journal") == b"onetwo"
+    assert synced == []
+    assert writer.flush()
+    assert synced == ["journal"]
+
+def test_idle_syncs_after_a_quiet_period_from_one_thread(synced_dirs):
+    writer = DurableWriter("idle", idle_delay=0.2)
+    threads = threading.active_count()
+    for _ in range(50):
+        writer.write_file("vault", b"data")
+    assert threading.active_count() <= threads + 1
+    assert synced_dirs == []
+
+    deadline = time.monotonic() + 5
+    while not synced_dirs and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert len(synced_dirs) == 1
+
+    # The same thread handles the next burst
+    writer.write_file("vault", b"more")
+    assert threading.active_count() <= threads + 1
+    writer.close()
+    assert len(synced_dirs) == 2
+    assert not writer._flusher.is_alive()
+
+def test_recover_replays_last_complete_legacy_wal_record():
+    def record(data):
+        return WAL_RECORD_HEADER.pack(len(data), zlib.crc32(data)) + data
+
+    with open("settings.json", 'wb') as f:
+        f.write(b"stale")
+    with open("settings.json" + WAL_SUFFIX, 'wb') as f:
+        # The last record was torn by a crash
+        f.write(record(b"first") + record(b"second") + record(b"third")[:-2])
+
+    assert DurableWriter().recover("settings.json")
+    assert read_bytes("settings.json") == b"second"
+    assert not os.path.exists("settings.json" + WAL_SUFFIX)
+    assert not DurableWriter().recover("settings.json")